@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:30
+
+from django.db import migrations
+
+from pathoscope import fts
+
+
+# Front-desk search index over patient names (see hematology.search). On SQLite the
+# FTS5 triggers are dropped whenever a migration rebuilds accounts_user;
+# pathoscope.fts.repair recreates them after migrate.
+TABLE = 'accounts_user'
+COLUMNS = ['username', 'first_name', 'last_name']
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        if not fts.sqlite_supports(connection, 'trigram'):
+            return  # search falls back to icontains
+        statements = fts.create_statements(TABLE, COLUMNS, 'trigram')
+    elif connection.vendor == 'postgresql':
+        expression = " || ' ' || ".join(COLUMNS)
+        statements = [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            f"CREATE INDEX IF NOT EXISTS {TABLE}_search_idx ON {TABLE} USING GIN (({expression}) gin_trgm_ops)",
+        ]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        statements = fts.drop_statements(TABLE)
+    elif connection.vendor == 'postgresql':
+        statements = [f"DROP INDEX IF EXISTS {TABLE}_search_idx"]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,8 +1,18 @@
 from django.contrib import admin
-from .models import Sample, TestResult, TestAnalyte, InstrumentQueue, QCLog
+from .models import (Sample, TestResult, TestAnalyte, InstrumentQueue, QCLog, AutoverificationRule, QCMeasurement, QCStatistics,
+                     ArchivedSample, ArchivedTestResult, ArchivedQueueEntry, TATRollup, SampleEvent, AnalytePoint)
 
 admin.site.register(Sample)
 admin.site.register(TestResult)
 admin.site.register(TestAnalyte)
 admin.site.register(InstrumentQueue)
-admin.site.register(QCLog)
\ No newline at end of file
+admin.site.register(QCLog)
+admin.site.register(AutoverificationRule)
+admin.site.register(QCMeasurement)
+admin.site.register(QCStatistics)
+admin.site.register(ArchivedSample)
+admin.site.register(ArchivedTestResult)
+admin.site.register(ArchivedQueueEntry)
+admin.site.register(TATRollup)
+admin.site.register(SampleEvent)
+admin.site.register(AnalytePoint)
\ No newline at end of file
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def repair_search_indexes(sender, using, **kwargs):
+    from .search import repair_indexes
+    repair_indexes(using)
 
 
 class HematologyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'hematology'
\ No newline at end of file
+    name = 'hematology'
+
+    def ready(self):
+        # Migrations that rebuild an indexed SQLite table drop its FTS5 triggers
+        post_migrate.connect(repair_search_indexes, sender=self)
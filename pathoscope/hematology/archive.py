@@ -0,0 +1,142 @@
+"""
+Hot/cold archival.
+
+Completed queue entries and closed samples (report ready, nothing left in
+the instrument queue) older than the retention window are copied to the
+``Archived*`` tables and deleted from the hot ones, one batch per
+transaction. Archived rows keep their original ids, so lookups by sample id
+fall through to the archive when the hot table has nothing:
+
+    sample_results(sample_id)       results of a hot or archived sample
+    is_accessioned(test_order)      hot or archived sample exists
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .fast_serializers import TestResultRowSerializer
+from .models import (Sample, TestResult, InstrumentQueue,
+                     ArchivedSample, ArchivedTestResult, ArchivedQueueEntry)
+
+
+DEFAULT_RETENTION_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+
+
+class ArchivedTestResultRowSerializer(TestResultRowSerializer):
+    model = ArchivedTestResult
+
+
+def archive_cutoff(retention_days=None, now=None):
+    if retention_days is None:
+        retention_days = getattr(settings, 'HEMATOLOGY_ARCHIVE_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    return (now or timezone.now()) - datetime.timedelta(days=retention_days)
+
+
+def archivable_samples(cutoff):
+    return Sample.objects.filter(
+        status=Sample.REPORT_READY,
+        processing_completed__lt=cutoff,
+    ).exclude(
+        queue_entries__status__in=[InstrumentQueue.WAITING, InstrumentQueue.PROCESSING],
+    )
+
+
+def archivable_queue_entries(cutoff):
+    return InstrumentQueue.objects.filter(status=InstrumentQueue.COMPLETED, completed_date__lt=cutoff)
+
+
+def copy_rows(queryset, archive_model, now):
+    """Insert the rows of ``queryset`` into ``archive_model``, column for column."""
+    columns = [field.attname for field in archive_model._meta.concrete_fields if field.name != 'archived_date']
+    archive_model.objects.bulk_create(
+        [archive_model(archived_date=now, **row) for row in queryset.values(*columns)],
+        batch_size=ARCHIVE_BATCH_SIZE,
+    )
+
+
+def archive_sample_batch(ids, cutoff, now):
+    with transaction.atomic():
+        # Re-check under lock: a sample may have changed since the batch was picked
+        ids = list(archivable_samples(cutoff).filter(id__in=ids).select_for_update(of=('self',))
+                   .values_list('id', flat=True))
+        if not ids:
+            return 0, 0, 0
+        results = TestResult.objects.filter(sample_id__in=ids)
+        entries = InstrumentQueue.objects.filter(sample_id__in=ids)
+        copy_rows(Sample.objects.filter(id__in=ids), ArchivedSample, now)
+        copy_rows(results, ArchivedTestResult, now)
+        copy_rows(entries, ArchivedQueueEntry, now)
+        result_count, _ = results.delete()
+        entry_count, _ = entries.delete()
+        Sample.objects.filter(id__in=ids).delete()
+    return len(ids), result_count, entry_count
+
+
+def archive_queue_batch(ids, cutoff, now):
+    with transaction.atomic():
+        entries = archivable_queue_entries(cutoff).filter(id__in=ids)
+        ids = list(entries.select_for_update().values_list('id', flat=True))
+        if not ids:
+            return 0
+        copy_rows(InstrumentQueue.objects.filter(id__in=ids), ArchivedQueueEntry, now)
+        deleted, _ = InstrumentQueue.objects.filter(id__in=ids).delete()
+        return deleted
+
+
+def archive(retention_days=None, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False):
+    """
+    Move closed samples (with their results and queue entries), then any
+    remaining completed queue entries, past the retention window into the
+    archive tables. Returns counts per table.
+    """
+    now = timezone.now()
+    cutoff = archive_cutoff(retention_days, now)
+    counts = {'cutoff': cutoff, 'samples': 0, 'results': 0, 'queue_entries': 0}
+
+    if dry_run:
+        samples = archivable_samples(cutoff)
+        counts['samples'] = samples.count()
+        counts['results'] = TestResult.objects.filter(sample__in=samples).count()
+        counts['queue_entries'] = (
+            InstrumentQueue.objects.filter(sample__in=samples).count()
+            + archivable_queue_entries(cutoff).exclude(sample__in=samples).count()
+        )
+        return counts
+
+    last_id = 0
+    while True:
+        ids = list(archivable_samples(cutoff).filter(id__gt=last_id).order_by('id')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+        samples, results, entries = archive_sample_batch(ids, cutoff, now)
+        counts['samples'] += samples
+        counts['results'] += results
+        counts['queue_entries'] += entries
+
+    last_id = 0
+    while True:
+        ids = list(archivable_queue_entries(cutoff).filter(id__gt=last_id).order_by('id')
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+        counts['queue_entries'] += archive_queue_batch(ids, cutoff, now)
+    return counts
+
+
+def sample_results(sample_id, fieldset=None):
+    """Rendered results of a sample, read from the archive if it has been moved there."""
+    rows = TestResultRowSerializer(TestResult.objects.filter(sample_id=sample_id), fieldset).data
+    if not rows and ArchivedSample.objects.filter(id=sample_id).exists():
+        rows = ArchivedTestResultRowSerializer(ArchivedTestResult.objects.filter(sample_id=sample_id), fieldset).data
+    return rows
+
+
+def is_accessioned(test_order):
+    return (Sample.objects.filter(test_order=test_order).exists()
+            or ArchivedSample.objects.filter(test_order=test_order).exists())
@@ -0,0 +1,303 @@
+"""
+Autoverification: release samples whose results meet stored rules.
+
+Each ``AutoverificationRule`` holds a list of conditions. A sample awaiting
+validation is released when at least one active rule applies to its test
+and every applicable rule passes. Supported conditions:
+
+    {"check": "within_range"}       every value inside the analyte's normal range
+    {"check": "flags_clear"}        no result is flagged
+    {"check": "complete_panel"}     a result exists for every analyte of the test
+    {"check": "limits", "analyte": "Hemoglobin", "low": 8, "high": 18}
+    {"check": "delta", "max_percent": 25, "days": 90}
+    {"check": "qc_in_control", "hours": 24, "event_types": ["QC Failure"]}
+
+``qc_in_control`` fails when a matching QCLog event was written inside the
+window, or when the latest QC run of an analyte on the sample was rejected
+by the Westgard rules on the instrument that ran the sample (its latest
+queue entry). Samples queued without an instrument fail if the analyte is
+out of control on any instrument.
+
+Rules are compiled once into Python closures (recompiled when the row's
+``updated_date`` changes) and evaluated over a whole batch of samples. The
+data they need is loaded with a fixed number of queries per batch.
+"""
+import datetime
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Sample, TestResult, TestAnalyte, InstrumentQueue, QCLog, QCStatistics, AutoverificationRule, ArchivedTestResult
+from .validation import chunked, release_samples
+
+
+ResultRow = namedtuple('ResultRow', 'analyte_id analyte_name value is_flagged flag_type low high')
+CompiledRule = namedtuple('CompiledRule', 'id name test_name checks history_days error')
+
+
+class RuleError(ValueError):
+    pass
+
+
+class SampleContext:
+    __slots__ = ('sample_id', 'test_name', 'patient_id', 'instrument', 'results')
+
+    def __init__(self, sample_id, test_name, patient_id):
+        self.sample_id = sample_id
+        self.test_name = test_name
+        self.patient_id = patient_id
+        self.instrument = ''
+        self.results = []
+
+
+class BatchContext:
+    """Data shared by every sample in one evaluation run."""
+
+    def __init__(self, now):
+        self.now = now
+        self.panels = {}
+        self.history = {}
+        self._qc = {}
+        self._out_of_control = None
+
+    def qc_failures(self, hours, event_types):
+        key = (hours, event_types)
+        if key not in self._qc:
+            since = self.now - datetime.timedelta(hours=hours)
+            self._qc[key] = QCLog.objects.filter(timestamp__gte=since, event_type__in=event_types).exists()
+        return self._qc[key]
+
+    def out_of_control(self):
+        """``{analyte_id: {instrument, ...}}`` of the QC series currently rejected."""
+        if self._out_of_control is None:
+            self._out_of_control = {}
+            for analyte_id, instrument in QCStatistics.objects.filter(in_control=False).values_list(
+                    'analyte_id', 'instrument'):
+                self._out_of_control.setdefault(analyte_id, set()).add(instrument)
+        return self._out_of_control
+
+
+# Condition compilers. Each returns check(sample, batch) -> failure reason or None.
+
+def compile_within_range(condition):
+    def check(sample, batch):
+        for result in sample.results:
+            if not result.low <= result.value <= result.high:
+                return f'{result.analyte_name} outside normal range'
+    return check
+
+
+def compile_flags_clear(condition):
+    def check(sample, batch):
+        for result in sample.results:
+            if result.is_flagged or result.flag_type:
+                return f'{result.analyte_name} flagged {result.flag_type}'.strip()
+    return check
+
+
+def compile_complete_panel(condition):
+    def check(sample, batch):
+        missing = batch.panels.get(sample.test_name, set()) - {result.analyte_id for result in sample.results}
+        if missing:
+            return f'{len(missing)} analyte(s) missing'
+    return check
+
+
+def compile_limits(condition):
+    try:
+        analyte = condition['analyte']
+        low = Decimal(str(condition['low'])) if condition.get('low') is not None else None
+        high = Decimal(str(condition['high'])) if condition.get('high') is not None else None
+    except (KeyError, ArithmeticError) as e:
+        raise RuleError(f'limits: {e}')
+
+    def check(sample, batch):
+        for result in sample.results:
+            if result.analyte_name != analyte:
+                continue
+            if (low is not None and result.value < low) or (high is not None and result.value > high):
+                return f'{analyte} outside autoverification limits'
+    return check
+
+
+def compile_delta(condition):
+    try:
+        max_fraction = Decimal(str(condition['max_percent'])) / 100
+    except (KeyError, ArithmeticError) as e:
+        raise RuleError(f'delta: {e}')
+
+    def check(sample, batch):
+        for result in sample.results:
+            previous = batch.history.get((sample.patient_id, result.analyte_id))
+            if previous is None or previous == 0:
+                continue
+            if abs(result.value - previous) / abs(previous) > max_fraction:
+                return f'{result.analyte_name} delta check failed'
+    return check
+
+
+def compile_qc_in_control(condition):
+    hours = int(condition.get('hours', 24))
+    event_types = tuple(condition.get('event_types', ['QC Failure']))
+
+    def check(sample, batch):
+        if batch.qc_failures(hours, event_types):
+            return 'QC failure logged in the last %d hours' % hours
+        out_of_control = batch.out_of_control()
+        for result in sample.results:
+            instruments = out_of_control.get(result.analyte_id)
+            if instruments and (not sample.instrument or sample.instrument in instruments):
+                return f'{result.analyte_name} QC out of control'
+    return check
+
+
+COMPILERS = {
+    'within_range': compile_within_range,
+    'flags_clear': compile_flags_clear,
+    'complete_panel': compile_complete_panel,
+    'limits': compile_limits,
+    'delta': compile_delta,
+    'qc_in_control': compile_qc_in_control,
+}
+
+
+def compile_rule(rule_id, name, test_name, conditions):
+    if not isinstance(conditions, list) or not conditions:
+        raise RuleError('conditions must be a non-empty list')
+    checks = []
+    history_days = 0
+    for condition in conditions:
+        compiler = COMPILERS.get(condition.get('check') if isinstance(condition, dict) else None)
+        if compiler is None:
+            raise RuleError(f'unknown check {condition!r}')
+        checks.append(compiler(condition))
+        if condition['check'] == 'delta':
+            history_days = max(history_days, int(condition.get('days', 90)))
+    return CompiledRule(rule_id, name, test_name, tuple(checks), history_days, None)
+
+
+# Per-process cache of compiled rules: {rule id: (updated_date, CompiledRule)}
+_compiled = {}
+
+
+def active_rules():
+    rules = []
+    seen = set()
+    rows = AutoverificationRule.objects.filter(is_active=True).values_list(
+        'id', 'name', 'test_name', 'conditions', 'updated_date')
+    for rule_id, name, test_name, conditions, updated_date in rows:
+        seen.add(rule_id)
+        cached = _compiled.get(rule_id)
+        if cached is None or cached[0] != updated_date:
+            try:
+                compiled = compile_rule(rule_id, name, test_name, conditions)
+            except (TypeError, ValueError) as e:
+                # Invalid rules hold back the samples they apply to
+                compiled = CompiledRule(rule_id, name, test_name, (), 0, str(e))
+            _compiled[rule_id] = cached = (updated_date, compiled)
+        rules.append(cached[1])
+    for rule_id in set(_compiled) - seen:
+        del _compiled[rule_id]
+    return rules
+
+
+def load_batch(sample_ids=None, limit=None, lock=False):
+    samples = Sample.objects.select_for_update(of=('self',)) if lock else Sample.objects.all()
+    samples = samples.filter(status=Sample.AWAITING_VALIDATION)
+    if sample_ids is not None:
+        samples = samples.filter(id__in=sample_ids)
+    samples = samples.order_by('processing_completed', 'id')
+    if limit:
+        samples = samples[:limit]
+
+    contexts = {
+        sample_id: SampleContext(sample_id, test_name, patient_id)
+        for sample_id, test_name, patient_id in samples.values_list(
+            'id', 'test_order__test_name', 'test_order__patient_id')
+    }
+    for ids in chunked(contexts):
+        rows = TestResult.objects.filter(sample_id__in=ids).values_list(
+            'sample_id', 'analyte_id', 'analyte__analyte_name', 'value', 'is_flagged', 'flag_type',
+            'analyte__normal_range_low', 'analyte__normal_range_high')
+        for sample_id, *result in rows:
+            contexts[sample_id].results.append(ResultRow(*result))
+        entries = InstrumentQueue.objects.filter(sample_id__in=ids).exclude(instrument='').order_by(
+            'added_date', 'id').values_list('sample_id', 'instrument')
+        for sample_id, instrument in entries:
+            contexts[sample_id].instrument = instrument  # the latest entry wins
+    return list(contexts.values())
+
+
+def load_history(batch, samples, days):
+    """
+    Most recent validated value per (patient, analyte) within ``days``,
+    including results already moved to the archive.
+    """
+    since = batch.now - datetime.timedelta(days=days)
+    patient_ids = {sample.patient_id for sample in samples}
+    for ids in chunked(patient_ids):
+        # Archived results are older than hot ones, so they are loaded first and overwritten
+        for model in (ArchivedTestResult, TestResult):
+            rows = model.objects.filter(
+                validated=True,
+                validated_date__gte=since,
+                sample__test_order__patient_id__in=ids,
+            ).order_by('validated_date').values_list('sample__test_order__patient_id', 'analyte_id', 'value')
+            for patient_id, analyte_id, value in rows:
+                batch.history[(patient_id, analyte_id)] = value
+
+
+def evaluate(samples, rules, batch):
+    """Return one ``{'sample_id', 'release', 'reasons'}`` dict per sample."""
+    outcomes = []
+    for sample in samples:
+        applicable = [rule for rule in rules if not rule.test_name or rule.test_name == sample.test_name]
+        reasons = []
+        if not sample.results:
+            reasons.append('no results')
+        elif not applicable:
+            reasons.append('no autoverification rule for this test')
+        for rule in applicable:
+            if rule.error:
+                reasons.append(f'{rule.name}: invalid rule ({rule.error})')
+                continue
+            for check in rule.checks:
+                reason = check(sample, batch)
+                if reason:
+                    reasons.append(f'{rule.name}: {reason}')
+                    break
+        outcomes.append({'sample_id': sample.sample_id, 'release': not reasons, 'reasons': reasons})
+    return outcomes
+
+
+def run_batch(sample_ids=None, limit=None, dry_run=False, lock=False):
+    now = timezone.now()
+    rules = active_rules()
+    samples = load_batch(sample_ids, limit, lock=lock)
+    batch = BatchContext(now)
+    if samples and rules:
+        test_names = {sample.test_name for sample in samples}
+        for test_name, analyte_id in TestAnalyte.objects.filter(test_name__in=test_names).values_list('test_name', 'id'):
+            batch.panels.setdefault(test_name, set()).add(analyte_id)
+        history_days = max(rule.history_days for rule in rules)
+        if history_days:
+            load_history(batch, samples, history_days)
+
+    outcomes = evaluate(samples, rules, batch)
+    if not dry_run:
+        release_samples([item['sample_id'] for item in outcomes if item['release']], user=None, now=now)
+    return outcomes
+
+
+def autoverify(sample_ids=None, limit=None, dry_run=False):
+    """
+    Evaluate the active rules against samples awaiting validation and, unless
+    ``dry_run``, release the ones that pass. Auto-released results have
+    ``validated_by`` left empty.
+    """
+    if dry_run:
+        return run_batch(sample_ids, limit, dry_run=True)
+    with transaction.atomic():
+        return run_batch(sample_ids, limit, lock=True)
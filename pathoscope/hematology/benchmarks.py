@@ -0,0 +1,75 @@
+"""
+Helpers shared by the ``bench_*`` management commands.
+
+Benchmarks run against synthetic rows created inside a transaction that is
+rolled back afterwards, so they can be pointed at a real database safely.
+"""
+import time
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from patient_portal.models import TestOrder
+from .models import Sample, TestResult, TestAnalyte, InstrumentQueue
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def synthetic_lab(samples=10000, analytes=5, batch_size=2000):
+    """
+    Create ``samples`` accessioned samples (with orders, queue entries and
+    ``analytes`` results each) and roll everything back on exit.
+    """
+    try:
+        with transaction.atomic():
+            tag = uuid.uuid4().hex[:8]
+            patients = User.objects.bulk_create(
+                [User(username=f'bench-{tag}-{i}', role=User.PATIENT) for i in range(max(1, samples // 10))],
+                batch_size=batch_size,
+            )
+            panel = TestAnalyte.objects.bulk_create([
+                TestAnalyte(test_name='CBC', analyte_name=f'Bench Analyte {i}', unit='g/dL',
+                            normal_range_low=Decimal('10.00'), normal_range_high=Decimal('20.00'))
+                for i in range(analytes)
+            ])
+            orders = TestOrder.objects.bulk_create([
+                TestOrder(patient=patients[i % len(patients)], test_type=TestOrder.HEMATOLOGY, test_name='CBC')
+                for i in range(samples)
+            ], batch_size=batch_size)
+            sample_objs = Sample.objects.bulk_create([
+                Sample(test_order=order, accession_number=f'HEM-{tag}-{i}', barcode=f'BAR-{tag}-{i}',
+                       status=Sample.AWAITING_VALIDATION)
+                for i, order in enumerate(orders)
+            ], batch_size=batch_size)
+            InstrumentQueue.objects.bulk_create([
+                InstrumentQueue(sample=sample, status=InstrumentQueue.WAITING) for sample in sample_objs
+            ], batch_size=batch_size)
+            TestResult.objects.bulk_create([
+                TestResult(sample=sample, analyte=analyte, value=Decimal(8 + (i + j) % 15),
+                           accessioned_date=sample.accessioned_date)
+                for i, sample in enumerate(sample_objs) for j, analyte in enumerate(panel)
+            ], batch_size=batch_size)
+            yield sample_objs
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def best_of(repeat, func):
+    """Run ``func`` ``repeat`` times and return ``(best seconds, last result)``."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
@@ -0,0 +1,123 @@
+"""
+Streaming exports of test results.
+
+Rows come from a values()-based serializer iterated with
+``.iterator(chunk_size=...)`` and are encoded one at a time, so memory use
+stays flat no matter how many results fall inside the date range. Results
+of archived samples (see ``hematology.archive``) come first, then the hot
+table's.
+"""
+import csv
+import datetime
+from itertools import chain
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from pathoscope.renderers import FastJSONRenderer
+from .fast_serializers import ValuesSerializer, PLAIN, DECIMAL, DATETIME
+from .models import ArchivedTestResult, TestResult
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class ResultExportRowSerializer(ValuesSerializer):
+    model = TestResult
+    fields = (
+        ('result_id', 'id', PLAIN),
+        ('sample_id', 'sample_id', PLAIN),
+        ('accession_number', 'sample__accession_number', PLAIN),
+        ('barcode', 'sample__barcode', PLAIN),
+        ('sample_status', 'sample__status', PLAIN),
+        ('accessioned_date', 'sample__accessioned_date', DATETIME),
+        ('patient_id', 'sample__test_order__patient_id', PLAIN),
+        ('patient_name', 'sample__test_order__patient__username', PLAIN),
+        ('test_name', 'sample__test_order__test_name', PLAIN),
+        ('analyte_id', 'analyte_id', PLAIN),
+        ('analyte_name', 'analyte__analyte_name', PLAIN),
+        ('unit', 'analyte__unit', PLAIN),
+        ('value', 'value', DECIMAL),
+        ('normal_range_low', 'analyte__normal_range_low', DECIMAL),
+        ('normal_range_high', 'analyte__normal_range_high', DECIMAL),
+        ('is_flagged', 'is_flagged', PLAIN),
+        ('flag_type', 'flag_type', PLAIN),
+        ('validated', 'validated', PLAIN),
+        ('validated_by', 'validated_by__username', PLAIN),
+        ('validated_date', 'validated_date', DATETIME),
+    )
+
+
+class ArchivedResultExportRowSerializer(ResultExportRowSerializer):
+    model = ArchivedTestResult
+
+
+def parse_date_range(start, end):
+    """
+    Turn inclusive ``YYYY-MM-DD`` bounds into an aware ``[start, end)``
+    datetime range. Raises ``ValueError`` on missing or invalid dates.
+    """
+    if not start or not end:
+        raise ValueError('start and end dates are required (YYYY-MM-DD)')
+    start_date = parse_date(start)
+    end_date = parse_date(end)
+    if start_date is None or end_date is None:
+        raise ValueError('Dates must be in YYYY-MM-DD format')
+    if end_date < start_date:
+        raise ValueError('end must not be before start')
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.datetime.combine(start_date, datetime.time.min, tzinfo=tz),
+        datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min, tzinfo=tz),
+    )
+
+
+def export_queryset(start, end):
+    # Filter on the result's own copy of the accession date so partitions outside the range are pruned
+    return TestResult.objects.filter(
+        accessioned_date__gte=start,
+        accessioned_date__lt=end,
+    ).order_by('accessioned_date', 'id')
+
+
+def archived_export_queryset(start, end):
+    return ArchivedTestResult.objects.filter(
+        sample__accessioned_date__gte=start,
+        sample__accessioned_date__lt=end,
+    ).order_by('sample__accessioned_date', 'id')
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    columns = [name for name, lookup, kind in ResultExportRowSerializer.fields]
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns).encode()
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns]).encode()
+
+
+def iter_ndjson(rows):
+    renderer = FastJSONRenderer()
+    for row in rows:
+        yield renderer.render(row) + b'\n'
+
+
+def iter_export(start, end, export_format='csv', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield encoded chunks of the results export for ``[start, end)``."""
+    rows = chain(
+        ArchivedResultExportRowSerializer(archived_export_queryset(start, end)).iter_rows(chunk_size=chunk_size),
+        ResultExportRowSerializer(export_queryset(start, end)).iter_rows(chunk_size=chunk_size),
+    )
+    if export_format == 'ndjson':
+        return iter_ndjson(rows)
+    return iter_csv(rows)
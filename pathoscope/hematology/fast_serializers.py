@@ -0,0 +1,201 @@
+"""
+Read-only serializers that build rows straight from ``.values_list()``.
+
+Each class mirrors a ModelSerializer in ``serializers.py`` and produces
+exactly the same JSON, but skips model instantiation and DRF's per-field
+dispatch, which dominates CPU time on large list responses.
+"""
+import datetime
+import decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Sample, TestResult, InstrumentQueue
+
+
+DECIMAL_CONTEXT = decimal.Context(prec=10)
+TWO_PLACES = decimal.Decimal('.01')
+
+# Field kinds
+PLAIN = 'plain'
+DECIMAL = 'decimal'
+DATETIME = 'datetime'
+
+
+def decimal_to_representation(value):
+    # Same output as serializers.DecimalField(max_digits=10, decimal_places=2)
+    if value is None:
+        return ''
+    if not isinstance(value, decimal.Decimal):
+        value = decimal.Decimal(str(value).strip())
+    return f'{value.quantize(TWO_PLACES, context=DECIMAL_CONTEXT):f}'
+
+
+def datetime_converter():
+    # Same output as serializers.DateTimeField with the default ISO-8601 format.
+    # The current timezone is resolved once per serialization, not per value.
+    field_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def to_representation(value):
+        if not value:
+            return None
+        if field_timezone is not None:
+            if timezone.is_aware(value):
+                value = value.astimezone(field_timezone)
+            else:
+                value = timezone.make_aware(value, field_timezone)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, datetime.timezone.utc)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return to_representation
+
+
+class Nested:
+    """Embeds another ValuesSerializer through a foreign key path."""
+
+    def __init__(self, serializer_class, path):
+        self.serializer_class = serializer_class
+        self.path = path
+
+
+def _lookups(specs, prefix=''):
+    lookups = []
+    for name, lookup, kind in specs:
+        if isinstance(lookup, Nested):
+            lookups.extend(_lookups(kind, f'{prefix}{lookup.path}__'))
+        else:
+            lookups.append(prefix + lookup)
+    return lookups
+
+
+def _compile(specs, converters, offset=0):
+    """
+    Return ``(build, width)`` where ``build(row)`` turns a values_list
+    tuple into a dict starting at column ``offset``.
+    """
+    plan = []
+    index = offset
+    for name, lookup, kind in specs:
+        if isinstance(lookup, Nested):
+            build, width = _compile(kind, converters, index)
+            plan.append((name, None, build))
+            index += width
+        else:
+            plan.append((name, index, converters.get(kind)))
+            index += 1
+
+    def build(row):
+        item = {}
+        for name, position, convert in plan:
+            if position is None:
+                item[name] = convert(row)
+            elif convert is None:
+                item[name] = row[position]
+            else:
+                item[name] = convert(row[position])
+        return item
+
+    return build, index - offset
+
+
+class ValuesSerializer:
+    """
+    Base class for values()-backed read serializers.
+
+    ``fields`` is a sequence of ``(name, lookup, kind)`` tuples, where
+    ``lookup`` is a ``values()`` lookup (``'test_order__patient__username'``)
+    or a ``Nested`` instance for embedded objects.
+
+    ``fieldset`` is a tree from ``pathoscope.fieldsets.parse_fieldsets``;
+    only the requested columns are selected, so unrequested relations are
+    never joined.
+    """
+    model = None
+    fields = ()
+
+    def __init__(self, queryset=None, fieldset=None):
+        if queryset is None:
+            queryset = self.model.objects.all()
+        self.queryset = queryset
+        self.specs = self.select(fieldset)
+
+    @classmethod
+    def select(cls, fieldset=None):
+        # Nested specs carry their own selected specs in place of ``kind``
+        specs = []
+        for name, lookup, kind in cls.fields:
+            if fieldset is not None and name not in fieldset:
+                continue
+            if isinstance(lookup, Nested):
+                subset = None if fieldset is None else fieldset[name]
+                specs.append((name, lookup, lookup.serializer_class.select(subset)))
+            else:
+                specs.append((name, lookup, kind))
+        return specs
+
+    def iter_rows(self, chunk_size=None):
+        converters = {
+            DECIMAL: decimal_to_representation,
+            DATETIME: datetime_converter(),
+        }
+        build, _ = _compile(self.specs, converters)
+        # An empty selection still yields one (empty) object per row
+        rows = self.queryset.values_list(*(_lookups(self.specs) or ['pk']))
+        if chunk_size:
+            rows = rows.iterator(chunk_size=chunk_size)
+        for row in rows:
+            yield build(row)
+
+    @property
+    def data(self):
+        return list(self.iter_rows())
+
+
+class SampleRowSerializer(ValuesSerializer):
+    model = Sample
+    fields = (
+        ('id', 'id', PLAIN),
+        ('accession_number', 'accession_number', PLAIN),
+        ('barcode', 'barcode', PLAIN),
+        ('status', 'status', PLAIN),
+        ('patient_name', 'test_order__patient__username', PLAIN),
+        ('test_name', 'test_order__test_name', PLAIN),
+        ('accessioned_date', 'accessioned_date', DATETIME),
+        ('processing_started', 'processing_started', DATETIME),
+        ('processing_completed', 'processing_completed', DATETIME),
+    )
+
+
+class TestResultRowSerializer(ValuesSerializer):
+    model = TestResult
+    fields = (
+        ('id', 'id', PLAIN),
+        ('analyte', 'analyte_id', PLAIN),
+        ('analyte_name', 'analyte__analyte_name', PLAIN),
+        ('unit', 'analyte__unit', PLAIN),
+        ('value', 'value', DECIMAL),
+        ('is_flagged', 'is_flagged', PLAIN),
+        ('flag_type', 'flag_type', PLAIN),
+        ('validated', 'validated', PLAIN),
+        ('normal_range_low', 'analyte__normal_range_low', DECIMAL),
+        ('normal_range_high', 'analyte__normal_range_high', DECIMAL),
+    )
+
+
+class InstrumentQueueRowSerializer(ValuesSerializer):
+    model = InstrumentQueue
+    fields = (
+        ('id', 'id', PLAIN),
+        ('sample', 'sample_id', PLAIN),
+        ('sample_info', Nested(SampleRowSerializer, 'sample'), None),
+        ('instrument', 'instrument', PLAIN),
+        ('status', 'status', PLAIN),
+        ('added_date', 'added_date', DATETIME),
+        ('started_date', 'started_date', DATETIME),
+        ('completed_date', 'completed_date', DATETIME),
+    )
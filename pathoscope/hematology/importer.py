@@ -0,0 +1,451 @@
+"""
+Bulk import of legacy LIS data.
+
+The source is a directory holding one file per entity, loaded in order:
+
+    patients       legacy_id, username, email, first_name, last_name, phone,
+                   address, chronic_diseases, date_of_birth
+    appointments   legacy_id, patient_id, date, time, test_type, selected_tests,
+                   status, notes
+    test_orders    legacy_id, patient_id, appointment_id, test_type, test_name,
+                   order_date, status, price, report_url, slide_url
+    samples        legacy_id, test_order_id, accession_number, barcode, status,
+                   accessioned_date, processing_started, processing_completed
+    results        legacy_id, sample_id, test_name, analyte_name, unit,
+                   normal_range_low, normal_range_high, value, is_flagged,
+                   flag_type, validated, validated_date
+
+Each file may be ``<entity>.csv`` or ``<entity>.ndjson``. Foreign keys refer
+to the legacy ids of the parent files; ``selected_tests`` is a list in NDJSON
+and ``|``-separated in CSV.
+
+Rows are inserted with batched ``bulk_create`` and legacy ids are resolved
+through in-memory maps. After every committed batch the new ids are
+appended to ``<checkpoint_dir>/<entity>.map`` and the row count is stored in
+``<checkpoint_dir>/checkpoint.json``, so an interrupted import can resume.
+Each batch's ids are also written to ``<entity>.pending`` before its
+transaction commits; on resume a pending batch whose rows exist is recorded
+and one whose rows do not is dropped, so a crash between the commit and the
+checkpoint neither loses nor repeats the batch. The DDL of the deferred
+indexes is kept in ``indexes.json`` until they are rebuilt, so a resumed run
+rebuilds indexes that a killed run left dropped.
+"""
+import csv
+import datetime
+import json
+import os
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+
+from patient_portal.models import PatientProfile, Appointment, TestOrder
+from .models import Sample, TestResult, TestAnalyte
+
+User = get_user_model()
+
+ENTITIES = ['patients', 'appointments', 'test_orders', 'samples', 'results']
+ENTITY_MODELS = {
+    'patients': User,
+    'appointments': Appointment,
+    'test_orders': TestOrder,
+    'samples': Sample,
+    'results': TestResult,
+}
+
+
+class LegacyImportError(Exception):
+    pass
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes', 'y', 't')
+
+
+def to_datetime(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f'Invalid datetime: {value!r}')
+        parsed = datetime.datetime.combine(date, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def to_decimal(value, default=None):
+    if value in (None, ''):
+        return default
+    return Decimal(str(value))
+
+
+def open_source(directory, entity):
+    """Return an iterator of row dicts for ``entity``, or ``None`` if absent."""
+    for extension in ('ndjson', 'csv'):
+        path = os.path.join(directory, f'{entity}.{extension}')
+        if os.path.exists(path):
+            return _read_rows(path, extension)
+    return None
+
+
+def _read_rows(path, extension):
+    with open(path, newline='', encoding='utf-8') as handle:
+        if extension == 'csv':
+            yield from csv.DictReader(handle)
+        else:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+
+@contextmanager
+def preserve_timestamps(*fields):
+    """Let bulk_create keep imported values for ``auto_now_add`` fields."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def _secondary_indexes(table):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s",
+                [table],
+            )
+        else:
+            return []
+        rows = cursor.fetchall()
+    return [(name, sql) for name, sql in rows if not sql.upper().startswith('CREATE UNIQUE')]
+
+
+def write_json(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as handle:
+        json.dump(data, handle)
+    os.replace(tmp_path, path)
+
+
+def leftover_indexes(state_path, models):
+    """Indexes a killed run dropped and did not rebuild, from its ``indexes.json``."""
+    if state_path is None or not os.path.exists(state_path):
+        return []
+    with open(state_path) as handle:
+        saved = [tuple(index) for index in json.load(handle)]
+    existing = {name for model in models for name, _ in _secondary_indexes(model._meta.db_table)}
+    return [(name, sql) for name, sql in saved if name not in existing]
+
+
+@contextmanager
+def deferred_indexes(models, state_path=None):
+    """
+    Drop non-unique secondary indexes of ``models`` for the duration of the
+    import and rebuild them once at the end. Unique indexes stay in place
+    because the import relies on them for integrity. With ``state_path``,
+    the dropped DDL is saved there until the rebuild finishes, and indexes
+    an earlier run left dropped are rebuilt at the end too.
+    """
+    current = []
+    for model in models:
+        current.extend(_secondary_indexes(model._meta.db_table))
+    dropped = leftover_indexes(state_path, models) + current
+    if state_path is not None:
+        write_json(state_path, dropped)
+    with connection.cursor() as cursor:
+        for name, sql in current:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield dropped
+    finally:
+        with connection.cursor() as cursor:
+            for name, sql in dropped:
+                cursor.execute(sql)
+        if state_path is not None:
+            os.remove(state_path)
+
+
+def rebuild_leftover_indexes(models, state_path):
+    with connection.cursor() as cursor:
+        for name, sql in leftover_indexes(state_path, models):
+            cursor.execute(sql)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+
+class Checkpoint:
+    """Row counts and legacy id maps persisted after every committed batch."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, 'checkpoint.json')
+        self.indexes_path = os.path.join(directory, 'indexes.json')
+        self.done = {}
+        self.maps = {entity: {} for entity in ENTITIES}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as handle:
+                self.done = json.load(handle)
+        for entity in ENTITIES:
+            map_path = self.map_path(entity)
+            if os.path.exists(map_path):
+                with open(map_path, newline='') as handle:
+                    self.maps[entity] = {legacy_id: int(pk) for legacy_id, pk in csv.reader(handle)}
+        for entity in ENTITIES:
+            self.settle_pending(entity)
+
+    def reset(self):
+        for entity in ENTITIES:
+            for path in (self.map_path(entity), self.pending_path(entity)):
+                if os.path.exists(path):
+                    os.remove(path)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def map_path(self, entity):
+        return os.path.join(self.directory, f'{entity}.map')
+
+    def pending_path(self, entity):
+        return os.path.join(self.directory, f'{entity}.pending')
+
+    def begin(self, entity, pairs):
+        """Note a batch about to commit; call inside its transaction, after the rows are inserted."""
+        write_json(self.pending_path(entity), pairs)
+
+    def settle_pending(self, entity):
+        # The batch committed if its last row exists; pks of a rolled-back batch are never handed out again
+        path = self.pending_path(entity)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path) as handle:
+                pairs = [tuple(pair) for pair in json.load(handle)]
+        except ValueError:
+            pairs = []  # cut short while writing, before the commit
+        if pairs and ENTITY_MODELS[entity].objects.filter(pk=pairs[-1][1]).exists():
+            self.record(entity, pairs)
+        else:
+            os.remove(path)
+
+    def record(self, entity, pairs):
+        self.maps[entity].update(pairs)
+        with open(self.map_path(entity), 'a', newline='') as handle:
+            csv.writer(handle).writerows(pairs)
+        self.done[entity] = self.done.get(entity, 0) + len(pairs)
+        write_json(self.path, self.done)
+        if os.path.exists(self.pending_path(entity)):
+            os.remove(self.pending_path(entity))
+
+
+class LegacyImporter:
+
+    def __init__(self, source, checkpoint, batch_size=5000, report=print, report_every=50000):
+        self.source = source
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.report = report
+        self.report_every = report_every
+        self.analytes = {}
+        self.new_analytes = {}  # created in the current batch; cached once it commits
+
+    def run(self, defer_indexes=True):
+        models = [User, PatientProfile, Appointment, TestOrder, Sample, TestResult]
+        timestamps = [TestOrder._meta.get_field('order_date'), Sample._meta.get_field('accessioned_date')]
+        with preserve_timestamps(*timestamps):
+            if defer_indexes:
+                with deferred_indexes(models, self.checkpoint.indexes_path) as dropped:
+                    self.report(f'Deferred {len(dropped)} secondary indexes')
+                    self.import_all()
+                    self.report('Rebuilding indexes...')
+            else:
+                rebuild_leftover_indexes(models, self.checkpoint.indexes_path)
+                self.import_all()
+
+    def import_all(self):
+        self.analytes = {
+            (test_name, analyte_name): pk
+            for pk, test_name, analyte_name in TestAnalyte.objects.values_list('id', 'test_name', 'analyte_name')
+        }
+        for entity in ENTITIES:
+            rows = open_source(self.source, entity)
+            if rows is None:
+                self.report(f'{entity}: no source file, skipped')
+                continue
+            self.import_entity(entity, rows, getattr(self, f'build_{entity}'))
+
+    def import_entity(self, entity, rows, build):
+        skip = self.checkpoint.done.get(entity, 0)
+        started = time.perf_counter()
+        imported = 0
+        next_report = self.report_every
+        batch = []
+        for index, row in enumerate(rows):
+            if index < skip:
+                continue
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                imported += self.flush(entity, batch, build)
+                batch = []
+                if imported >= next_report:
+                    self.report_progress(entity, imported, started)
+                    next_report += self.report_every
+        if batch:
+            imported += self.flush(entity, batch, build)
+        if imported != next_report - self.report_every or not imported:
+            self.report_progress(entity, imported, started, skipped=skip)
+
+    def report_progress(self, entity, imported, started, skipped=None):
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed else 0
+        suffix = f', resumed after {skipped}' if skipped else ''
+        self.report(f'{entity}: {imported} rows in {elapsed:.1f}s ({rate:.0f} rows/s{suffix})')
+
+    def flush(self, entity, rows, build):
+        self.new_analytes = {}
+        with transaction.atomic():
+            legacy_ids, objects = build(rows)
+            pairs = [(legacy_id, obj.pk) for legacy_id, obj in zip(legacy_ids, objects)]
+            self.checkpoint.begin(entity, pairs)
+        self.checkpoint.record(entity, pairs)
+        return len(pairs)
+
+    def resolve(self, entity, legacy_id, required=True):
+        if legacy_id in (None, ''):
+            if required:
+                raise LegacyImportError(f'Missing {entity} reference')
+            return None
+        try:
+            return self.checkpoint.maps[entity][str(legacy_id)]
+        except KeyError:
+            raise LegacyImportError(f'Unknown {entity} legacy id {legacy_id!r}')
+
+    # Builders: create one batch and return (legacy ids, created objects)
+
+    def build_patients(self, rows):
+        users = User.objects.bulk_create([
+            User(
+                username=row['username'],
+                email=row.get('email') or '',
+                first_name=row.get('first_name') or '',
+                last_name=row.get('last_name') or '',
+                role=User.PATIENT,
+                password=make_password(None),
+            )
+            for row in rows
+        ])
+        PatientProfile.objects.bulk_create([
+            PatientProfile(
+                user=user,
+                phone=row.get('phone') or '',
+                address=row.get('address') or '',
+                chronic_diseases=row.get('chronic_diseases') or '',
+                date_of_birth=parse_date(row['date_of_birth']) if row.get('date_of_birth') else None,
+            )
+            for user, row in zip(users, rows)
+        ])
+        return [str(row['legacy_id']) for row in rows], users
+
+    def build_appointments(self, rows):
+        appointments = []
+        for row in rows:
+            selected_tests = row.get('selected_tests') or []
+            if isinstance(selected_tests, str):
+                selected_tests = [test for test in selected_tests.split('|') if test]
+            appointments.append(Appointment(
+                patient_id=self.resolve('patients', row['patient_id']),
+                date=parse_date(row['date']),
+                time=parse_time(row['time']),
+                test_type=row.get('test_type') or Appointment.HEMATOLOGY,
+                selected_tests=selected_tests,
+                status=row.get('status') or Appointment.COMPLETED,
+                notes=row.get('notes') or '',
+            ))
+        return [str(row['legacy_id']) for row in rows], Appointment.objects.bulk_create(appointments)
+
+    def build_test_orders(self, rows):
+        orders = TestOrder.objects.bulk_create([
+            TestOrder(
+                patient_id=self.resolve('patients', row['patient_id']),
+                appointment_id=self.resolve('appointments', row.get('appointment_id'), required=False),
+                test_type=row['test_type'],
+                test_name=row['test_name'],
+                order_date=to_datetime(row.get('order_date')) or timezone.now(),
+                status=row.get('status') or TestOrder.REPORT_READY,
+                price=to_decimal(row.get('price'), Decimal('0.00')),
+                report_url=row.get('report_url') or '',
+                slide_url=row.get('slide_url') or '',
+            )
+            for row in rows
+        ])
+        return [str(row['legacy_id']) for row in rows], orders
+
+    def build_samples(self, rows):
+        samples = Sample.objects.bulk_create([
+            Sample(
+                test_order_id=self.resolve('test_orders', row['test_order_id']),
+                accession_number=row['accession_number'],
+                barcode=row['barcode'],
+                status=row.get('status') or Sample.REPORT_READY,
+                accessioned_date=to_datetime(row.get('accessioned_date')) or timezone.now(),
+                processing_started=to_datetime(row.get('processing_started')),
+                processing_completed=to_datetime(row.get('processing_completed')),
+            )
+            for row in rows
+        ])
+        return [str(row['legacy_id']) for row in rows], samples
+
+    def analyte_id(self, row):
+        key = (row.get('test_name') or 'CBC', row['analyte_name'])
+        if key in self.analytes:
+            return self.analytes[key]
+        if key not in self.new_analytes:
+            analyte = TestAnalyte.objects.create(
+                test_name=key[0],
+                analyte_name=key[1],
+                unit=row.get('unit') or '',
+                normal_range_low=to_decimal(row.get('normal_range_low'), Decimal('0.00')),
+                normal_range_high=to_decimal(row.get('normal_range_high'), Decimal('0.00')),
+            )
+            self.new_analytes[key] = analyte.pk
+            # A rolled-back batch takes the analyte with it, so only remember committed ones
+            transaction.on_commit(partial(self.analytes.__setitem__, key, analyte.pk))
+        return self.new_analytes[key]
+
+    def build_results(self, rows):
+        sample_ids = [self.resolve('samples', row['sample_id']) for row in rows]
+        accessioned = dict(Sample.objects.filter(id__in=set(sample_ids)).values_list('id', 'accessioned_date'))
+        results = TestResult.objects.bulk_create([
+            TestResult(
+                sample_id=sample_id,
+                accessioned_date=accessioned.get(sample_id),
+                analyte_id=self.analyte_id(row),
+                value=to_decimal(row['value']),
+                is_flagged=to_bool(row.get('is_flagged')),
+                flag_type=row.get('flag_type') or '',
+                validated=to_bool(row.get('validated')),
+                validated_date=to_datetime(row.get('validated_date')),
+            )
+            for row, sample_id in zip(rows, sample_ids)
+        ])
+        return [str(row['legacy_id']) for row in rows], results
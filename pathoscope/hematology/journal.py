@@ -0,0 +1,98 @@
+"""
+Append-only journal of sample status transitions.
+
+Events are buffered in memory and written with ``bulk_create`` in batches:
+
+    @journaled
+    def post(self, request, ...):
+        ...
+        record_event(sample.id, old_status, sample.status, request.user)
+
+``journaled`` (or ``journal_batch()``) runs the view in a transaction and
+flushes the buffer at the end of it, so the events commit or roll back with
+the transitions they describe. ``record_event`` outside a batch writes the
+event straight away.
+"""
+import functools
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SampleEvent
+
+
+JOURNAL_BATCH_SIZE = 500
+
+_local = threading.local()
+
+
+class EventBuffer:
+    def __init__(self, batch_size=JOURNAL_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.events = []
+
+    def add(self, event):
+        self.events.append(event)
+        if len(self.events) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.events:
+            SampleEvent.objects.bulk_create(self.events, batch_size=self.batch_size)
+            self.events = []
+
+
+@contextmanager
+def journal_batch():
+    """Buffer events recorded inside the block and write them before it commits."""
+    if getattr(_local, 'buffer', None) is not None:
+        # Nested: the outermost batch flushes
+        yield _local.buffer
+        return
+    with transaction.atomic():
+        _local.buffer = EventBuffer()
+        try:
+            yield _local.buffer
+            _local.buffer.flush()
+        finally:
+            _local.buffer = None
+
+
+def journaled(view_method):
+    @functools.wraps(view_method)
+    def wrapper(*args, **kwargs):
+        with journal_batch():
+            return view_method(*args, **kwargs)
+    return wrapper
+
+
+def record_event(sample_id, from_status, to_status, actor=None, timestamp=None):
+    event = SampleEvent(
+        sample_id=sample_id,
+        from_status=from_status or '',
+        to_status=to_status,
+        actor=actor if actor is not None and actor.is_authenticated else None,
+        timestamp=timestamp or timezone.now(),
+    )
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        event.save()
+    else:
+        buffer.add(event)
+
+
+def sample_timeline(sample_id):
+    return SampleEvent.objects.filter(sample_id=sample_id).select_related('actor').order_by('timestamp', 'id')
+
+
+def events_between(since=None, until=None, to_status=None):
+    events = SampleEvent.objects.select_related('actor')
+    if since is not None:
+        events = events.filter(timestamp__gte=since)
+    if until is not None:
+        events = events.filter(timestamp__lt=until)
+    if to_status:
+        events = events.filter(to_status=to_status)
+    return events
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from hematology.archive import archive, ARCHIVE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Move closed samples and completed queue entries past the retention window to the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Defaults to HEMATOLOGY_ARCHIVE_RETENTION_DAYS')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Count what would be archived without moving it')
+
+    def handle(self, *args, **options):
+        counts = archive(
+            retention_days=options['retention_days'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'would be archived' if options['dry_run'] else 'archived'
+        self.stdout.write(
+            f"{counts['samples']} samples, {counts['results']} results and {counts['queue_entries']} queue entries "
+            f"completed before {counts['cutoff']:%Y-%m-%d %H:%M} {verb}"
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from hematology.autoverification import autoverify
+
+
+class Command(BaseCommand):
+    help = 'Apply the autoverification rules to samples awaiting validation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report decisions without releasing anything')
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--verbose-reasons', action='store_true', help='Print why each held sample was held')
+
+    def handle(self, *args, **options):
+        outcomes = autoverify(limit=options['limit'], dry_run=options['dry_run'])
+        released = [item for item in outcomes if item['release']]
+        held = [item for item in outcomes if not item['release']]
+
+        if options['verbose_reasons']:
+            for item in held:
+                self.stdout.write(f"sample {item['sample_id']}: {'; '.join(item['reasons'])}")
+
+        verb = 'would be released' if options['dry_run'] else 'released'
+        self.stdout.write(f'{len(released)} of {len(outcomes)} samples {verb}, {len(held)} held for manual validation')
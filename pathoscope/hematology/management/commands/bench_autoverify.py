@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from hematology.autoverification import run_batch
+from hematology.benchmarks import synthetic_lab, best_of
+from hematology.models import AutoverificationRule
+
+
+class Command(BaseCommand):
+    help = 'Measure autoverification throughput (samples/second) on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with synthetic_lab(samples=options['samples']):
+            AutoverificationRule.objects.create(name='Bench CBC', test_name='CBC', conditions=[
+                {'check': 'within_range'},
+                {'check': 'flags_clear'},
+                {'check': 'complete_panel'},
+                {'check': 'delta', 'max_percent': 25, 'days': 90},
+                {'check': 'qc_in_control', 'hours': 24},
+            ])
+            elapsed, outcomes = best_of(options['repeat'], lambda: run_batch(dry_run=True))
+            released = sum(1 for item in outcomes if item['release'])
+
+        self.stdout.write(
+            f'samples={len(outcomes)} releasable={released} '
+            f'time={elapsed * 1000:.1f} ms throughput={len(outcomes) / elapsed:.0f} samples/s'
+        )
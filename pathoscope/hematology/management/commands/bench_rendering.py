@@ -0,0 +1,49 @@
+import gzip
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from hematology.benchmarks import synthetic_lab, best_of
+from hematology.fast_serializers import SampleRowSerializer
+from hematology.models import Sample
+from pathoscope.renderers import FastJSONRenderer, orjson
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = 'Measure render time and bytes-on-the-wire for a dashboard-sized payload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with synthetic_lab(samples=options['samples']):
+            data = SampleRowSerializer(Sample.objects.order_by('-accessioned_date')).data
+
+        if orjson is None:
+            self.stdout.write('orjson is not installed; FastJSONRenderer falls back to JSONRenderer')
+
+        stdlib_time, stdlib_body = best_of(options['repeat'], lambda: JSONRenderer().render(data))
+        fast_time, fast_body = best_of(options['repeat'], lambda: FastJSONRenderer().render(data))
+        if stdlib_body != fast_body:
+            raise CommandError('FastJSONRenderer output differs from JSONRenderer')
+
+        self.stdout.write(f'rows={len(data)}')
+        self.stdout.write(f'JSONRenderer      {stdlib_time * 1000:8.1f} ms')
+        self.stdout.write(f'FastJSONRenderer  {fast_time * 1000:8.1f} ms  ({stdlib_time / fast_time:.1f}x)')
+
+        self.stdout.write(f'identity  {len(fast_body):>10} bytes')
+        gzip_time, gzipped = best_of(options['repeat'], lambda: gzip.compress(fast_body, compresslevel=6))
+        self.stdout.write(f'gzip      {len(gzipped):>10} bytes  {gzip_time * 1000:8.1f} ms')
+        if brotli is not None:
+            quality = getattr(settings, 'RESPONSE_COMPRESSION_BROTLI_QUALITY', 5)
+            br_time, compressed = best_of(options['repeat'], lambda: brotli.compress(fast_body, quality=quality))
+            self.stdout.write(f'br (q={quality})  {len(compressed):>10} bytes  {br_time * 1000:8.1f} ms')
+        else:
+            self.stdout.write('br        skipped (brotli is not installed)')
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from hematology.benchmarks import synthetic_lab, best_of
+from hematology.fast_serializers import SampleRowSerializer, TestResultRowSerializer, InstrumentQueueRowSerializer
+from hematology.models import Sample, TestResult, InstrumentQueue
+from hematology.serializers import SampleSerializer, TestResultSerializer, InstrumentQueueSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/second of the ModelSerializers against the values()-based read serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        cases = [
+            ('samples', SampleSerializer, SampleRowSerializer,
+             lambda: Sample.objects.select_related('test_order__patient').order_by('id')),
+            ('results', TestResultSerializer, TestResultRowSerializer,
+             lambda: TestResult.objects.select_related('analyte').order_by('id')),
+            ('queue', InstrumentQueueSerializer, InstrumentQueueRowSerializer,
+             lambda: InstrumentQueue.objects.select_related('sample__test_order__patient').order_by('id')),
+        ]
+
+        with synthetic_lab(samples=options['samples']):
+            for name, model_serializer, row_serializer, queryset in cases:
+                drf_time, drf_data = best_of(options['repeat'], lambda: model_serializer(queryset(), many=True).data)
+                fast_time, fast_data = best_of(options['repeat'], lambda: row_serializer(queryset()).data)
+
+                if renderer.render(drf_data) != renderer.render(fast_data):
+                    raise CommandError(f'{name}: values() output differs from {model_serializer.__name__}')
+
+                rows = len(fast_data)
+                self.stdout.write(
+                    f'{name:<8} rows={rows:<8} '
+                    f'serializer={rows / drf_time:>10.0f} rows/s  '
+                    f'values={rows / fast_time:>10.0f} rows/s  '
+                    f'speedup={drf_time / fast_time:.1f}x'
+                )
@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hematology.exports import EXPORT_FORMATS, DEFAULT_CHUNK_SIZE, parse_date_range, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Stream test results accessioned between two dates (inclusive) as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='YYYY-MM-DD')
+        parser.add_argument('--end', required=True, help='YYYY-MM-DD')
+        parser.add_argument('--format', dest='export_format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write to (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            start, end = parse_date_range(options['start'], options['end'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = iter_export(start, end, options['export_format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.flush()
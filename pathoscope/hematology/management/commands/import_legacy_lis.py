@@ -0,0 +1,44 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hematology.importer import Checkpoint, LegacyImporter, LegacyImportError
+
+
+class Command(BaseCommand):
+    help = ('Bulk-load patients, appointments, test orders, samples and results exported from a '
+            'legacy LIS (see hematology/importer.py for the file layout)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Directory containing <entity>.csv or <entity>.ndjson files')
+        parser.add_argument('--checkpoint-dir', help='Where to keep id maps and progress (default: <source>/.import)')
+        parser.add_argument('--resume', action='store_true', help='Continue an interrupted import')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--report-every', type=int, default=50000, help='Rows between progress lines')
+        parser.add_argument('--keep-indexes', action='store_true',
+                            help='Do not drop secondary indexes while loading')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if not os.path.isdir(source):
+            raise CommandError(f'{source} is not a directory')
+
+        checkpoint_dir = options['checkpoint_dir'] or os.path.join(source, '.import')
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        checkpoint = Checkpoint(checkpoint_dir)
+        if options['resume']:
+            checkpoint.load()
+        else:
+            checkpoint.reset()
+
+        importer = LegacyImporter(
+            source, checkpoint,
+            batch_size=options['batch_size'],
+            report=self.stdout.write,
+            report_every=options['report_every'],
+        )
+        try:
+            importer.run(defer_indexes=not options['keep_indexes'])
+        except (LegacyImportError, KeyError, ValueError) as e:
+            raise CommandError(f'Import stopped: {e}. Fix the source and rerun with --resume.')
+        self.stdout.write(self.style.SUCCESS('Import complete'))
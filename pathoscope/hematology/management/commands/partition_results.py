@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hematology.partitions import (PartitioningError, convert_to_partitioned, ensure_partitions,
+                                   detach_partition, list_partitions, parse_month)
+
+
+class Command(BaseCommand):
+    help = 'Manage monthly partitions of the TestResult table (PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Rebuild the table as a partitioned table (takes an exclusive lock)')
+        parser.add_argument('--create-ahead', type=int, metavar='MONTHS', default=None,
+                            help='Create missing partitions up to MONTHS months from now')
+        parser.add_argument('--detach', metavar='YYYY-MM', default=None,
+                            help='Detach one month; the partition is kept as a standalone table')
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Future months to create when converting')
+
+    def handle(self, *args, **options):
+        try:
+            if options['convert']:
+                convert_to_partitioned(months_ahead=options['months_ahead'])
+                self.stdout.write('TestResult converted to a partitioned table')
+            if options['create_ahead'] is not None:
+                created = ensure_partitions(months_ahead=options['create_ahead'])
+                self.stdout.write(f"Created {len(created)} partition(s){': ' + ', '.join(created) if created else ''}")
+            if options['detach']:
+                name = detach_partition(parse_month(options['detach']))
+                self.stdout.write(f'Detached {name}')
+            for name, bound in list_partitions():
+                self.stdout.write(f'{name}  {bound}')
+        except PartitioningError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from hematology.search import repair_indexes
+
+
+class Command(BaseCommand):
+    help = 'Recreate the SQLite FTS5 search triggers and rebuild the search indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        rebuilt = repair_indexes(options['database'], rebuild=True)
+        self.stdout.write(f'{len(rebuilt)} search indexes rebuilt')
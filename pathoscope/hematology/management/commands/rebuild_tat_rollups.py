@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from hematology.exports import parse_date_range
+from hematology.models import TATRollup
+from hematology.tat import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute turnaround-time rollups from samples and queue entries (backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', default=None, metavar='YYYY-MM-DD',
+                            help='Only rebuild intervals that ended on or after this date')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            if parse_date(options['since']) is None:
+                raise CommandError('--since must be in YYYY-MM-DD format')
+            since, _ = parse_date_range(options['since'], options['since'])
+        rebuild_rollups(since, options['batch_size'])
+        self.stdout.write(f'{TATRollup.objects.count()} rollup rows')
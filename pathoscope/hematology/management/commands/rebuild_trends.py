@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from hematology.trends import rebuild_points
+
+
+class Command(BaseCommand):
+    help = 'Recreate the per-patient analyte trend series from validated results (backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        created = rebuild_points(options['batch_size'])
+        self.stdout.write(f'{created} trend points')
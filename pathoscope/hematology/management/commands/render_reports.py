@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from patient_portal.models import TestOrder
+from hematology.reports import schedule_reports
+
+
+class Command(BaseCommand):
+    help = 'Render (or re-link) PDF reports for report-ready hematology test orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_order_ids', nargs='*', type=int)
+        parser.add_argument('--missing', action='store_true', help='Every report-ready order without a report_url')
+
+    def handle(self, *args, **options):
+        order_ids = list(options['test_order_ids'])
+        if options['missing']:
+            order_ids += TestOrder.objects.filter(
+                test_type=TestOrder.HEMATOLOGY, status=TestOrder.REPORT_READY, report_url='',
+            ).values_list('id', flat=True)
+        urls = schedule_reports(order_ids)
+        self.stdout.write(f'{len(urls)} report(s) ready, {len(set(urls.values()))} distinct')
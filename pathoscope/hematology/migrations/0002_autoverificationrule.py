@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-19 05:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hematology', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutoverificationRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('test_name', models.CharField(blank=True, max_length=100)),
+                ('conditions', models.JSONField(default=list)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-19 05:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hematology', '0002_autoverificationrule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QCMeasurement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('instrument', models.CharField(max_length=100)),
+                ('control_level', models.CharField(max_length=20)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('mean', models.FloatField(blank=True, null=True)),
+                ('sd', models.FloatField(blank=True, null=True)),
+                ('z_score', models.FloatField(blank=True, null=True)),
+                ('violations', models.JSONField(default=list)),
+                ('rejected', models.BooleanField(default=False)),
+                ('analyte', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='qc_measurements', to='hematology.testanalyte')),
+                ('technician', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['analyte', 'instrument', 'control_level', 'timestamp'], name='hematology__analyte_6c9304_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='QCStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('instrument', models.CharField(max_length=100)),
+                ('control_level', models.CharField(max_length=20)),
+                ('target_mean', models.FloatField(blank=True, null=True)),
+                ('target_sd', models.FloatField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('running_mean', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('recent_z', models.JSONField(default=list)),
+                ('in_control', models.BooleanField(default=True)),
+                ('last_measurement', models.DateTimeField(blank=True, null=True)),
+                ('analyte', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='qc_statistics', to='hematology.testanalyte')),
+            ],
+            options={
+                'unique_together': {('analyte', 'instrument', 'control_level')},
+            },
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# SQLite drops these triggers whenever a later migration rebuilds
+# hematology_qclog (AlterField and friends); pathoscope.fts.repair recreates
+# them after migrate, and manage.py rebuild_search_index does it on demand.
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE hematology_qclog_fts USING fts5("
+    "description, content='hematology_qclog', content_rowid='id')",
+    "CREATE TRIGGER hematology_qclog_fts_insert AFTER INSERT ON hematology_qclog BEGIN "
+    "INSERT INTO hematology_qclog_fts(rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER hematology_qclog_fts_delete AFTER DELETE ON hematology_qclog BEGIN "
+    "INSERT INTO hematology_qclog_fts(hematology_qclog_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER hematology_qclog_fts_update AFTER UPDATE OF description ON hematology_qclog BEGIN "
+    "INSERT INTO hematology_qclog_fts(hematology_qclog_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); "
+    "INSERT INTO hematology_qclog_fts(rowid, description) VALUES (new.id, new.description); END",
+    "INSERT INTO hematology_qclog_fts(hematology_qclog_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS hematology_qclog_fts_update",
+    "DROP TRIGGER IF EXISTS hematology_qclog_fts_delete",
+    "DROP TRIGGER IF EXISTS hematology_qclog_fts_insert",
+    "DROP TABLE IF EXISTS hematology_qclog_fts",
+]
+
+POSTGRESQL_FORWARD = [
+    "ALTER TABLE hematology_qclog ADD COLUMN search_vector tsvector",
+    "UPDATE hematology_qclog SET search_vector = to_tsvector('pg_catalog.english', description)",
+    "CREATE INDEX hematology_qclog_search_idx ON hematology_qclog USING GIN (search_vector)",
+    "CREATE TRIGGER hematology_qclog_search_update BEFORE INSERT OR UPDATE OF description ON hematology_qclog "
+    "FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(search_vector, 'pg_catalog.english', description)",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP TRIGGER IF EXISTS hematology_qclog_search_update ON hematology_qclog",
+    "ALTER TABLE hematology_qclog DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        except Exception:
+            return False
+        cursor.execute("DROP TABLE temp.fts5_probe")
+    return True
+
+
+def run_statements(schema_editor, sqlite, postgresql):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        if not sqlite_has_fts5(connection):
+            return  # search falls back to icontains
+        statements = sqlite
+    elif connection.vendor == 'postgresql':
+        statements = postgresql
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+def create_search_index(apps, schema_editor):
+    run_statements(schema_editor, SQLITE_FORWARD, POSTGRESQL_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    run_statements(schema_editor, SQLITE_BACKWARD, POSTGRESQL_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hematology', '0003_qc_measurements'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='qclog',
+            index=models.Index(fields=['timestamp', 'id'], name='hematology__timesta_34c30c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='qclog',
+            index=models.Index(fields=['technician', 'timestamp'], name='hematology__technic_e19251_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='qclog',
+            index=models.Index(fields=['event_type', 'timestamp'], name='hematology__event_t_ea7ad3_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hematology', '0004_qclog_search'),
+        ('patient_portal', '0003_alter_appointment_test_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedQueueEntry',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('sample_id', models.IntegerField(db_index=True)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('processing', 'Processing'), ('completed', 'Completed')], max_length=20)),
+                ('added_date', models.DateTimeField()),
+                ('started_date', models.DateTimeField(blank=True, null=True)),
+                ('completed_date', models.DateTimeField(blank=True, null=True)),
+                ('archived_date', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedSample',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('accession_number', models.CharField(max_length=50, unique=True)),
+                ('barcode', models.CharField(max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('received', 'Sample Received'), ('in_analysis', 'In Analysis'), ('awaiting_validation', 'Awaiting Validation'), ('report_ready', 'Report Ready')], max_length=30)),
+                ('accessioned_date', models.DateTimeField()),
+                ('processing_started', models.DateTimeField(blank=True, null=True)),
+                ('processing_completed', models.DateTimeField(blank=True, null=True)),
+                ('archived_date', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTestResult',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_flagged', models.BooleanField(default=False)),
+                ('flag_type', models.CharField(blank=True, max_length=20)),
+                ('validated', models.BooleanField(default=False)),
+                ('validated_date', models.DateTimeField(blank=True, null=True)),
+                ('archived_date', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='instrumentqueue',
+            index=models.Index(fields=['status', 'added_date'], name='hematology__status_f9c1be_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instrumentqueue',
+            index=models.Index(fields=['status', 'completed_date'], name='hematology__status_7e0c70_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sample',
+            index=models.Index(fields=['status', 'processing_completed'], name='hematology__status_2db774_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedsample',
+            name='test_order',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archived_sample', to='patient_portal.testorder'),
+        ),
+        migrations.AddField(
+            model_name='archivedtestresult',
+            name='analyte',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hematology.testanalyte'),
+        ),
+        migrations.AddField(
+            model_name='archivedtestresult',
+            name='sample',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='hematology.archivedsample'),
+        ),
+        migrations.AddField(
+            model_name='archivedtestresult',
+            name='validated_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
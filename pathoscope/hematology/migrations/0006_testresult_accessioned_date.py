@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+BACKFILL_ACCESSIONED_DATE = """
+UPDATE hematology_testresult
+SET accessioned_date = (
+    SELECT accessioned_date FROM hematology_sample WHERE hematology_sample.id = hematology_testresult.sample_id
+)
+WHERE accessioned_date IS NULL
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hematology', '0005_archive_tables'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testresult',
+            name='accessioned_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunSQL(
+            BACKFILL_ACCESSIONED_DATE,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['accessioned_date', 'id'], name='hematology__accessi_b643c9_idx'),
+        ),
+    ]
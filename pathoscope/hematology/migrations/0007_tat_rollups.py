@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hematology', '0006_testresult_accessioned_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TATRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('test_name', models.CharField(max_length=100)),
+                ('metric', models.CharField(choices=[('queue_wait', 'Queue Wait'), ('accession_to_start', 'Accession to Start'), ('start_to_complete', 'Start to Complete'), ('complete_to_report', 'Complete to Report'), ('accession_to_report', 'Accession to Report')], max_length=30)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+                ('histogram', models.JSONField(default=list)),
+            ],
+            options={
+                'unique_together': {('bucket_start', 'test_name', 'metric')},
+            },
+        ),
+    ]
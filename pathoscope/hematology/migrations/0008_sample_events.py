@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hematology', '0007_tat_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SampleEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sample_id', models.IntegerField()),
+                ('from_status', models.CharField(blank=True, max_length=30)),
+                ('to_status', models.CharField(max_length=30)),
+                ('timestamp', models.DateTimeField()),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sample_id', 'timestamp', 'id'], name='hematology__sample__8cb162_idx'), models.Index(fields=['timestamp', 'id'], name='hematology__timesta_2c0eec_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hematology', '0008_sample_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalytePoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patient_id', models.IntegerField()),
+                ('sample_id', models.IntegerField()),
+                ('taken', models.DateTimeField()),
+                ('value', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('flag_type', models.CharField(blank=True, max_length=20)),
+                ('analyte', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hematology.testanalyte')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient_id', 'analyte', 'taken'], name='hematology__patient_cdfa95_idx')],
+                'unique_together': {('sample_id', 'analyte')},
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:02
+
+from django.db import migrations
+
+from pathoscope import fts
+
+
+# Searched hematology tables and columns (see hematology.search). The
+# accounts_user and patient_portal_patientprofile indexes are created by
+# their own apps' migrations, next to the tables they follow.
+SOURCES = [
+    ('hematology_sample', ['accession_number', 'barcode']),
+    ('hematology_archivedsample', ['accession_number', 'barcode']),
+]
+
+
+def search_expression(columns):
+    return " || ' ' || ".join(columns)
+
+
+def run_statements(schema_editor, forward):
+    connection = schema_editor.connection
+    statements = []
+    if connection.vendor == 'sqlite':
+        if not fts.sqlite_supports(connection, 'trigram'):
+            return  # search falls back to icontains
+        for table, columns in SOURCES:
+            statements += fts.create_statements(table, columns, 'trigram') if forward else fts.drop_statements(table)
+    elif connection.vendor == 'postgresql':
+        if forward:
+            statements.append("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table, columns in SOURCES:
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} "
+                f"USING GIN (({search_expression(columns)}) gin_trgm_ops)" if forward
+                else f"DROP INDEX IF EXISTS {table}_search_idx"
+            )
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+def create_search_index(apps, schema_editor):
+    run_statements(schema_editor, forward=True)
+
+
+def drop_search_index(apps, schema_editor):
+    run_statements(schema_editor, forward=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hematology', '0009_analytepoint'),
+        # Front-desk search needs the patient indexes too
+        ('accounts', '0002_user_search'),
+        ('patient_portal', '0006_patientprofile_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hematology', '0010_front_desk_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedqueueentry',
+            name='instrument',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='instrumentqueue',
+            name='instrument',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:10
+
+from django.db import migrations, models
+
+
+# Rows written by bulk_create callers that skipped the column since 0006
+BACKFILL_ACCESSIONED_DATE = """
+UPDATE hematology_testresult
+SET accessioned_date = (
+    SELECT accessioned_date FROM hematology_sample WHERE hematology_sample.id = hematology_testresult.sample_id
+)
+WHERE accessioned_date IS NULL
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hematology', '0011_queue_entry_instrument'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            BACKFILL_ACCESSIONED_DATE,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='testresult',
+            name='accessioned_date',
+            field=models.DateTimeField(),
+        ),
+    ]
@@ -39,6 +39,11 @@ class Sample(models.Model):
     processing_started = models.DateTimeField(null=True, blank=True)
     processing_completed = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'processing_completed']),
+        ]
+    
     def __str__(self):
         return f"{self.accession_number} - {self.test_order.test_name}"
 
@@ -56,11 +61,18 @@ class InstrumentQueue(models.Model):
     ]
     
     sample = models.ForeignKey(Sample, on_delete=models.CASCADE, related_name='queue_entries')
+    instrument = models.CharField(max_length=100, blank=True)  # analyzer running the sample, as in QCMeasurement
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=WAITING)
     added_date = models.DateTimeField(auto_now_add=True)
     started_date = models.DateTimeField(null=True, blank=True)
     completed_date = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'added_date']),
+            models.Index(fields=['status', 'completed_date']),
+        ]
+    
     def __str__(self):
         return f"{self.sample.accession_number} - {self.status}"
 
@@ -75,6 +87,19 @@ class TestResult(models.Model):
     validated = models.BooleanField(default=False)
     validated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     validated_date = models.DateTimeField(null=True, blank=True)
+    # Copy of sample.accessioned_date, set by every writer; the PostgreSQL partition key (hematology.partitions)
+    accessioned_date = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['accessioned_date', 'id']),
+        ]
+    
+    def save(self, *args, **kwargs):
+        # Only copied from an already loaded sample; callers holding a bare sample_id pass the date
+        if self.accessioned_date is None and TestResult.sample.is_cached(self):
+            self.accessioned_date = self.sample.accessioned_date
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.sample.accession_number} - {self.analyte.analyte_name}: {self.value}"
@@ -87,5 +112,186 @@ class QCLog(models.Model):
     description = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        # Full-text search over description lives outside the ORM, see migration 0004
+        indexes = [
+            models.Index(fields=['timestamp', 'id']),
+            models.Index(fields=['technician', 'timestamp']),
+            models.Index(fields=['event_type', 'timestamp']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} by {self.technician.username} at {self.timestamp}"
+
+
+# Autoverification rules, stored as data and compiled by hematology.autoverification
+class AutoverificationRule(models.Model):
+    name = models.CharField(max_length=100)
+    test_name = models.CharField(max_length=100, blank=True)  # blank applies to every test
+    conditions = models.JSONField(default=list)  # e.g. [{"check": "within_range"}, {"check": "delta", "max_percent": 25}]
+    is_active = models.BooleanField(default=True)
+    created_date = models.DateTimeField(auto_now_add=True)
+    updated_date = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.test_name or 'all tests'})"
+
+
+# Quantitative QC: one row per control run
+class QCMeasurement(models.Model):
+    analyte = models.ForeignKey(TestAnalyte, on_delete=models.CASCADE, related_name='qc_measurements')
+    instrument = models.CharField(max_length=100)
+    control_level = models.CharField(max_length=20)  # e.g. "L1", "L2"
+    value = models.DecimalField(max_digits=10, decimal_places=2)
+    technician = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    timestamp = models.DateTimeField(auto_now_add=True)
+    # Statistics in effect when the run was evaluated (used for Levey-Jennings charts)
+    mean = models.FloatField(null=True, blank=True)
+    sd = models.FloatField(null=True, blank=True)
+    z_score = models.FloatField(null=True, blank=True)
+    violations = models.JSONField(default=list)  # e.g. ["2-2s"]
+    rejected = models.BooleanField(default=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['analyte', 'instrument', 'control_level', 'timestamp']),
+        ]
+    
+    def __str__(self):
+        return f"{self.analyte.analyte_name} {self.control_level} on {self.instrument}: {self.value}"
+
+
+# Running QC statistics per analyte/instrument/control level, updated incrementally
+class QCStatistics(models.Model):
+    analyte = models.ForeignKey(TestAnalyte, on_delete=models.CASCADE, related_name='qc_statistics')
+    instrument = models.CharField(max_length=100)
+    control_level = models.CharField(max_length=20)
+    # Manufacturer/established targets; running values are used when unset
+    target_mean = models.FloatField(null=True, blank=True)
+    target_sd = models.FloatField(null=True, blank=True)
+    # Welford accumulators over accepted runs
+    count = models.PositiveIntegerField(default=0)
+    running_mean = models.FloatField(default=0)
+    m2 = models.FloatField(default=0)
+    recent_z = models.JSONField(default=list)  # latest z-scores, newest first
+    in_control = models.BooleanField(default=True)
+    last_measurement = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['analyte', 'instrument', 'control_level']
+    
+    def __str__(self):
+        return f"{self.analyte.analyte_name} {self.control_level} on {self.instrument}"
+
+
+# Cold storage, filled by hematology.archive. Rows keep the id they had in the hot table.
+class ArchivedSample(models.Model):
+    id = models.IntegerField(primary_key=True)
+    accession_number = models.CharField(max_length=50, unique=True)
+    test_order = models.OneToOneField(TestOrder, on_delete=models.CASCADE, related_name='archived_sample')
+    barcode = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=30, choices=Sample.STATUS_CHOICES)
+    accessioned_date = models.DateTimeField()
+    processing_started = models.DateTimeField(null=True, blank=True)
+    processing_completed = models.DateTimeField(null=True, blank=True)
+    archived_date = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.accession_number} (archived)"
+
+
+class ArchivedTestResult(models.Model):
+    id = models.IntegerField(primary_key=True)
+    sample = models.ForeignKey(ArchivedSample, on_delete=models.CASCADE, related_name='results')
+    analyte = models.ForeignKey(TestAnalyte, on_delete=models.CASCADE, related_name='+')
+    value = models.DecimalField(max_digits=10, decimal_places=2)
+    is_flagged = models.BooleanField(default=False)
+    flag_type = models.CharField(max_length=20, blank=True)
+    validated = models.BooleanField(default=False)
+    validated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    validated_date = models.DateTimeField(null=True, blank=True)
+    archived_date = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.sample.accession_number} - {self.analyte.analyte_name}: {self.value} (archived)"
+
+
+class ArchivedQueueEntry(models.Model):
+    id = models.IntegerField(primary_key=True)
+    sample_id = models.IntegerField(db_index=True)  # hot or archived sample
+    instrument = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=InstrumentQueue.STATUS_CHOICES)
+    added_date = models.DateTimeField()
+    started_date = models.DateTimeField(null=True, blank=True)
+    completed_date = models.DateTimeField(null=True, blank=True)
+    archived_date = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Sample {self.sample_id} - {self.status} (archived)"
+
+
+# Turnaround-time rollups: one latency histogram per hour, test and interval (see hematology.tat)
+class TATRollup(models.Model):
+    QUEUE_WAIT = 'queue_wait'
+    ACCESSION_TO_START = 'accession_to_start'
+    START_TO_COMPLETE = 'start_to_complete'
+    COMPLETE_TO_REPORT = 'complete_to_report'
+    ACCESSION_TO_REPORT = 'accession_to_report'
+    
+    METRIC_CHOICES = [
+        (QUEUE_WAIT, 'Queue Wait'),
+        (ACCESSION_TO_START, 'Accession to Start'),
+        (START_TO_COMPLETE, 'Start to Complete'),
+        (COMPLETE_TO_REPORT, 'Complete to Report'),
+        (ACCESSION_TO_REPORT, 'Accession to Report'),
+    ]
+    
+    bucket_start = models.DateTimeField()  # start of the hour the interval ended in
+    test_name = models.CharField(max_length=100)
+    metric = models.CharField(max_length=30, choices=METRIC_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    histogram = models.JSONField(default=list)  # counts per hematology.tat.BUCKET_BOUNDS bucket
+    
+    class Meta:
+        unique_together = ['bucket_start', 'test_name', 'metric']
+    
+    def __str__(self):
+        return f"{self.test_name} {self.metric} at {self.bucket_start}: {self.count}"
+
+
+# Append-only journal of sample status transitions, written through hematology.journal
+class SampleEvent(models.Model):
+    sample_id = models.IntegerField()  # kept after the sample is archived
+    from_status = models.CharField(max_length=30, blank=True)  # blank when the sample was created
+    to_status = models.CharField(max_length=30)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)  # empty for automatic transitions
+    timestamp = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['sample_id', 'timestamp', 'id']),
+            models.Index(fields=['timestamp', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"Sample {self.sample_id}: {self.from_status or '-'} -> {self.to_status}"
+
+
+# One validated result per row, keyed for per-patient trend reads without joins (see hematology.trends)
+class AnalytePoint(models.Model):
+    patient_id = models.IntegerField()  # kept after the sample is archived
+    analyte = models.ForeignKey(TestAnalyte, on_delete=models.CASCADE, related_name='+')
+    sample_id = models.IntegerField()
+    taken = models.DateTimeField()  # when the sample was accessioned
+    value = models.DecimalField(max_digits=10, decimal_places=2)
+    flag_type = models.CharField(max_length=20, blank=True)
+    
+    class Meta:
+        unique_together = [('sample_id', 'analyte')]
+        indexes = [
+            models.Index(fields=['patient_id', 'analyte', 'taken']),
+        ]
+    
     def __str__(self):
-        return f"{self.event_type} by {self.technician.username} at {self.timestamp}"
\ No newline at end of file
+        return f"Patient {self.patient_id} - {self.analyte_id} at {self.taken}: {self.value}"
@@ -0,0 +1,182 @@
+"""
+Optional monthly partitioning of TestResult on PostgreSQL.
+
+``convert_to_partitioned`` turns ``hematology_testresult`` into a table
+partitioned by range on ``accessioned_date`` (the sample's accession date,
+copied onto each result). It adds one partition per month plus a default
+partition for rows outside those months. Schema migrations keep working because
+the table name and columns are unchanged. The primary key constraint
+becomes a plain index on ``id``, since a partitioned table can only enforce
+uniqueness on columns that include the partition key.
+
+Queries that filter on ``TestResult.accessioned_date`` (the results export)
+only scan the partitions that overlap the range.
+
+    manage.py partition_results --convert
+    manage.py partition_results --create-ahead 3
+    manage.py partition_results --detach 2023-01
+"""
+import datetime
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import TestResult
+
+
+TABLE = TestResult._meta.db_table
+KEY = 'accessioned_date'
+SEQUENCE = f'{TABLE}_partitioned_id_seq'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_month(month):
+    return (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def parse_month(value):
+    match = re.fullmatch(r'(\d{4})-(\d{2})', value or '')
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise PartitioningError('Months must be in YYYY-MM format')
+    return datetime.date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_y{month.year}m{month.month:02d}'
+
+
+def require_postgresql():
+    if connection.vendor != 'postgresql':
+        raise PartitioningError('TestResult partitioning requires PostgreSQL')
+
+
+def is_partitioned(cursor):
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass)', [TABLE])
+    return cursor.fetchone()[0]
+
+
+def list_partitions():
+    """Return ``(name, bound expression)`` for every attached partition."""
+    require_postgresql()
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            ORDER BY child.relname
+        """, [TABLE])
+        return cursor.fetchall()
+
+
+def create_partition(cursor, month):
+    # Bounds are computed here, not user input; DDL cannot take bind parameters
+    tz = timezone.get_current_timezone()
+    start = datetime.datetime.combine(month, datetime.time.min, tzinfo=tz)
+    end = datetime.datetime.combine(next_month(month), datetime.time.min, tzinfo=tz)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    return partition_name(month)
+
+
+def months_between(first, last):
+    month = month_start(first)
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+
+def ensure_partitions(months_ahead=3, now=None):
+    """Create any missing partitions from this month to ``months_ahead`` months out."""
+    require_postgresql()
+    current = month_start(timezone.localtime(now or timezone.now()))
+    last = current
+    for _ in range(months_ahead):
+        last = next_month(last)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            raise PartitioningError(f'{TABLE} is not partitioned; run with --convert first')
+        existing = {name for name, _ in list_partitions()}
+        return [create_partition(cursor, month) for month in months_between(current, last)
+                if partition_name(month) not in existing]
+
+
+def convert_to_partitioned(months_ahead=3):
+    """
+    Rebuild ``hematology_testresult`` as a partitioned table and copy the rows
+    across. Runs in one transaction and holds an exclusive lock on the table
+    for its duration, so run it during a maintenance window.
+    """
+    require_postgresql()
+    old = f'{TABLE}_unpartitioned'
+    with transaction.atomic(), connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            raise PartitioningError(f'{TABLE} is already partitioned')
+
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexdef NOT LIKE 'CREATE UNIQUE%%'",
+            [TABLE],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min({KEY}), max({KEY}) FROM {TABLE}')
+        first, last = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {old}')
+        cursor.execute(f'CREATE TABLE {TABLE} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE ({KEY})')
+        # Identity columns are not supported on partitioned tables before PostgreSQL 17
+        cursor.execute(f'CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id')
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+
+        now = timezone.localtime()
+        until = month_start(now)
+        for _ in range(months_ahead):
+            until = next_month(until)
+        start = timezone.localtime(first) if first else now
+        if last:
+            until = max(until, month_start(timezone.localtime(last)))
+        for month in months_between(start, until):
+            create_partition(cursor, month)
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {old}')
+        cursor.execute(f'DROP TABLE {old}')
+        cursor.execute(f"SELECT setval('{SEQUENCE}', COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {TABLE}")
+
+        cursor.execute(f'CREATE INDEX {TABLE}_id_idx ON {TABLE} (id)')
+        # Definitions were read before the rename, so they already name the new parent
+        for name, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+
+def detach_partition(month):
+    """
+    Detach one month from the partitioned table. The partition stays in the
+    database as a standalone table (``hematology_testresult_yYYYYmMM``) to be
+    dumped or dropped separately.
+    """
+    require_postgresql()
+    name = partition_name(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if name not in {partition for partition, _ in list_partitions()}:
+            raise PartitioningError(f'{name} is not attached')
+        cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+    return name
@@ -0,0 +1,185 @@
+"""
+Quantitative QC with Westgard multirules.
+
+Each control run updates the ``QCStatistics`` row for its analyte,
+instrument and control level in O(1). The row keeps Welford accumulators
+(count, mean, M2) over accepted runs and the latest ten z-scores. That is
+enough to evaluate 1-2s (warning), 1-3s, 2-2s, R-4s, 4-1s and 10x without
+rescanning history.
+
+Until ``ESTABLISHING_RUNS`` accepted runs exist (and no target mean/SD is
+set), runs are accepted without evaluation while the running statistics
+settle.
+
+The free-text QC log is searched with SQLite FTS5 or a PostgreSQL tsvector
+column, both created and kept in sync by triggers in migration 0004.
+"""
+import math
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import QCMeasurement, QCStatistics, QCLog
+
+
+ESTABLISHING_RUNS = 20
+HISTORY_LENGTH = 10
+
+WARNING_RULES = {'1-2s'}
+QC_FAILURE_EVENT = 'QC Failure'
+
+
+def welford_update(count, mean, m2, value):
+    count += 1
+    delta = value - mean
+    mean += delta / count
+    m2 += delta * (value - mean)
+    return count, mean, m2
+
+
+def westgard(recent_z):
+    """
+    Return the rules violated by the newest z-score. ``recent_z`` is newest
+    first and holds at most ``HISTORY_LENGTH`` values.
+    """
+    z = recent_z[0]
+    violations = []
+    if abs(z) > 3:
+        violations.append('1-3s')
+    elif abs(z) > 2:
+        violations.append('1-2s')
+    if len(recent_z) >= 2:
+        previous = recent_z[1]
+        if (z > 2 and previous > 2) or (z < -2 and previous < -2):
+            violations.append('2-2s')
+        if (z > 2 and previous < -2) or (z < -2 and previous > 2):
+            violations.append('R-4s')
+    if len(recent_z) >= 4 and (all(value > 1 for value in recent_z[:4]) or all(value < -1 for value in recent_z[:4])):
+        violations.append('4-1s')
+    if len(recent_z) >= 10 and (all(value > 0 for value in recent_z[:10]) or all(value < 0 for value in recent_z[:10])):
+        violations.append('10x')
+    return violations
+
+
+def current_limits(stats):
+    """Return ``(mean, sd)`` used to evaluate the next run, or ``(None, None)``."""
+    if stats.target_mean is not None and stats.target_sd:
+        return stats.target_mean, stats.target_sd
+    if stats.count >= ESTABLISHING_RUNS:
+        sd = math.sqrt(stats.m2 / (stats.count - 1))
+        if sd > 0:
+            return stats.running_mean, sd
+    return None, None
+
+
+def record_measurement(analyte, instrument, control_level, value, technician=None):
+    """Store one control run, evaluate it and update the running statistics."""
+    with transaction.atomic():
+        stats, _ = QCStatistics.objects.select_for_update().get_or_create(
+            analyte=analyte, instrument=instrument, control_level=control_level,
+        )
+        mean, sd = current_limits(stats)
+        x = float(value)
+
+        z_score = None
+        violations = []
+        if mean is not None:
+            z_score = (x - mean) / sd
+            stats.recent_z = ([z_score] + stats.recent_z)[:HISTORY_LENGTH]
+            violations = westgard(stats.recent_z)
+
+        rejected = any(rule not in WARNING_RULES for rule in violations)
+        if not rejected:
+            stats.count, stats.running_mean, stats.m2 = welford_update(stats.count, stats.running_mean, stats.m2, x)
+        stats.in_control = not rejected
+
+        measurement = QCMeasurement.objects.create(
+            analyte=analyte,
+            instrument=instrument,
+            control_level=control_level,
+            value=value,
+            technician=technician,
+            mean=mean,
+            sd=sd,
+            z_score=z_score,
+            violations=violations,
+            rejected=rejected,
+        )
+        stats.last_measurement = measurement.timestamp
+        stats.save()
+
+        if rejected and technician is not None:
+            QCLog.objects.create(
+                technician=technician,
+                event_type=QC_FAILURE_EVENT,
+                description=(f"{analyte.analyte_name} {control_level} on {instrument}: "
+                             f"{value} violates {', '.join(violations)}"),
+            )
+    return measurement
+
+
+def levey_jennings(analyte_id, instrument, control_level, points=100):
+    """Latest ``points`` runs with the mean/SD in effect when each was evaluated."""
+    stats = QCStatistics.objects.filter(
+        analyte_id=analyte_id, instrument=instrument, control_level=control_level,
+    ).first()
+    if stats is None:
+        return None
+    rows = list(QCMeasurement.objects.filter(
+        analyte_id=analyte_id, instrument=instrument, control_level=control_level,
+    ).order_by('-timestamp').values('id', 'timestamp', 'value', 'mean', 'sd', 'z_score', 'violations', 'rejected')[:points])
+    rows.reverse()
+    mean, sd = current_limits(stats)
+    return {
+        'analyte': analyte_id,
+        'instrument': instrument,
+        'control_level': control_level,
+        'mean': mean,
+        'sd': sd,
+        'limits': None if mean is None else {f'{k}sd': [mean - k * sd, mean + k * sd] for k in (1, 2, 3)},
+        'in_control': stats.in_control,
+        'count': stats.count,
+        'points': rows,
+    }
+
+
+# Full-text index over QCLog.description, created by migration 0004
+SEARCH_INDEX = ('hematology_qclog', ['description'])
+
+_search_backend = None
+
+
+def qc_log_search_backend():
+    """Return ``'fts5'``, ``'tsvector'`` or ``None`` (plain icontains)."""
+    global _search_backend
+    if _search_backend is None:
+        backend = ''
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                if 'hematology_qclog_fts' in connection.introspection.table_names(cursor):
+                    backend = 'fts5'
+            elif connection.vendor == 'postgresql':
+                columns = connection.introspection.get_table_description(cursor, QCLog._meta.db_table)
+                if any(column.name == 'search_vector' for column in columns):
+                    backend = 'tsvector'
+        _search_backend = backend
+    return _search_backend or None
+
+
+def search_qc_log(queryset, query):
+    """Restrict a QCLog queryset to entries whose description matches ``query``."""
+    backend = qc_log_search_backend()
+    if backend == 'fts5':
+        # Quote every word so user input can never be parsed as FTS5 syntax; prefix-match the last
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return queryset
+        expression = ' '.join(f'"{term}"' for term in terms) + '*'
+        return queryset.filter(id__in=RawSQL(
+            'SELECT rowid FROM hematology_qclog_fts WHERE hematology_qclog_fts MATCH %s', [expression]))
+    if backend == 'tsvector':
+        return queryset.filter(id__in=RawSQL(
+            "SELECT id FROM hematology_qclog WHERE search_vector @@ websearch_to_tsquery('pg_catalog.english', %s)",
+            [query]))
+    return queryset.filter(description__icontains=query)
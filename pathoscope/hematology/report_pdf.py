@@ -0,0 +1,102 @@
+"""
+PDF rendering of hematology reports.
+
+A small PDF writer for text-only, tabular pages using the built-in
+Helvetica fonts, so reports need no third-party libraries. The output is
+deterministic: the same content always produces the same bytes.
+"""
+PAGE_WIDTH = 595  # A4 in points
+PAGE_HEIGHT = 842
+MARGIN = 50
+LINE_HEIGHT = 16
+ROWS_PER_PAGE = 38
+
+COLUMNS = [  # (header, x position)
+    ('Analyte', MARGIN),
+    ('Result', 250),
+    ('Unit', 320),
+    ('Reference range', 400),
+    ('Flag', 500),
+]
+
+
+def escape(text):
+    # Helvetica is set up with WinAnsiEncoding; the Greek mu in units maps to the micro sign
+    data = str(text).replace('μ', 'µ').encode('cp1252', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def text(x, y, value, size=10, bold=False):
+    font = b'/F2' if bold else b'/F1'
+    return b'BT %s %d Tf %d %d Td (%s) Tj ET\n' % (font, size, x, y, escape(value))
+
+
+def build_pdf(page_streams):
+    """Assemble a PDF from one content stream (bytes) per page."""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # page tree, filled in below
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    ]
+    kids = []
+    for stream in page_streams:
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+            % (PAGE_WIDTH, PAGE_HEIGHT, content_ref)
+        )
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        output += b'%010d 00000 n \n' % offset
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+def render_report(content):
+    """
+    Render the report described by ``content`` (see
+    ``hematology.reports.report_contents``) and return the PDF bytes.
+    """
+    header = [
+        ('Patient', content['patient_name']),
+        ('Test', content['test_name']),
+        ('Accession number', content['accession_number']),
+        ('Accessioned', content['accessioned_date']),
+        ('Validated', f"{content['validated_date']} by {content['validated_by'] or 'autoverification'}"),
+    ]
+    results = content['results']
+    chunks = [results[start:start + ROWS_PER_PAGE] for start in range(0, len(results), ROWS_PER_PAGE)] or [[]]
+
+    pages = []
+    for number, rows in enumerate(chunks, start=1):
+        y = PAGE_HEIGHT - MARGIN
+        stream = text(MARGIN, y, 'PathoScope Hematology Report', size=16, bold=True)
+        y -= 2 * LINE_HEIGHT
+        for label, value in header:
+            stream += text(MARGIN, y, f'{label}:', bold=True) + text(170, y, value)
+            y -= LINE_HEIGHT
+        y -= LINE_HEIGHT
+        for title, x in COLUMNS:
+            stream += text(x, y, title, bold=True)
+        y -= LINE_HEIGHT
+        for row in rows:
+            cells = [row['analyte_name'], row['value'], row['unit'],
+                     f"{row['normal_range_low']} - {row['normal_range_high']}", row['flag_type']]
+            for (_, x), value in zip(COLUMNS, cells):
+                stream += text(x, y, value, bold=bool(row['flag_type']))
+            y -= LINE_HEIGHT
+        stream += text(MARGIN, MARGIN, f'Page {number} of {len(chunks)}', size=8)
+        pages.append(stream)
+    return build_pdf(pages)
@@ -0,0 +1,119 @@
+"""
+Hematology report generation.
+
+After validation commits, the ``render_reports`` job (hematology.tasks) calls
+``schedule_reports``. It collects the validated content of each test order
+and hashes it. The hash names the PDF on disk
+(``REPORTS_ROOT/ab/abcdef....pdf``) and the download URL stored in
+``TestOrder.report_url``. If that file already exists the order just points
+at it. Otherwise the PDF is rendered and written first. The same content
+always maps to the same file, so unchanged reports are never re-rendered,
+and the hash doubles as the download ETag.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import reverse
+
+from patient_portal.models import TestOrder
+from patient_portal.results import invalidate_patients
+from .fast_serializers import decimal_to_representation
+from .models import Sample, TestResult
+from .report_pdf import render_report
+from .validation import chunked
+
+
+# Bump when the layout changes so every report is rendered again
+REPORT_VERSION = 1
+
+
+def reports_root():
+    return Path(getattr(settings, 'REPORTS_ROOT', settings.BASE_DIR / 'reports'))
+
+
+def report_path(digest):
+    return reports_root() / digest[:2] / f'{digest}.pdf'
+
+
+def report_url(digest):
+    return reverse('report-download', args=[digest])
+
+
+def content_digest(content):
+    payload = json.dumps({'version': REPORT_VERSION, 'content': content}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def report_contents(test_order_ids):
+    """Return ``{test_order_id: content}`` for orders with validated results."""
+    contents = {}
+    for ids in chunked(test_order_ids):
+        samples = {}
+        for sample_id, order_id, accession_number, accessioned, test_name, patient_name in Sample.objects.filter(
+                test_order_id__in=ids).values_list('id', 'test_order_id', 'accession_number', 'accessioned_date',
+                                                   'test_order__test_name', 'test_order__patient__username'):
+            samples[sample_id] = order_id
+            contents[order_id] = {
+                'patient_name': patient_name,
+                'test_name': test_name,
+                'accession_number': accession_number,
+                'accessioned_date': accessioned.isoformat(),
+                'validated_date': None,
+                'validated_by': None,
+                'results': [],
+            }
+        rows = TestResult.objects.filter(sample_id__in=list(samples), validated=True).order_by(
+            'analyte__analyte_name', 'id').values_list(
+            'sample_id', 'analyte__analyte_name', 'value', 'analyte__unit', 'analyte__normal_range_low',
+            'analyte__normal_range_high', 'flag_type', 'validated_by__username', 'validated_date')
+        for sample_id, name, value, unit, low, high, flag_type, validated_by, validated_date in rows:
+            content = contents[samples[sample_id]]
+            content['results'].append({
+                'analyte_name': name,
+                'value': decimal_to_representation(value),
+                'unit': unit,
+                'normal_range_low': decimal_to_representation(low),
+                'normal_range_high': decimal_to_representation(high),
+                'flag_type': flag_type,
+            })
+            if validated_date and (content['validated_date'] is None or validated_date.isoformat() > content['validated_date']):
+                content['validated_date'] = validated_date.isoformat()
+                content['validated_by'] = validated_by
+    return {order_id: content for order_id, content in contents.items() if content['results']}
+
+
+def write_report(path, data):
+    # Write then rename, so readers never see a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as handle:
+        handle.write(data)
+    os.replace(tmp, path)
+
+
+def schedule_reports(test_order_ids):
+    """
+    Point each order at its report, rendering the ones not already on disk.
+    Returns ``{test_order_id: report_url}``.
+    """
+    by_digest = {}
+    for order_id, content in report_contents(test_order_ids).items():
+        digest = content_digest(content)
+        by_digest.setdefault(digest, (content, []))[1].append(order_id)
+
+    urls = {}
+    for digest, (content, order_ids) in by_digest.items():
+        path = report_path(digest)
+        url = report_url(digest)
+        urls.update(dict.fromkeys(order_ids, url))
+        if not path.exists():
+            write_report(path, render_report(content))
+        changed = list(TestOrder.objects.filter(id__in=order_ids).exclude(report_url=url).values_list('id', 'patient_id'))
+        if changed:
+            TestOrder.objects.filter(id__in=[order_id for order_id, _ in changed]).update(report_url=url)
+            invalidate_patients(patient_id for _, patient_id in changed)
+    return urls
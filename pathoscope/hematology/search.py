@@ -0,0 +1,282 @@
+"""
+Front-desk search over patients and samples.
+
+One query string is matched against patient names (username, first and
+last name), ``PatientProfile.phone``, and the accession number and barcode
+of hot and archived samples. Each table is indexed by a migration of the
+app that owns it (accounts 0002, patient_portal 0006, hematology 0010):
+
+    SQLite        FTS5 tables with the trigram tokenizer, kept in sync by triggers
+    PostgreSQL    pg_trgm GIN indexes on the concatenated columns
+
+Both find substrings anywhere in a value, so partial names, phone fragments
+and the tail of a barcode all match. When a source has too few substring
+matches, rows sharing enough trigrams with the query are added, which
+catches small typos. Without either index, search falls back to
+``icontains``. SQLite drops the FTS5 triggers when a migration rebuilds an
+indexed table; ``pathoscope.fts.repair`` puts them back after ``migrate``.
+
+Candidates are ranked exact match, then prefix, then substring, then fuzzy
+(by the share of the query's trigrams they contain). All queries of one
+search share a time budget (``FRONT_DESK_SEARCH_BUDGET_MS``); a source that
+would overrun it is cut off and the response is marked ``partial``.
+"""
+import re
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Q
+
+from accounts.models import User
+from pathoscope.fts import repair
+from patient_portal.models import PatientProfile
+from . import qc
+from .models import ArchivedSample, Sample
+
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+DEFAULT_BUDGET_MS = 250
+FUZZY_THRESHOLD = 0.5
+
+EXACT, PREFIX, SUBSTRING, FUZZY = range(4)
+
+# Source name -> (table, searched columns); must match migration 0010
+SOURCES = {
+    'patients': ('accounts_user', ['username', 'first_name', 'last_name']),
+    'phones': ('patient_portal_patientprofile', ['phone']),
+    'samples': ('hematology_sample', ['accession_number', 'barcode']),
+    'archived_samples': ('hematology_archivedsample', ['accession_number', 'barcode']),
+}
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+_search_backend = None
+
+
+def repair_indexes(using='default', rebuild=False):
+    """
+    Recreate missing FTS5 triggers of the front-desk and QC log indexes (see
+    ``pathoscope.fts.repair``); returns the repaired tables.
+    """
+    return repair(connections[using], [*SOURCES.values(), qc.SEARCH_INDEX], rebuild)
+
+
+def search_backend():
+    """Return ``'fts5'``, ``'trigram'`` or ``None`` (plain icontains)."""
+    global _search_backend
+    if _search_backend is None:
+        backend = ''
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                if 'hematology_sample_fts' in connection.introspection.table_names(cursor):
+                    backend = 'fts5'
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'hematology_sample_search_idx'")
+                if cursor.fetchone():
+                    backend = 'trigram'
+        _search_backend = backend
+    return _search_backend or None
+
+
+def normalize(value):
+    return re.sub(r'[\W_]+', '', (value or '').lower())
+
+
+def trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def match_tier(query, values):
+    """``(tier, similarity)`` of the best-matching value, comparing letters and digits only."""
+    query = normalize(query)
+    best = (FUZZY, 0.0)
+    wanted = trigrams(query)
+    for value in values:
+        value = normalize(value)
+        if not value:
+            continue
+        if value == query:
+            return EXACT, 1.0
+        if value.startswith(query):
+            best = min(best, (PREFIX, 1.0))
+        elif query in value:
+            best = min(best, (SUBSTRING, 1.0))
+        elif wanted:
+            best = min(best, (FUZZY, -len(wanted & trigrams(value)) / len(wanted)))
+    return best[0], abs(best[1])
+
+
+class Deadline:
+    def __init__(self, budget_ms):
+        self.expires = time.monotonic() + budget_ms / 1000
+
+    def remaining_ms(self):
+        return max(0, int((self.expires - time.monotonic()) * 1000))
+
+    def expired(self):
+        return time.monotonic() >= self.expires
+
+
+def run_limited(deadline, sql, params):
+    """Rows of one raw query, cancelled when ``deadline`` passes."""
+    if deadline.expired():
+        raise BudgetExceeded
+    try:
+        if connection.vendor == 'postgresql':
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'SET LOCAL statement_timeout = {max(1, deadline.remaining_ms())}')
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+        with connection.cursor() as cursor:
+            # SQLite calls the handler every 1000 VM steps and aborts the query once it returns true
+            connection.connection.set_progress_handler(deadline.expired, 1000)
+            try:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+            finally:
+                connection.connection.set_progress_handler(None, 0)
+    except OperationalError:
+        if deadline.expired():
+            raise BudgetExceeded
+        raise
+
+
+def fts5_ids(source, terms, limit, deadline):
+    """Row ids of ``source``: substring matches of every term, then trigram matches."""
+    table, _ = SOURCES[source]
+    fts = f'{table}_fts'
+    sql = f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s ORDER BY rank LIMIT %s'
+    # Quote everything so user input can never be parsed as FTS5 syntax
+    ids = [row[0] for row in run_limited(deadline, sql, [' '.join(f'"{term}"' for term in terms), limit])]
+    if len(ids) < limit:
+        fuzzy = sorted(set().union(*(trigrams(term) for term in terms)))
+        if len(fuzzy) > 1:
+            rows = run_limited(deadline, sql, [' OR '.join(f'"{gram}"' for gram in fuzzy), limit * 2])
+            ids += [row[0] for row in rows if row[0] not in ids]
+    return ids
+
+
+def trigram_ids(source, terms, query, limit, deadline):
+    table, columns = SOURCES[source]
+    expression = '(' + " || ' ' || ".join(columns) + ')'
+    substring = ' AND '.join(f'{expression} ILIKE %s' for _ in terms)
+    ids = [row[0] for row in run_limited(
+        deadline,
+        f'SELECT id FROM {table} WHERE {substring} ORDER BY similarity({expression}, %s) DESC LIMIT %s',
+        [f'%{term}%' for term in terms] + [query, limit],
+    )]
+    if len(ids) < limit:
+        rows = run_limited(
+            deadline,
+            f'SELECT id FROM {table} WHERE %s <%% {expression} '
+            f'ORDER BY word_similarity(%s, {expression}) DESC LIMIT %s',
+            [query, query, limit * 2],
+        )
+        ids += [row[0] for row in rows if row[0] not in ids]
+    return ids
+
+
+def icontains_ids(source, terms, limit):
+    _, columns = SOURCES[source]
+    model = {'patients': User, 'phones': PatientProfile, 'samples': Sample, 'archived_samples': ArchivedSample}[source]
+    condition = Q()
+    for term in terms:
+        any_column = Q()
+        for column in columns:
+            any_column |= Q(**{f'{column}__icontains': term})
+        condition &= any_column
+    return list(model.objects.filter(condition).values_list('id', flat=True)[:limit])
+
+
+def source_ids(source, query, terms, limit, deadline):
+    backend = search_backend()
+    long_terms = [term for term in terms if len(term) >= 3]
+    if backend == 'fts5' and long_terms:
+        # Trigram indexes cannot look up terms shorter than three characters; the ranking still sees them
+        return fts5_ids(source, long_terms, limit, deadline)
+    if backend == 'trigram' and long_terms:
+        return trigram_ids(source, long_terms, query, limit, deadline)
+    if deadline.expired():
+        raise BudgetExceeded
+    return icontains_ids(source, terms, limit)
+
+
+def patient_rows(query, user_ids=(), profile_ids=()):
+    rows = User.objects.filter(Q(id__in=user_ids) | Q(patient_profile__id__in=profile_ids), role=User.PATIENT).values(
+        'id', 'username', 'first_name', 'last_name', 'patient_profile__phone')
+    results = []
+    for row in rows:
+        tier, similarity = match_tier(query, [row['username'], row['first_name'], row['last_name'],
+                                              f"{row['first_name']} {row['last_name']}", row['patient_profile__phone']])
+        results.append({
+            'type': 'patient',
+            'id': row['id'],
+            'username': row['username'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'phone': row['patient_profile__phone'] or '',
+            'tier': tier,
+            'similarity': similarity,
+        })
+    return results
+
+
+def sample_rows(query, model, ids):
+    rows = model.objects.filter(id__in=ids).values(
+        'id', 'accession_number', 'barcode', 'status', 'test_order_id', 'test_order__test_name',
+        'test_order__patient_id', 'test_order__patient__username')
+    results = []
+    for row in rows:
+        tier, similarity = match_tier(query, [row['accession_number'], row['barcode']])
+        results.append({
+            'type': 'sample',
+            'id': row['id'],
+            'accession_number': row['accession_number'],
+            'barcode': row['barcode'],
+            'status': row['status'],
+            'archived': model is ArchivedSample,
+            'test_order_id': row['test_order_id'],
+            'test_name': row['test_order__test_name'],
+            'patient_id': row['test_order__patient_id'],
+            'patient_name': row['test_order__patient__username'],
+            'tier': tier,
+            'similarity': similarity,
+        })
+    return results
+
+
+def front_desk_search(query, limit=DEFAULT_LIMIT, budget_ms=None):
+    """
+    ``{'results': [...], 'partial': bool}`` for ``query``, best match first.
+    Each result is a patient or a sample with its ``tier`` (0 exact, 1 prefix,
+    2 substring, 3 fuzzy).
+    """
+    query = query.strip()
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return {'results': [], 'partial': False}
+    if budget_ms is None:
+        budget_ms = getattr(settings, 'FRONT_DESK_SEARCH_BUDGET_MS', DEFAULT_BUDGET_MS)
+    deadline = Deadline(budget_ms)
+
+    ids = {}
+    partial = False
+    for source in SOURCES:
+        try:
+            ids[source] = source_ids(source, query, terms, limit, deadline)
+        except BudgetExceeded:
+            ids[source] = []
+            partial = True
+
+    results = patient_rows(query, ids['patients'], ids['phones'])
+    results += sample_rows(query, Sample, ids['samples'])
+    results += sample_rows(query, ArchivedSample, ids['archived_samples'])
+    results = [result for result in results
+               if result['tier'] < FUZZY or result['similarity'] >= FUZZY_THRESHOLD]
+    results.sort(key=lambda result: (result['tier'], -result['similarity'], result['type'], result['id']))
+    return {'results': results[:limit], 'partial': partial}
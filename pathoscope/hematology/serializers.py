@@ -1,15 +1,16 @@
 from rest_framework import serializers
-from .models import Sample, TestResult, TestAnalyte, InstrumentQueue, QCLog
+from .models import Sample, TestResult, TestAnalyte, InstrumentQueue, QCLog, QCMeasurement, SampleEvent
 from patient_portal.models import TestOrder
+from pathoscope.fieldsets import SparseFieldsetMixin
 
 
-class TestAnalyteSerializer(serializers.ModelSerializer):
+class TestAnalyteSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = TestAnalyte
         fields = '__all__'
 
 
-class SampleSerializer(serializers.ModelSerializer):
+class SampleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     patient_name = serializers.CharField(source='test_order.patient.username', read_only=True)
     test_name = serializers.CharField(source='test_order.test_name', read_only=True)
     
@@ -20,7 +21,7 @@ class SampleSerializer(serializers.ModelSerializer):
         read_only_fields = ['accession_number', 'barcode']
 
 
-class TestResultSerializer(serializers.ModelSerializer):
+class TestResultSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     analyte_name = serializers.CharField(source='analyte.analyte_name', read_only=True)
     unit = serializers.CharField(source='analyte.unit', read_only=True)
     normal_range_low = serializers.DecimalField(source='analyte.normal_range_low', max_digits=10, decimal_places=2, read_only=True)
@@ -32,17 +33,35 @@ class TestResultSerializer(serializers.ModelSerializer):
                   'validated', 'normal_range_low', 'normal_range_high']
 
 
-class InstrumentQueueSerializer(serializers.ModelSerializer):
+class InstrumentQueueSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     sample_info = SampleSerializer(source='sample', read_only=True)
     
     class Meta:
         model = InstrumentQueue
-        fields = ['id', 'sample', 'sample_info', 'status', 'added_date', 'started_date', 'completed_date']
+        fields = ['id', 'sample', 'sample_info', 'instrument', 'status', 'added_date', 'started_date', 'completed_date']
 
 
-class QCLogSerializer(serializers.ModelSerializer):
+class QCLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     technician_name = serializers.CharField(source='technician.username', read_only=True)
     
     class Meta:
         model = QCLog
-        fields = ['id', 'technician', 'technician_name', 'event_type', 'description', 'timestamp']
\ No newline at end of file
+        fields = ['id', 'technician', 'technician_name', 'event_type', 'description', 'timestamp']
+
+
+class QCMeasurementSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    technician_name = serializers.CharField(source='technician.username', read_only=True, default=None)
+    
+    class Meta:
+        model = QCMeasurement
+        fields = ['id', 'analyte', 'instrument', 'control_level', 'value', 'technician', 'technician_name',
+                  'timestamp', 'mean', 'sd', 'z_score', 'violations', 'rejected']
+        read_only_fields = ['technician', 'mean', 'sd', 'z_score', 'violations', 'rejected']
+
+
+class SampleEventSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    actor_name = serializers.CharField(source='actor.username', read_only=True, default=None)
+    
+    class Meta:
+        model = SampleEvent
+        fields = ['id', 'sample_id', 'from_status', 'to_status', 'actor', 'actor_name', 'timestamp']
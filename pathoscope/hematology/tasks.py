@@ -0,0 +1,13 @@
+from jobs.queue import task
+from patient_portal.models import Appointment
+from .reports import schedule_reports
+
+
+@task()
+def complete_appointment(appointment_id):
+    Appointment.objects.filter(id=appointment_id).update(status=Appointment.COMPLETED)
+
+
+@task()
+def render_reports(test_order_ids):
+    schedule_reports(test_order_ids)
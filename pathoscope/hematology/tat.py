@@ -0,0 +1,214 @@
+"""
+Turnaround-time (TAT) analytics.
+
+Every sample transition adds its interval to a ``TATRollup`` row, keyed by
+the hour the interval ended, the test and the metric:
+
+    queue_wait            queue entry added -> instrument started
+    accession_to_start    sample accessioned -> processing started
+    start_to_complete     processing started -> processing completed
+    complete_to_report    processing completed -> results validated
+    accession_to_report   sample accessioned -> results validated
+
+Each row holds a count, a sum and a histogram over fixed, geometrically
+spaced buckets. Histograms add up, so day and whole-range figures come from
+merging hour rows. Percentiles are interpolated inside a bucket, which is
+accurate to about half a bucket width (7%).
+"""
+import bisect
+import datetime
+from collections import defaultdict
+from itertools import chain
+
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ArchivedQueueEntry, ArchivedSample, InstrumentQueue, Sample, TATRollup
+
+
+# Upper bounds in seconds: 10 s to about 30 days, 15% apart; the last bucket is open-ended
+BUCKET_BOUNDS = [round(10 * 1.15 ** i) for i in range(90)]
+PERCENTILES = (50, 90, 99)
+INTERVALS = ('hour', 'day', 'total')
+
+
+def bucket_index(seconds):
+    return bisect.bisect_left(BUCKET_BOUNDS, seconds)
+
+
+def hour_start(moment):
+    return moment.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def record_intervals(intervals):
+    """
+    Add ``(metric, test_name, start, end)`` intervals to the rollups. Intervals
+    with a missing or reversed endpoint are skipped. Rows are updated under
+    lock, one per (hour, test, metric) touched.
+    """
+    pending = defaultdict(lambda: [0, 0.0, defaultdict(int)])
+    for metric, test_name, start, end in intervals:
+        if start is None or end is None or end < start:
+            continue
+        seconds = (end - start).total_seconds()
+        entry = pending[(hour_start(end), test_name, metric)]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2][bucket_index(seconds)] += 1
+    if not pending:
+        return
+
+    with transaction.atomic():
+        for (bucket_start, test_name, metric), (count, total, counts) in sorted(pending.items()):
+            rollup, _ = TATRollup.objects.select_for_update().get_or_create(
+                bucket_start=bucket_start, test_name=test_name, metric=metric,
+            )
+            histogram = rollup.histogram or [0] * (len(BUCKET_BOUNDS) + 1)
+            for index, value in counts.items():
+                histogram[index] += value
+            rollup.count += count
+            rollup.total_seconds += total
+            rollup.histogram = histogram
+            rollup.save()
+
+
+def record_processing_started(sample, queue_entry):
+    record_intervals([
+        (TATRollup.QUEUE_WAIT, sample.test_order.test_name, queue_entry.added_date, queue_entry.started_date),
+        (TATRollup.ACCESSION_TO_START, sample.test_order.test_name, sample.accessioned_date, sample.processing_started),
+    ])
+
+
+def record_processing_completed(sample):
+    record_intervals([
+        (TATRollup.START_TO_COMPLETE, sample.test_order.test_name, sample.processing_started, sample.processing_completed),
+    ])
+
+
+def reported_intervals(rows, reported):
+    """Report intervals for ``(test_name, accessioned, completed)`` rows reported at ``reported``."""
+    for test_name, accessioned, completed in rows:
+        yield TATRollup.COMPLETE_TO_REPORT, test_name, completed, reported
+        yield TATRollup.ACCESSION_TO_REPORT, test_name, accessioned, reported
+
+
+def percentile(histogram, count, q):
+    """Estimate the ``q``-th percentile (0-100) in seconds from a bucket histogram."""
+    if not count:
+        return None
+    rank = q / 100 * count
+    seen = 0
+    for index, bucket_count in enumerate(histogram):
+        if bucket_count and seen + bucket_count >= rank:
+            if index >= len(BUCKET_BOUNDS):
+                return float(BUCKET_BOUNDS[-1])
+            low = BUCKET_BOUNDS[index - 1] if index else 0
+            high = BUCKET_BOUNDS[index]
+            return low + (high - low) * (rank - seen) / bucket_count
+        seen += bucket_count
+    return float(BUCKET_BOUNDS[-1])
+
+
+def period_of(bucket_start, interval):
+    if interval == 'hour':
+        return bucket_start
+    if interval == 'day':
+        return timezone.localtime(bucket_start).date()
+    return None
+
+
+def report_order(item):
+    # Periods are all None for 'total'; comparing the flag first keeps None out of the comparison otherwise
+    period, name, metric = item[0]
+    return period is None, period, name or '', metric
+
+
+def tat_report(start, end, interval='day', test_name=None, metrics=None):
+    """
+    Percentiles per period, test and metric for rollups in ``[start, end)``.
+    ``interval`` is ``'hour'``, ``'day'`` or ``'total'`` (one group per test
+    and metric over the whole range).
+    """
+    rollups = TATRollup.objects.filter(bucket_start__gte=start, bucket_start__lt=end)
+    if test_name:
+        rollups = rollups.filter(test_name=test_name)
+    if metrics:
+        rollups = rollups.filter(metric__in=metrics)
+
+    groups = {}
+    for bucket_start, name, metric, count, total, histogram in rollups.values_list(
+            'bucket_start', 'test_name', 'metric', 'count', 'total_seconds', 'histogram').iterator():
+        key = (period_of(bucket_start, interval), name, metric)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = [0, 0.0, [0] * (len(BUCKET_BOUNDS) + 1)]
+        group[0] += count
+        group[1] += total
+        for index, value in enumerate(histogram):
+            group[2][index] += value
+
+    report = []
+    for (period, name, metric), (count, total, histogram) in sorted(groups.items(), key=report_order):
+        item = {'period': period, 'test_name': name, 'metric': metric, 'count': count,
+                'mean_seconds': total / count if count else None}
+        for q in PERCENTILES:
+            item[f'p{q}_seconds'] = percentile(histogram, count, q)
+        report.append(item)
+    return report
+
+
+def stored_intervals(since=None):
+    """
+    Every interval recorded by hot and archived samples and queue entries,
+    ending at or after ``since`` (all of them when ``None``), streamed.
+    """
+    def keep(end):
+        return since is None or (end is not None and hour_start(end) >= hour_start(since))
+
+    entries = InstrumentQueue.objects.exclude(started_date=None).values_list(
+        'sample__test_order__test_name', 'added_date', 'started_date')
+    # Archived entries keep a bare sample id, which may point at a hot or an archived sample
+    archived_entries = ArchivedQueueEntry.objects.exclude(started_date=None).annotate(test_name=Coalesce(
+        Subquery(Sample.objects.filter(id=OuterRef('sample_id')).values('test_order__test_name')[:1]),
+        Subquery(ArchivedSample.objects.filter(id=OuterRef('sample_id')).values('test_order__test_name')[:1]),
+    )).values_list('test_name', 'added_date', 'started_date')
+    for name, added, started in chain(entries.iterator(), archived_entries.iterator()):
+        if keep(started) and name is not None:
+            yield TATRollup.QUEUE_WAIT, name, added, started
+
+    columns = ('test_order__test_name', 'accessioned_date', 'processing_started', 'processing_completed', 'reported')
+    samples = Sample.objects.annotate(reported=Max('results__validated_date')).values_list(*columns)
+    archived = ArchivedSample.objects.annotate(reported=Max('results__validated_date')).values_list(*columns)
+    for name, accessioned, started, completed, reported in chain(samples.iterator(), archived.iterator()):
+        for metric, begin, finish in [
+            (TATRollup.ACCESSION_TO_START, accessioned, started),
+            (TATRollup.START_TO_COMPLETE, started, completed),
+            (TATRollup.COMPLETE_TO_REPORT, completed, reported),
+            (TATRollup.ACCESSION_TO_REPORT, accessioned, reported),
+        ]:
+            if keep(finish):
+                yield metric, name, begin, finish
+
+
+def rebuild_rollups(since=None, batch_size=2000):
+    """
+    Recompute the rollups from hot and archived samples and queue entries,
+    for intervals ending at or after ``since`` (everything when ``None``).
+    Intervals are added ``batch_size`` at a time, so memory stays flat.
+    Used to backfill; normal operation updates the rollups as samples move.
+    """
+    with transaction.atomic():
+        rollups = TATRollup.objects.all()
+        if since is not None:
+            rollups = rollups.filter(bucket_start__gte=hour_start(since))
+        rollups.delete()
+
+        batch = []
+        for interval in stored_intervals(since):
+            batch.append(interval)
+            if len(batch) == batch_size:
+                record_intervals(batch)
+                batch = []
+        record_intervals(batch)
@@ -1,3 +1,331 @@
+import datetime
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from jobs.models import Job
+from patient_portal.models import TestOrder
+from . import autoverification
+from .fast_serializers import InstrumentQueueRowSerializer, SampleRowSerializer, TestResultRowSerializer
+from .models import (AnalytePoint, AutoverificationRule, InstrumentQueue, QCLog, QCStatistics, Sample, SampleEvent,
+                     TATRollup, TestAnalyte, TestResult)
+from .serializers import InstrumentQueueSerializer, SampleSerializer, TestResultSerializer
+from .tat import BUCKET_BOUNDS, rebuild_rollups, tat_report
+from .validation import NOT_AWAITING_VALIDATION, NOT_FOUND, VALIDATED, validate_batch
+
+
+def create_sample(patient, number, test_name='CBC', **fields):
+    order = TestOrder.objects.create(patient=patient, test_type='hematology', test_name=test_name)
+    return Sample.objects.create(accession_number=f'ACC-{number}', barcode=f'BC-{number}', test_order=order, **fields)
+
+
+class TATReportOrderTests(TestCase):
+    def add_rollup(self, bucket_start, test_name='CBC', metric=TATRollup.QUEUE_WAIT):
+        histogram = [0] * (len(BUCKET_BOUNDS) + 1)
+        histogram[0] = 1
+        TATRollup.objects.create(bucket_start=bucket_start, test_name=test_name, metric=metric,
+                                 count=1, total_seconds=5, histogram=histogram)
+
+    def test_days_sort_chronologically(self):
+        for day in (10, 9, 11):
+            self.add_rollup(datetime.datetime(2026, 10, day, 12, tzinfo=datetime.timezone.utc))
+        report = tat_report(datetime.datetime(2026, 10, 1, tzinfo=datetime.timezone.utc),
+                            datetime.datetime(2026, 11, 1, tzinfo=datetime.timezone.utc), interval='day')
+        self.assertEqual([item['period'] for item in report],
+                         [datetime.date(2026, 10, 9), datetime.date(2026, 10, 10), datetime.date(2026, 10, 11)])
+
+    def test_hours_sort_chronologically(self):
+        for hour in (10, 9):
+            self.add_rollup(datetime.datetime(2026, 10, 9, hour, tzinfo=datetime.timezone.utc))
+        report = tat_report(datetime.datetime(2026, 10, 9, tzinfo=datetime.timezone.utc),
+                            datetime.datetime(2026, 10, 10, tzinfo=datetime.timezone.utc), interval='hour')
+        self.assertEqual([item['period'].hour for item in report], [9, 10])
+
+    def test_total_sorts_by_test_and_metric(self):
+        moment = datetime.datetime(2026, 10, 9, 9, tzinfo=datetime.timezone.utc)
+        self.add_rollup(moment, test_name='Iron', metric=TATRollup.QUEUE_WAIT)
+        self.add_rollup(moment, test_name='CBC', metric=TATRollup.START_TO_COMPLETE)
+        self.add_rollup(moment, test_name='CBC', metric=TATRollup.ACCESSION_TO_START)
+        report = tat_report(moment, moment + datetime.timedelta(hours=1), interval='total')
+        self.assertEqual([(item['test_name'], item['metric']) for item in report], [
+            ('CBC', TATRollup.ACCESSION_TO_START),
+            ('CBC', TATRollup.START_TO_COMPLETE),
+            ('Iron', TATRollup.QUEUE_WAIT),
+        ])
+
+
+class TATRebuildTests(TestCase):
+    def setUp(self):
+        patient = User.objects.create_user(username='patient', password='x', role=User.PATIENT)
+        base = datetime.datetime(2026, 10, 9, 8, tzinfo=datetime.timezone.utc)
+        for index in range(3):
+            sample = create_sample(patient, index)
+            started = base + datetime.timedelta(hours=index, minutes=20)
+            Sample.objects.filter(id=sample.id).update(
+                accessioned_date=base + datetime.timedelta(hours=index), processing_started=started,
+                processing_completed=started + datetime.timedelta(minutes=45))
+            entry = InstrumentQueue.objects.create(sample=sample)
+            InstrumentQueue.objects.filter(id=entry.id).update(
+                added_date=base + datetime.timedelta(hours=index, minutes=5), started_date=started)
+
+    def rollups(self):
+        return list(TATRollup.objects.order_by('bucket_start', 'test_name', 'metric').values_list(
+            'bucket_start', 'test_name', 'metric', 'count', 'total_seconds', 'histogram'))
+
+    def test_batches_add_up_to_a_single_pass(self):
+        rebuild_rollups(batch_size=1)
+        batched = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(batched, self.rollups())
+        self.assertEqual(TATRollup.objects.filter(metric=TATRollup.QUEUE_WAIT).count(), 3)
+        self.assertEqual(TATRollup.objects.filter(metric=TATRollup.START_TO_COMPLETE).count(), 3)
+
+    def test_since_keeps_earlier_rollups(self):
+        rebuild_rollups()
+        before = self.rollups()
+        rebuild_rollups(since=datetime.datetime(2026, 10, 9, 10, tzinfo=datetime.timezone.utc), batch_size=2)
+        self.assertEqual(before, self.rollups())
+
+
+class FastSerializerTests(TestCase):
+    """The values()-based serializers must render exactly what the ModelSerializers do."""
+
+    def setUp(self):
+        patient = User.objects.create_user(username='patient', password='x', role=User.PATIENT)
+        analyte = TestAnalyte.objects.create(test_name='CBC', analyte_name='Hemoglobin', unit='g/dL',
+                                             normal_range_low=Decimal('12'), normal_range_high=Decimal('17.5'))
+        started = datetime.datetime(2026, 10, 9, 8, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+        processed = create_sample(patient, 1, status=Sample.IN_ANALYSIS, processing_started=started)
+        create_sample(patient, 2)
+        for value, flag_type in ((Decimal('13.40'), ''), (Decimal('9.1'), 'LOW'), (Decimal('-0.5'), 'LOW')):
+            TestResult.objects.create(sample=processed, analyte=analyte, value=value,
+                                      is_flagged=bool(flag_type), flag_type=flag_type)
+        InstrumentQueue.objects.create(sample=processed, instrument='XN-1000', status=InstrumentQueue.PROCESSING,
+                                       started_date=started)
+
+    def assertSameData(self, fast_class, model_serializer_class, queryset, fieldset=None):
+        expected = [dict(item) for item in model_serializer_class(queryset, many=True).data]
+        if fieldset is not None:
+            expected = [{name: item[name] for name in fieldset} for item in expected]
+        self.assertEqual(fast_class(queryset, fieldset).data, expected)
+
+    def test_samples(self):
+        self.assertSameData(SampleRowSerializer, SampleSerializer, Sample.objects.order_by('id'))
+
+    def test_results(self):
+        self.assertSameData(TestResultRowSerializer, TestResultSerializer, TestResult.objects.order_by('id'))
+
+    def test_queue_with_nested_sample(self):
+        queryset = InstrumentQueue.objects.order_by('id')
+        expected = InstrumentQueueSerializer(queryset, many=True).data
+        fast = InstrumentQueueRowSerializer(queryset).data
+        self.assertEqual(fast, [dict(item, sample_info=dict(item['sample_info'])) for item in expected])
+
+    def test_datetimes_in_the_current_timezone(self):
+        with timezone.override('Asia/Tokyo'):
+            self.assertSameData(SampleRowSerializer, SampleSerializer, Sample.objects.order_by('id'))
+
+    def test_fieldset_selects_only_requested_fields(self):
+        self.assertSameData(SampleRowSerializer, SampleSerializer, Sample.objects.order_by('id'),
+                            {'id': None, 'status': None, 'patient_name': None})
+
+
+class BatchValidationTests(TestCase):
+    def setUp(self):
+        self.pathologist = User.objects.create_user(username='doctor', password='x', role=User.PATHOLOGIST)
+        patient = User.objects.create_user(username='patient', password='x', role=User.PATIENT)
+        analyte = TestAnalyte.objects.create(test_name='CBC', analyte_name='Hemoglobin', unit='g/dL',
+                                             normal_range_low=Decimal('12'), normal_range_high=Decimal('17.5'))
+        completed = datetime.datetime(2026, 10, 9, 9, tzinfo=datetime.timezone.utc)
+        self.samples = []
+        for number, (test_name, state) in enumerate([
+            ('CBC', Sample.AWAITING_VALIDATION),
+            ('CBC', Sample.AWAITING_VALIDATION),
+            ('Iron', Sample.AWAITING_VALIDATION),
+            ('CBC', Sample.IN_ANALYSIS),
+        ]):
+            sample = create_sample(patient, number, test_name, status=state,
+                                   processing_completed=completed + datetime.timedelta(hours=number))
+            TestResult.objects.create(sample=sample, analyte=analyte, value=Decimal('14.2'))
+            self.samples.append(sample)
+
+    def test_outcome_per_requested_sample(self):
+        first, _, _, in_analysis = self.samples
+        outcomes = validate_batch(self.pathologist, sample_ids=[first.id, in_analysis.id, 999999, first.id])
+        self.assertEqual([(item['sample_id'], item['outcome']) for item in outcomes], [
+            (first.id, VALIDATED),
+            (in_analysis.id, NOT_AWAITING_VALIDATION),
+            (999999, NOT_FOUND),
+        ])
+        self.assertEqual(outcomes[0]['status'], Sample.REPORT_READY)
+        self.assertEqual(Sample.objects.get(id=in_analysis.id).status, Sample.IN_ANALYSIS)
+
+    def test_release_updates_results_orders_and_side_tables(self):
+        first = self.samples[0]
+        validate_batch(self.pathologist, sample_ids=[first.id])
+        first.refresh_from_db()
+        self.assertEqual(first.status, Sample.REPORT_READY)
+        self.assertEqual(first.test_order.status, TestOrder.REPORT_READY)
+        result = first.results.get()
+        self.assertTrue(result.validated)
+        self.assertEqual(result.validated_by, self.pathologist)
+        self.assertEqual(SampleEvent.objects.filter(sample_id=first.id, to_status=Sample.REPORT_READY).count(), 1)
+        self.assertEqual(AnalytePoint.objects.filter(sample_id=first.id).count(), 1)
+        self.assertTrue(TATRollup.objects.filter(metric=TATRollup.COMPLETE_TO_REPORT).exists())
+        job = Job.objects.get(name='hematology.tasks.render_reports')
+        self.assertEqual(job.kwargs, {'test_order_ids': [first.test_order_id]})
+
+    def test_filters_take_oldest_awaiting_samples_first(self):
+        outcomes = validate_batch(self.pathologist, test_name='CBC', limit=1)
+        self.assertEqual([item['sample_id'] for item in outcomes], [self.samples[0].id])
+        outcomes = validate_batch(self.pathologist, completed_before=self.samples[2].processing_completed)
+        self.assertEqual([item['sample_id'] for item in outcomes], [self.samples[1].id])
+
+    def test_already_released_samples_are_not_journaled_twice(self):
+        first = self.samples[0]
+        validate_batch(self.pathologist, sample_ids=[first.id])
+        outcomes = validate_batch(self.pathologist, sample_ids=[first.id])
+        self.assertEqual(outcomes[0]['outcome'], NOT_AWAITING_VALIDATION)
+        self.assertEqual(SampleEvent.objects.filter(sample_id=first.id).count(), 1)
+
+
+class InvalidQueryParameterTests(TestCase):
+    """Malformed filters are the client's fault: 400, never 500."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='tech', password='x', role=User.LAB_TECH)
+        self.client.force_authenticate(self.user)
+
+    def assertBadRequest(self, url):
+        self.assertEqual(self.client.get(url).status_code, 400, url)
+
+    def test_qc_log(self):
+        self.assertBadRequest('/api/hematology/qc-log/?technician=abc')
+        self.assertBadRequest('/api/hematology/qc-log/?since=nope')
+        self.assertBadRequest('/api/hematology/qc-log/?until=2026-02-30T10:00')
+
+    def test_qc_measurements(self):
+        self.assertBadRequest('/api/hematology/qc/measurements/?analyte=abc')
+
+    def test_sample_events(self):
+        self.assertBadRequest('/api/hematology/samples/events/?since=2026-13-01T00:00')
+        self.assertBadRequest('/api/hematology/samples/events/?until=x')
+
+    def test_patient_trends(self):
+        self.assertBadRequest(f'/api/hematology/patients/{self.user.id}/trends/?since=2026-02-30T00:00')
+
+    def test_batch_validation(self):
+        for data in ({'completed_before': '2026-02-30T10:00'}, {'completed_before': 'soon'},
+                     {'sample_ids': 'all'}, {'sample_ids': [1], 'limit': 'many'}):
+            response = self.client.post('/api/hematology/samples/validate/', data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+
+
+class AutoverificationTests(TestCase):
+    def setUp(self):
+        autoverification._compiled.clear()
+        self.patient = User.objects.create_user(username='patient', password='x', role=User.PATIENT)
+        self.hemoglobin = TestAnalyte.objects.create(test_name='CBC', analyte_name='Hemoglobin', unit='g/dL',
+                                                     normal_range_low=Decimal('12'), normal_range_high=Decimal('17.5'))
+        self.platelets = TestAnalyte.objects.create(test_name='CBC', analyte_name='Platelets', unit='10^3/uL',
+                                                    normal_range_low=Decimal('150'), normal_range_high=Decimal('400'))
+        self.numbers = iter(range(1000))
+
+    def add_sample(self, hemoglobin='14.0', platelets='250', instrument='', flag_type='', test_name='CBC'):
+        sample = create_sample(self.patient, next(self.numbers), test_name, status=Sample.AWAITING_VALIDATION,
+                               processing_completed=timezone.now())
+        for analyte, value in ((self.hemoglobin, hemoglobin), (self.platelets, platelets)):
+            if value is not None:
+                TestResult.objects.create(sample=sample, analyte=analyte, value=Decimal(value),
+                                          is_flagged=bool(flag_type), flag_type=flag_type)
+        if instrument:
+            InstrumentQueue.objects.create(sample=sample, instrument=instrument)
+        return sample
+
+    def add_rule(self, *conditions, test_name='CBC'):
+        return AutoverificationRule.objects.create(name='default', test_name=test_name, conditions=list(conditions))
+
+    def autoverify(self, *samples, **kwargs):
+        outcomes = autoverification.autoverify([sample.id for sample in samples], **kwargs)
+        return {item['sample_id']: item for item in outcomes}
+
+    def test_passing_samples_are_released_without_a_validator(self):
+        self.add_rule({'check': 'within_range'}, {'check': 'flags_clear'}, {'check': 'complete_panel'})
+        sample = self.add_sample()
+        self.assertTrue(self.autoverify(sample)[sample.id]['release'])
+        sample.refresh_from_db()
+        self.assertEqual(sample.status, Sample.REPORT_READY)
+        self.assertIsNone(sample.results.first().validated_by)
+
+    def test_failing_samples_are_held_with_a_reason(self):
+        self.add_rule({'check': 'within_range'}, {'check': 'complete_panel'})
+        low = self.add_sample(hemoglobin='9.0')
+        partial = self.add_sample(platelets=None)
+        outcomes = self.autoverify(low, partial)
+        self.assertEqual(outcomes[low.id]['reasons'], ['default: Hemoglobin outside normal range'])
+        self.assertEqual(outcomes[partial.id]['reasons'], ['default: 1 analyte(s) missing'])
+        self.assertEqual(Sample.objects.filter(status=Sample.AWAITING_VALIDATION).count(), 2)
+
+    def test_flags_and_limits(self):
+        self.add_rule({'check': 'flags_clear'}, {'check': 'limits', 'analyte': 'Platelets', 'low': 100, 'high': 450})
+        flagged = self.add_sample(flag_type='HIGH')
+        high = self.add_sample(platelets='500')
+        accepted = self.add_sample(platelets='420')
+        outcomes = self.autoverify(flagged, high, accepted)
+        self.assertEqual(outcomes[flagged.id]['reasons'], ['default: Hemoglobin flagged HIGH'])
+        self.assertEqual(outcomes[high.id]['reasons'], ['default: Platelets outside autoverification limits'])
+        self.assertTrue(outcomes[accepted.id]['release'])
+
+    def test_samples_without_an_applicable_or_valid_rule_are_held(self):
+        self.add_rule({'check': 'within_range'}, test_name='Iron')
+        sample = self.add_sample()
+        self.assertEqual(self.autoverify(sample)[sample.id]['reasons'], ['no autoverification rule for this test'])
+        self.add_rule({'check': 'no_such_check'})
+        self.assertIn('invalid rule', self.autoverify(sample)[sample.id]['reasons'][0])
+
+    def test_delta_against_the_previous_validated_value(self):
+        previous = self.add_sample(hemoglobin='14.0')
+        validate_batch(None, sample_ids=[previous.id])
+        self.add_rule({'check': 'delta', 'max_percent': 25, 'days': 30})
+        similar = self.add_sample(hemoglobin='15.0')
+        jumped = self.add_sample(hemoglobin='9.0', platelets='250')
+        outcomes = self.autoverify(similar, jumped, dry_run=True)
+        self.assertTrue(outcomes[similar.id]['release'])
+        self.assertEqual(outcomes[jumped.id]['reasons'], ['default: Hemoglobin delta check failed'])
+
+    def test_qc_out_of_control_only_holds_samples_run_on_that_instrument(self):
+        self.add_rule({'check': 'qc_in_control'})
+        QCStatistics.objects.create(analyte=self.hemoglobin, instrument='XN-1', control_level='L1', in_control=False)
+        on_failed = self.add_sample(instrument='XN-1')
+        on_other = self.add_sample(instrument='XN-2')
+        unknown = self.add_sample()
+        outcomes = self.autoverify(on_failed, on_other, unknown, dry_run=True)
+        self.assertEqual(outcomes[on_failed.id]['reasons'], ['default: Hemoglobin QC out of control'])
+        self.assertTrue(outcomes[on_other.id]['release'])
+        self.assertFalse(outcomes[unknown.id]['release'])
+
+    def test_logged_qc_failure_holds_everything(self):
+        self.add_rule({'check': 'qc_in_control', 'hours': 4})
+        QCLog.objects.create(technician=self.patient, event_type='QC Failure', description='L2 out')
+        sample = self.add_sample(instrument='XN-2')
+        self.assertEqual(self.autoverify(sample, dry_run=True)[sample.id]['reasons'],
+                         ['default: QC failure logged in the last 4 hours'])
+
+    def test_dry_run_changes_nothing(self):
+        self.add_rule({'check': 'within_range'})
+        sample = self.add_sample()
+        self.assertTrue(self.autoverify(sample, dry_run=True)[sample.id]['release'])
+        sample.refresh_from_db()
+        self.assertEqual(sample.status, Sample.AWAITING_VALIDATION)
 
-# Create your tests here.
+    def test_edited_rules_are_recompiled(self):
+        rule = self.add_rule({'check': 'within_range'})
+        sample = self.add_sample(hemoglobin='9.0')
+        self.assertFalse(self.autoverify(sample, dry_run=True)[sample.id]['release'])
+        rule.conditions = [{'check': 'flags_clear'}]
+        rule.save()
+        self.assertTrue(self.autoverify(sample, dry_run=True)[sample.id]['release'])
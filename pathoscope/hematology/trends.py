@@ -0,0 +1,132 @@
+"""
+Per-patient analyte trends.
+
+``AnalytePoint`` keeps one narrow row per validated result, with the
+patient and accession time copied onto it and an index on
+``(patient_id, analyte, taken)``. A patient's haemoglobin history is then
+one index range scan instead of a join through every order, sample and
+result. Rows are appended when samples are released (``append_points``,
+called from ``hematology.validation``), and are never updated. Archiving
+samples leaves them in place, so trends cover the full history.
+
+Long series are downsampled with Largest-Triangle-Three-Buckets, which
+keeps real measured points and the peaks and troughs of the curve.
+"""
+from django.db import transaction
+
+from .models import AnalytePoint, ArchivedTestResult, TestAnalyte, TestResult
+
+
+DEFAULT_MAX_POINTS = 500
+MAX_POINTS_LIMIT = 5000
+
+
+def append_points(sample_ids):
+    """
+    Add the validated results of one chunk of samples to the series. Points
+    that already exist are left alone.
+    """
+    rows = TestResult.objects.filter(sample_id__in=sample_ids, validated=True).values_list(
+        'sample__test_order__patient_id', 'analyte_id', 'sample_id', 'sample__accessioned_date', 'value', 'flag_type')
+    AnalytePoint.objects.bulk_create(
+        [AnalytePoint(patient_id=patient_id, analyte_id=analyte_id, sample_id=sample_id, taken=taken,
+                      value=value, flag_type=flag_type)
+         for patient_id, analyte_id, sample_id, taken, value, flag_type in rows],
+        ignore_conflicts=True,
+    )
+
+
+def rebuild_points(batch_size=2000):
+    """Recreate the series from validated results in the hot and archive tables. Returns the row count."""
+    sources = [
+        TestResult.objects.filter(validated=True).values_list(
+            'sample__test_order__patient_id', 'analyte_id', 'sample_id', 'sample__accessioned_date', 'value', 'flag_type'),
+        ArchivedTestResult.objects.filter(validated=True).values_list(
+            'sample__test_order__patient_id', 'analyte_id', 'sample_id', 'sample__accessioned_date', 'value', 'flag_type'),
+    ]
+    created = 0
+    with transaction.atomic():
+        AnalytePoint.objects.all().delete()
+        for rows in sources:
+            batch = []
+            for patient_id, analyte_id, sample_id, taken, value, flag_type in rows.iterator(chunk_size=batch_size):
+                batch.append(AnalytePoint(patient_id=patient_id, analyte_id=analyte_id, sample_id=sample_id,
+                                          taken=taken, value=value, flag_type=flag_type))
+                if len(batch) == batch_size:
+                    created += len(AnalytePoint.objects.bulk_create(batch, ignore_conflicts=True))
+                    batch = []
+            created += len(AnalytePoint.objects.bulk_create(batch, ignore_conflicts=True))
+    return created
+
+
+def lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of ``(x, y, ...)`` tuples
+    sorted by ``x`` (numbers). Keeps the first and last point and one point
+    per bucket in between.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    previous = points[0]
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        # The next bucket's average is the third corner of the triangle
+        next_start, next_end = end, min(int((bucket + 2) * bucket_size) + 1, len(points))
+        following = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(point[0] for point in following) / len(following)
+        avg_y = sum(point[1] for point in following) / len(following)
+
+        best, best_area = None, -1
+        for point in points[start:end]:
+            area = abs((previous[0] - avg_x) * (point[1] - previous[1]) - (previous[0] - point[0]) * (avg_y - previous[1]))
+            if area > best_area:
+                best, best_area = point, area
+        sampled.append(best)
+        previous = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def patient_trends(patient_id, analyte_names=None, test_name=None, since=None, until=None,
+                   max_points=DEFAULT_MAX_POINTS):
+    """
+    ``[{analyte, unit, range, total_points, points: [[taken, value, flag_type], ...]}]``
+    for ``patient_id``, oldest point first, with each series downsampled to
+    at most ``max_points``.
+    """
+    analytes = TestAnalyte.objects.all()
+    if analyte_names:
+        analytes = analytes.filter(analyte_name__in=analyte_names)
+    if test_name:
+        analytes = analytes.filter(test_name=test_name)
+    analytes = {row[0]: row for row in analytes.values_list(
+        'id', 'test_name', 'analyte_name', 'unit', 'normal_range_low', 'normal_range_high')}
+
+    points = AnalytePoint.objects.filter(patient_id=patient_id, analyte_id__in=list(analytes))
+    if since:
+        points = points.filter(taken__gte=since)
+    if until:
+        points = points.filter(taken__lt=until)
+    series = {}
+    for analyte_id, taken, value, flag_type in points.order_by('analyte_id', 'taken', 'sample_id').values_list(
+            'analyte_id', 'taken', 'value', 'flag_type').iterator():
+        series.setdefault(analyte_id, []).append((taken.timestamp(), float(value), taken, flag_type))
+
+    trends = []
+    for analyte_id, rows in series.items():
+        _, test, name, unit, low, high = analytes[analyte_id]
+        trends.append({
+            'analyte_id': analyte_id,
+            'test_name': test,
+            'analyte_name': name,
+            'unit': unit,
+            'normal_range_low': low,
+            'normal_range_high': high,
+            'total_points': len(rows),
+            'points': [[taken, value, flag_type] for _, value, taken, flag_type in lttb(rows, max_points)],
+        })
+    trends.sort(key=lambda item: (item['test_name'], item['analyte_name']))
+    return trends
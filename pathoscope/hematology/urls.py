@@ -3,6 +3,8 @@ from .views import (
     AccessionSampleView,
     DashboardView,
     ScheduledPatientsView,
+    WorklistView,
+    FrontDeskSearchView,
     AddToQueueView,
     QueueListView,
     CompleteProcessingView,
@@ -10,19 +12,41 @@ from .views import (
     SampleResultsView,
     TestAnalytesView,
     ValidateResultsView,
-    QCLogView
+    BatchValidateResultsView,
+    AutoverifyView,
+    QCLogView,
+    ResultsExportView,
+    QCMeasurementView,
+    LeveyJenningsView,
+    TATAnalyticsView,
+    SampleTimelineView,
+    SampleEventListView,
+    ReportDownloadView,
+    PatientTrendsView
 )
 
 urlpatterns = [
     path('accession/', AccessionSampleView.as_view(), name='accession-sample'),
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
     path('scheduled-patients/', ScheduledPatientsView.as_view(), name='scheduled-patients'),
+    path('worklist/', WorklistView.as_view(), name='worklist'),
+    path('search/', FrontDeskSearchView.as_view(), name='front-desk-search'),
     path('queue/add/', AddToQueueView.as_view(), name='add-to-queue'),
     path('queue/', QueueListView.as_view(), name='queue-list'),
     path('samples/<int:sample_id>/complete/', CompleteProcessingView.as_view(), name='complete-processing'),
     path('samples/<int:sample_id>/results/enter/', EnterResultsView.as_view(), name='enter-results'),
     path('samples/<int:sample_id>/results/', SampleResultsView.as_view(), name='sample-results'),
     path('samples/<int:sample_id>/validate/', ValidateResultsView.as_view(), name='validate-results'),
+    path('samples/<int:sample_id>/timeline/', SampleTimelineView.as_view(), name='sample-timeline'),
+    path('samples/events/', SampleEventListView.as_view(), name='sample-events'),
+    path('samples/validate/', BatchValidateResultsView.as_view(), name='batch-validate-results'),
+    path('samples/autoverify/', AutoverifyView.as_view(), name='autoverify'),
     path('analytes/', TestAnalytesView.as_view(), name='test-analytes'),
     path('qc-log/', QCLogView.as_view(), name='qc-log'),
+    path('qc/measurements/', QCMeasurementView.as_view(), name='qc-measurements'),
+    path('qc/levey-jennings/', LeveyJenningsView.as_view(), name='levey-jennings'),
+    path('results/export/', ResultsExportView.as_view(), name='results-export'),
+    path('reports/<str:digest>/', ReportDownloadView.as_view(), name='report-download'),
+    path('analytics/tat/', TATAnalyticsView.as_view(), name='tat-analytics'),
+    path('patients/<int:patient_id>/trends/', PatientTrendsView.as_view(), name='patient-trends'),
 ]
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""
+Result validation (sign-off) with set-based updates.
+
+Validating a sample marks its results as validated and moves the sample and
+its test order to REPORT_READY. ``release_samples`` does this for any number
+of samples with three UPDATE statements per chunk of ids, instead of loading
+and saving each object. Turnaround-time rollups and the sample journal
+are updated for samples that were not already report-ready, their results
+are appended to the patients' trend series and dropped from the patient
+results cache, and a job is queued to render their reports.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from patient_portal.models import TestOrder
+from patient_portal.results import invalidate_patients
+from .models import Sample, TestResult
+from .tat import record_intervals, reported_intervals
+from .trends import append_points
+from .journal import journal_batch, record_event
+
+
+# Keeps IN (...) lists below SQLite's bound-parameter limit
+ID_CHUNK_SIZE = 500
+
+VALIDATED = 'validated'
+NOT_FOUND = 'not_found'
+NOT_AWAITING_VALIDATION = 'not_awaiting_validation'
+
+
+def chunked(ids, size=ID_CHUNK_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def release_samples(sample_ids, user, now=None):
+    """Validate the results of ``sample_ids`` and mark them report-ready."""
+    now = now or timezone.now()
+    with journal_batch():
+        for ids in chunked(sample_ids):
+            release_chunk(ids, user, now)
+
+
+def release_chunk(ids, user, now):
+    """Release one chunk of at most ``ID_CHUNK_SIZE`` samples."""
+    reported = list(Sample.objects.filter(id__in=ids).exclude(status=Sample.REPORT_READY).values_list(
+        'id', 'status', 'test_order_id', 'test_order__test_name', 'accessioned_date', 'processing_completed',
+        'test_order__patient_id'))
+    TestResult.objects.filter(sample_id__in=ids).update(
+        validated=True,
+        validated_by=user,
+        validated_date=now,
+    )
+    Sample.objects.filter(id__in=ids).update(status=Sample.REPORT_READY)
+    TestOrder.objects.filter(sample__id__in=ids).update(status=TestOrder.REPORT_READY)
+    record_intervals(reported_intervals([row[3:6] for row in reported], now))
+    append_points([row[0] for row in reported])
+    invalidate_patients(row[6] for row in reported)
+    for sample_id, previous, *_ in reported:
+        record_event(sample_id, previous, Sample.REPORT_READY, user, now)
+    if reported:
+        # By name: hematology.tasks imports this module through hematology.reports
+        enqueue('hematology.tasks.render_reports', test_order_ids=[row[2] for row in reported])
+
+
+def validate_batch(user, sample_ids=None, test_name=None, completed_before=None, limit=None):
+    """
+    Validate many AWAITING_VALIDATION samples in one transaction.
+
+    Either ``sample_ids`` is given, or every awaiting sample matching
+    ``test_name`` / ``completed_before`` is taken (oldest first, up to
+    ``limit``). Returns one ``{'sample_id', 'outcome'}`` dict per sample.
+    """
+    with transaction.atomic():
+        samples = Sample.objects.select_for_update()
+        if sample_ids is not None:
+            found = dict(samples.filter(id__in=sample_ids).values_list('id', 'status'))
+            requested = list(dict.fromkeys(sample_ids))
+        else:
+            candidates = samples.filter(status=Sample.AWAITING_VALIDATION)
+            if test_name:
+                candidates = candidates.filter(test_order__test_name=test_name)
+            if completed_before:
+                candidates = candidates.filter(processing_completed__lt=completed_before)
+            candidates = candidates.order_by('processing_completed', 'id')
+            if limit:
+                candidates = candidates[:limit]
+            found = dict(candidates.values_list('id', 'status'))
+            requested = list(found)
+
+        outcomes = []
+        release_ids = []
+        for sample_id in requested:
+            current = found.get(sample_id)
+            if current is None:
+                outcome = NOT_FOUND
+            elif current != Sample.AWAITING_VALIDATION:
+                outcome = NOT_AWAITING_VALIDATION
+            else:
+                outcome = VALIDATED
+                release_ids.append(sample_id)
+            outcomes.append({'sample_id': sample_id, 'outcome': outcome, 'status': current})
+
+        release_samples(release_ids, user)
+
+    for item in outcomes:
+        if item['outcome'] == VALIDATED:
+            item['status'] = Sample.REPORT_READY
+    return outcomes
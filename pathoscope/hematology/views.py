@@ -2,19 +2,59 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.db.models import Q
-from .models import Sample, TestResult, TestAnalyte, InstrumentQueue, QCLog
+from django.http import StreamingHttpResponse, FileResponse, HttpResponseNotModified
+from django.conf import settings
+from .models import Sample, TestResult, TestAnalyte, InstrumentQueue, QCLog, QCMeasurement
 from .serializers import (SampleSerializer, TestResultSerializer, TestAnalyteSerializer, 
-                          InstrumentQueueSerializer, QCLogSerializer)
-from patient_portal.models import TestOrder, Appointment
+                          InstrumentQueueSerializer, QCLogSerializer, QCMeasurementSerializer, SampleEventSerializer)
+from .fast_serializers import SampleRowSerializer, InstrumentQueueRowSerializer
+from .exports import EXPORT_FORMATS, parse_date_range, iter_export
+from .validation import VALIDATED, release_samples, validate_batch
+from .autoverification import autoverify
+from .qc import record_measurement, levey_jennings, search_qc_log
+from .archive import sample_results, is_accessioned
+from .tat import record_processing_started, record_processing_completed, tat_report, INTERVALS
+from .journal import journaled, record_event, sample_timeline, events_between
+from .reports import report_path, report_url
+from .search import front_desk_search, DEFAULT_LIMIT as SEARCH_DEFAULT_LIMIT, MAX_LIMIT as SEARCH_MAX_LIMIT
+from .worklist import (parse_window, pending_orders, worklist_appointments, appointment_orders,
+                       slot_counts, worklist_row)
+from .trends import patient_trends, DEFAULT_MAX_POINTS, MAX_POINTS_LIMIT
+from .tasks import complete_appointment
+from jobs.queue import enqueue
+from patient_portal.models import TestOrder
+from pathoscope.fieldsets import parse_fieldsets, SparseFieldsetViewMixin
+from pathoscope.pagination import TimestampCursorPagination, WorklistPagination
+from accounts.models import User
+import re
 import uuid
 
+BATCH_VALIDATION_LIMIT = 1000
+QC_MEASUREMENT_LIMIT = 500
+
+
+def query_datetime(params, param):
+    """Aware datetime from an ISO 8601 query parameter, or None when it is absent; 400 when invalid."""
+    if not params.get(param):
+        return None
+    try:
+        value = parse_datetime(params[param])
+    except ValueError:
+        value = None  # well-formed but impossible, e.g. 2026-02-30T10:00
+    if value is None:
+        raise ValidationError({param: 'Must be an ISO 8601 datetime'})
+    return value if timezone.is_aware(value) else timezone.make_aware(value)
+
 
 # Sample Accessioning - Check-in patients
 class AccessionSampleView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @journaled
     def post(self, request):
         test_order_id = request.data.get('test_order_id')
         
@@ -22,7 +62,7 @@ class AccessionSampleView(APIView):
             test_order = TestOrder.objects.get(id=test_order_id, test_type='hematology')
             
             # Check if already accessioned
-            if hasattr(test_order, 'sample'):
+            if is_accessioned(test_order):
                 return Response({'error': 'Sample already accessioned'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Generate unique accession number and barcode
@@ -36,11 +76,11 @@ class AccessionSampleView(APIView):
                 barcode=barcode,
                 status=Sample.RECEIVED
             )
+            record_event(sample.id, '', sample.status, request.user)
             
-            # Update appointment status to COMPLETED
-            if test_order.appointment:
-                test_order.appointment.status = Appointment.COMPLETED
-                test_order.appointment.save()
+            # Mark the appointment completed in the background
+            if test_order.appointment_id:
+                enqueue(complete_appointment, appointment_id=test_order.appointment_id)
             
             serializer = SampleSerializer(sample)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -54,45 +94,58 @@ class DashboardView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        samples = Sample.objects.select_related('test_order__patient').all().order_by('-accessioned_date')
-        serializer = SampleSerializer(samples, many=True)
-        return Response(serializer.data)
+        samples = Sample.objects.order_by('-accessioned_date')
+        return Response(SampleRowSerializer(samples, parse_fieldsets(request)).data)
 
 # View scheduled patients (confirmed appointments not yet accessioned)
 class ScheduledPatientsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # Get all hematology test orders that are pending and don't have samples yet
-        scheduled_orders = TestOrder.objects.filter(
-            test_type='hematology',
-            status=TestOrder.PENDING
-        ).exclude(
-            sample__isnull=False  # Exclude orders that already have samples
-        ).select_related('patient', 'appointment').order_by('appointment__date', 'appointment__time')
+        # Hematology test orders with an appointment that are pending and don't have samples yet
+        scheduled_orders = pending_orders().filter(appointment__isnull=False).order_by(
+            'appointment__date', 'appointment__time').values(
+            'id', 'patient__username', 'test_name', 'appointment__date', 'appointment__time',
+            'appointment__status', 'test_type')
         
-        # Build response data
-        scheduled_data = []
-        for order in scheduled_orders:
-            if order.appointment:
-                scheduled_data.append({
-                    'test_order_id': order.id,
-                    'patient_name': order.patient.username,
-                    'test_name': order.test_name,
-                    'appointment_date': order.appointment.date,
-                    'appointment_time': order.appointment.time,
-                    'appointment_status': order.appointment.status,
-                    'test_type': order.test_type
-                })
+        scheduled_data = [{
+            'test_order_id': order['id'],
+            'patient_name': order['patient__username'],
+            'test_name': order['test_name'],
+            'appointment_date': order['appointment__date'],
+            'appointment_time': order['appointment__time'],
+            'appointment_status': order['appointment__status'],
+            'test_type': order['test_type'],
+        } for order in scheduled_orders]
         
         return Response(scheduled_data, status=status.HTTP_200_OK)
 
+
+# Accessioning worklist for a date window, one row per appointment with its pending orders
+class WorklistView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    pagination_class = WorklistPagination
+    
+    def get(self, request):
+        try:
+            window = parse_window(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        appointments = self.paginate_queryset(worklist_appointments(*window))
+        orders = appointment_orders([appointment['id'] for appointment in appointments])
+        response = self.get_paginated_response([worklist_row(appointment, orders) for appointment in appointments])
+        response.data['slots'] = slot_counts(*window)
+        return response
+
 # Add sample to instrument queue
 class AddToQueueView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @journaled
     def post(self, request):
         sample_id = request.data.get('sample_id')
+        instrument = str(request.data.get('instrument') or '')[:100]
         
         try:
             sample = Sample.objects.get(id=sample_id)
@@ -102,18 +155,23 @@ class AddToQueueView(APIView):
             
             if processing_count >= 5:
                 # Add to waiting queue
-                queue_entry = InstrumentQueue.objects.create(sample=sample, status=InstrumentQueue.WAITING)
+                queue_entry = InstrumentQueue.objects.create(sample=sample, instrument=instrument,
+                                                             status=InstrumentQueue.WAITING)
                 return Response({'message': 'Added to waiting queue', 'position': 'waiting'}, status=status.HTTP_200_OK)
             else:
                 # Start processing immediately
                 queue_entry = InstrumentQueue.objects.create(
                     sample=sample, 
+                    instrument=instrument,
                     status=InstrumentQueue.PROCESSING,
                     started_date=timezone.now()
                 )
+                previous_status = sample.status
                 sample.status = Sample.IN_ANALYSIS
                 sample.processing_started = timezone.now()
                 sample.save()
+                record_processing_started(sample, queue_entry)
+                record_event(sample.id, previous_status, sample.status, request.user)
                 
                 return Response({'message': 'Processing started', 'position': 'processing'}, status=status.HTTP_200_OK)
                 
@@ -121,6 +179,24 @@ class AddToQueueView(APIView):
             return Response({'error': 'Sample not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+# Front-desk lookup of patients and samples by name, phone, accession number or barcode
+class FrontDeskSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role == User.PATIENT:
+            return Response({'error': 'Search is only available to lab staff'}, status=status.HTTP_403_FORBIDDEN)
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', SEARCH_DEFAULT_LIMIT)), SEARCH_MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({'query': query, **front_desk_search(query, max(limit, 1))})
+
+
 # View instrument queue
 class QueueListView(generics.ListAPIView):
     serializer_class = InstrumentQueueSerializer
@@ -130,12 +206,16 @@ class QueueListView(generics.ListAPIView):
         return InstrumentQueue.objects.filter(
             Q(status=InstrumentQueue.PROCESSING) | Q(status=InstrumentQueue.WAITING)
         ).order_by('added_date')
+    
+    def list(self, request, *args, **kwargs):
+        return Response(InstrumentQueueRowSerializer(self.get_queryset(), parse_fieldsets(request)).data)
 
 
 # Complete processing simulation
 class CompleteProcessingView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @journaled
     def post(self, request, sample_id):
         try:
             sample = Sample.objects.get(id=sample_id)
@@ -146,9 +226,15 @@ class CompleteProcessingView(APIView):
             queue_entry.completed_date = timezone.now()
             queue_entry.save()
             
+            previous_status = sample.status
             sample.status = Sample.AWAITING_VALIDATION
             sample.processing_completed = timezone.now()
             sample.save()
+            record_processing_completed(sample)
+            record_event(sample.id, previous_status, sample.status, request.user)
+            
+            if getattr(settings, 'HEMATOLOGY_AUTOVERIFY', True):
+                autoverify([sample.id])
             
             # Check if any waiting samples can start
             waiting = InstrumentQueue.objects.filter(status=InstrumentQueue.WAITING).order_by('added_date').first()
@@ -157,9 +243,12 @@ class CompleteProcessingView(APIView):
                 waiting.started_date = timezone.now()
                 waiting.save()
                 
+                previous_status = waiting.sample.status
                 waiting.sample.status = Sample.IN_ANALYSIS
                 waiting.sample.processing_started = timezone.now()
                 waiting.sample.save()
+                record_processing_started(waiting.sample, waiting)
+                record_event(waiting.sample_id, previous_status, Sample.IN_ANALYSIS, request.user)
             
             return Response({'message': 'Processing completed'}, status=status.HTTP_200_OK)
             
@@ -200,10 +289,14 @@ class EnterResultsView(APIView):
                     defaults={
                         'value': value,
                         'is_flagged': is_flagged,
-                        'flag_type': flag_type
+                        'flag_type': flag_type,
+                        'accessioned_date': sample.accessioned_date,
                     }
                 )
             
+            if getattr(settings, 'HEMATOLOGY_AUTOVERIFY', True) and sample.status == Sample.AWAITING_VALIDATION:
+                autoverify([sample.id])
+            
             return Response({'message': 'Results entered successfully'}, status=status.HTTP_200_OK)
             
         except Sample.DoesNotExist:
@@ -220,10 +313,13 @@ class SampleResultsView(generics.ListAPIView):
     def get_queryset(self):
         sample_id = self.kwargs.get('sample_id')
         return TestResult.objects.filter(sample_id=sample_id)
+    
+    def list(self, request, *args, **kwargs):
+        return Response(sample_results(self.kwargs.get('sample_id'), parse_fieldsets(request)))
 
 
 # Get available analytes for a test
-class TestAnalytesView(generics.ListAPIView):
+class TestAnalytesView(SparseFieldsetViewMixin, generics.ListAPIView):
     serializer_class = TestAnalyteSerializer
     permission_classes = [IsAuthenticated]
     
@@ -238,36 +334,262 @@ class TestAnalytesView(generics.ListAPIView):
 class ValidateResultsView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @journaled
     def post(self, request, sample_id):
-        try:
-            sample = Sample.objects.get(id=sample_id)
-            results = TestResult.objects.filter(sample=sample)
-            
-            # Mark all results as validated
-            results.update(
-                validated=True,
-                validated_by=request.user,
-                validated_date=timezone.now()
-            )
-            
-            # Update sample and test order status
-            sample.status = Sample.REPORT_READY
-            sample.save()
-            
-            sample.test_order.status = TestOrder.REPORT_READY
-            sample.test_order.save()
-            
-            return Response({'message': 'Results validated successfully'}, status=status.HTTP_200_OK)
-            
-        except Sample.DoesNotExist:
+        if not Sample.objects.filter(id=sample_id).exists():
             return Response({'error': 'Sample not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Mark all results as validated and move the sample and test order to report ready;
+        # this also drops the patient's cached results page
+        release_samples([sample_id], request.user)
+        
+        return Response({'message': 'Results validated successfully'}, status=status.HTTP_200_OK)
+
+
+# Validate many samples awaiting validation in one transaction
+class BatchValidateResultsView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        sample_ids = request.data.get('sample_ids')
+        completed_before = request.data.get('completed_before')
+        limit = request.data.get('limit', BATCH_VALIDATION_LIMIT)
+        
+        try:
+            if sample_ids is not None:
+                if not isinstance(sample_ids, list):
+                    raise TypeError
+                sample_ids = [int(sample_id) for sample_id in sample_ids]
+                if len(sample_ids) > BATCH_VALIDATION_LIMIT:
+                    return Response({'error': f'At most {BATCH_VALIDATION_LIMIT} samples per request'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+            limit = min(int(limit), BATCH_VALIDATION_LIMIT)
+        except (TypeError, ValueError):
+            return Response({'error': 'sample_ids and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if completed_before:
+            try:
+                completed_before = parse_datetime(str(completed_before))
+            except ValueError:
+                completed_before = None  # well-formed but impossible
+            if completed_before is None:
+                return Response({'error': 'completed_before must be an ISO 8601 datetime'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(completed_before):
+                completed_before = timezone.make_aware(completed_before)
+        
+        outcomes = validate_batch(
+            request.user,
+            sample_ids=sample_ids,
+            test_name=request.data.get('test_name'),
+            completed_before=completed_before,
+            limit=limit,
+        )
+        validated = sum(1 for item in outcomes if item['outcome'] == VALIDATED)
+        return Response({'validated': validated, 'results': outcomes}, status=status.HTTP_200_OK)
 
 
 # QC logging
-class QCLogView(generics.ListCreateAPIView):
+class QCLogView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
     serializer_class = QCLogSerializer
     permission_classes = [IsAuthenticated]
-    queryset = QCLog.objects.all().order_by('-timestamp')
+    pagination_class = TimestampCursorPagination
+    
+    def get_queryset(self):
+        queryset = QCLog.objects.select_related('technician')
+        params = self.request.query_params
+        if params.get('technician'):
+            try:
+                queryset = queryset.filter(technician_id=int(params['technician']))
+            except ValueError:
+                raise ValidationError({'technician': 'Must be a user id'})
+        if params.get('event_type'):
+            queryset = queryset.filter(event_type=params['event_type'])
+        for param, lookup in [('since', 'timestamp__gte'), ('until', 'timestamp__lt')]:
+            value = query_datetime(params, param)
+            if value is not None:
+                queryset = queryset.filter(**{lookup: value})
+        if params.get('q'):
+            queryset = search_qc_log(queryset, params['q'])
+        return queryset
     
     def perform_create(self, serializer):
-        serializer.save(technician=self.request.user)
\ No newline at end of file
+        serializer.save(technician=self.request.user)
+
+
+# Run the autoverification rules over samples awaiting validation
+class AutoverifyView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        sample_ids = request.data.get('sample_ids')
+        try:
+            if sample_ids is not None:
+                if not isinstance(sample_ids, list):
+                    raise TypeError
+                sample_ids = [int(sample_id) for sample_id in sample_ids]
+            limit = min(int(request.data.get('limit', BATCH_VALIDATION_LIMIT)), BATCH_VALIDATION_LIMIT)
+        except (TypeError, ValueError):
+            return Response({'error': 'sample_ids and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        dry_run = request.data.get('dry_run', False)
+        dry_run = dry_run is True or str(dry_run).strip().lower() in ('true', '1')
+        outcomes = autoverify(sample_ids, limit=limit, dry_run=dry_run)
+        released = sum(1 for item in outcomes if item['release'])
+        return Response({'dry_run': dry_run, 'released': released, 'results': outcomes}, status=status.HTTP_200_OK)
+
+
+# Quantitative QC runs, evaluated against the Westgard rules on entry
+class QCMeasurementView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
+    serializer_class = QCMeasurementSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = QCMeasurement.objects.select_related('technician').order_by('-timestamp')
+        params = self.request.query_params
+        if params.get('analyte'):
+            try:
+                queryset = queryset.filter(analyte_id=int(params['analyte']))
+            except ValueError:
+                raise ValidationError({'analyte': 'Must be an analyte id'})
+        for param in ['instrument', 'control_level']:
+            if params.get(param):
+                queryset = queryset.filter(**{param: params[param]})
+        return queryset[:QC_MEASUREMENT_LIMIT]
+    
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.instance = record_measurement(
+            data['analyte'], data['instrument'], data['control_level'], data['value'],
+            technician=self.request.user,
+        )
+
+
+# Levey-Jennings chart data for one analyte/instrument/control level
+class LeveyJenningsView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        analyte_id = request.query_params.get('analyte')
+        instrument = request.query_params.get('instrument')
+        control_level = request.query_params.get('control_level')
+        if not (analyte_id and instrument and control_level):
+            return Response({'error': 'analyte, instrument and control_level are required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            points = min(int(request.query_params.get('points', 100)), QC_MEASUREMENT_LIMIT)
+            chart = levey_jennings(int(analyte_id), instrument, control_level, points)
+        except ValueError:
+            return Response({'error': 'analyte and points must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if chart is None:
+            return Response({'error': 'No QC data for this control'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(chart)
+
+
+# Stream results for a date range as CSV or NDJSON
+class ResultsExportView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role == User.PATIENT:
+            return Response({'error': 'Exports are only available to lab staff'}, status=status.HTTP_403_FORBIDDEN)
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': 'export_format must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            start, end = parse_date_range(request.query_params.get('start'), request.query_params.get('end'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        response = StreamingHttpResponse(iter_export(start, end, export_format),
+                                         content_type=EXPORT_FORMATS[export_format])
+        filename = f"results_{request.query_params['start']}_{request.query_params['end']}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+# Turnaround-time percentiles per hour/day, test and interval, served from the rollups
+class TATAnalyticsView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        interval = request.query_params.get('interval', 'day')
+        if interval not in INTERVALS:
+            return Response({'error': 'interval must be hour, day or total'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            start, end = parse_date_range(request.query_params.get('start'), request.query_params.get('end'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        metrics = [metric for metric in request.query_params.get('metrics', '').split(',') if metric]
+        report = tat_report(start, end, interval, request.query_params.get('test_name'), metrics)
+        return Response({'interval': interval, 'results': report})
+
+
+# Status history of one sample, oldest first
+class SampleTimelineView(SparseFieldsetViewMixin, generics.ListAPIView):
+    serializer_class = SampleEventSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return sample_timeline(self.kwargs.get('sample_id'))
+
+
+# Journal scan over a time range, newest first
+class SampleEventListView(SparseFieldsetViewMixin, generics.ListAPIView):
+    serializer_class = SampleEventSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = TimestampCursorPagination
+    
+    def get_queryset(self):
+        params = self.request.query_params
+        return events_between(query_datetime(params, 'since'), query_datetime(params, 'until'),
+                              params.get('to_status'))
+
+
+# Download a rendered report; the URL is content-addressed, so it never changes
+class ReportDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, digest):
+        if not re.fullmatch(r'[0-9a-f]{64}', digest):
+            return Response({'error': 'Report not found'}, status=status.HTTP_404_NOT_FOUND)
+        if request.user.role == User.PATIENT and not TestOrder.objects.filter(
+                patient=request.user, report_url=report_url(digest)).exists():
+            return Response({'error': 'Report not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        etag = f'"{digest}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, max-age=31536000, immutable'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return HttpResponseNotModified(headers=headers)
+        
+        path = report_path(digest)
+        if not path.exists():
+            return Response({'error': 'Report not found'}, status=status.HTTP_404_NOT_FOUND)
+        response = FileResponse(open(path, 'rb'), content_type='application/pdf', filename=f'report-{digest[:12]}.pdf')
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+
+# Per-analyte value history of one patient, for trend charts
+class PatientTrendsView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, patient_id):
+        if request.user.role == User.PATIENT and request.user.id != patient_id:
+            return Response({'error': 'Patient not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        params = request.query_params
+        since, until = query_datetime(params, 'since'), query_datetime(params, 'until')
+        try:
+            max_points = max(min(int(params.get('max_points', DEFAULT_MAX_POINTS)), MAX_POINTS_LIMIT), 3)
+        except ValueError:
+            return Response({'error': 'max_points must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        analytes = [name for name in params.get('analytes', '').split(',') if name]
+        trends = patient_trends(patient_id, analytes, params.get('test_name'),
+                                since, until, max_points)
+        return Response({'patient_id': patient_id, 'results': trends})
@@ -0,0 +1,110 @@
+"""
+Accessioning worklist.
+
+The front desk works through appointments that still have hematology orders
+waiting for a sample. ``worklist_appointments`` returns those appointments
+for a date (and optional time-of-day) window, one row per appointment with
+its pending-order count computed in SQL, ordered by slot so the view can
+paginate it. ``appointment_orders`` fetches the orders of one page, and
+``slot_counts`` the number of appointments and orders per (date, time) slot
+over the whole window. Only appointments inside the window are read, so the
+cost follows the size of the day, not of the backlog.
+"""
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+
+from patient_portal.models import Appointment, TestOrder
+
+
+MAX_WINDOW_DAYS = 31
+
+# An order waiting for accessioning, seen from the appointment
+PENDING = Q(test_orders__test_type=TestOrder.HEMATOLOGY, test_orders__status=TestOrder.PENDING,
+            test_orders__sample__isnull=True)
+
+
+def pending_orders():
+    return TestOrder.objects.filter(test_type=TestOrder.HEMATOLOGY, status=TestOrder.PENDING, sample__isnull=True)
+
+
+def parse_window(params):
+    """
+    ``(start_date, end_date, from_time, to_time)`` from ``date`` or
+    ``start``/``end`` (YYYY-MM-DD, inclusive, default today) and optional
+    ``from_time``/``to_time`` (HH:MM). Raises ``ValueError`` on bad input.
+    """
+    today = timezone.localdate()
+    if params.get('date'):
+        start = end = parse_date(params['date'])
+    else:
+        start = parse_date(params['start']) if params.get('start') else today
+        end = parse_date(params['end']) if params.get('end') else start
+    if start is None or end is None:
+        raise ValueError('Dates must be in YYYY-MM-DD format')
+    if end < start:
+        raise ValueError('end must not be before start')
+    if (end - start).days >= MAX_WINDOW_DAYS:
+        raise ValueError(f'The window can span at most {MAX_WINDOW_DAYS} days')
+
+    times = []
+    for param in ('from_time', 'to_time'):
+        value = parse_time(params[param]) if params.get(param) else None
+        if params.get(param) and value is None:
+            raise ValueError(f'{param} must be in HH:MM format')
+        times.append(value)
+    return start, end, times[0], times[1]
+
+
+def in_window(start, end, from_time=None, to_time=None, prefix=''):
+    window = Q(**{f'{prefix}date__gte': start, f'{prefix}date__lte': end})
+    if from_time is not None:
+        window &= Q(**{f'{prefix}time__gte': from_time})
+    if to_time is not None:
+        window &= Q(**{f'{prefix}time__lt': to_time})
+    return window
+
+
+def worklist_appointments(start, end, from_time=None, to_time=None):
+    return Appointment.objects.filter(in_window(start, end, from_time, to_time)).annotate(
+        pending_orders=Count('test_orders', filter=PENDING),
+    ).filter(pending_orders__gt=0).order_by('date', 'time', 'id').values(
+        'id', 'date', 'time', 'status', 'patient_id', 'patient__username', 'pending_orders')
+
+
+def appointment_orders(appointment_ids):
+    """``{appointment_id: [order, ...]}`` of the pending orders of ``appointment_ids``."""
+    orders = {}
+    rows = pending_orders().filter(appointment_id__in=appointment_ids).order_by('appointment_id', 'id').values_list(
+        'appointment_id', 'id', 'test_name', 'test_type')
+    for appointment_id, order_id, test_name, test_type in rows:
+        orders.setdefault(appointment_id, []).append(
+            {'test_order_id': order_id, 'test_name': test_name, 'test_type': test_type})
+    return orders
+
+
+def slot_counts(start, end, from_time=None, to_time=None):
+    rows = pending_orders().filter(in_window(start, end, from_time, to_time, prefix='appointment__')).values(
+        'appointment__date', 'appointment__time',
+    ).annotate(
+        appointments=Count('appointment_id', distinct=True),
+        orders=Count('id'),
+    ).order_by('appointment__date', 'appointment__time')
+    return [
+        {'date': row['appointment__date'], 'time': row['appointment__time'],
+         'appointments': row['appointments'], 'orders': row['orders']}
+        for row in rows
+    ]
+
+
+def worklist_row(appointment, orders):
+    return {
+        'appointment_id': appointment['id'],
+        'appointment_date': appointment['date'],
+        'appointment_time': appointment['time'],
+        'appointment_status': appointment['status'],
+        'patient_id': appointment['patient_id'],
+        'patient_name': appointment['patient__username'],
+        'pending_orders': appointment['pending_orders'],
+        'orders': orders.get(appointment['id'], []),
+    }
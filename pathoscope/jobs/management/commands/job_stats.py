@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from jobs.queue import queue_stats, purge_finished
+
+
+class Command(BaseCommand):
+    help = 'Show job queue depth, lag and throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=60, help='Seconds to measure throughput over')
+        parser.add_argument('--purge-days', type=int, default=None, help='Also delete done jobs older than this')
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            self.stdout.write(f"Purged {purge_finished(options['purge_days'])} done jobs")
+        stats = queue_stats(options['window'])
+        counts = ', '.join(f'{status} {count}' for status, count in stats['counts'].items())
+        self.stdout.write(counts)
+        self.stdout.write(f"oldest due job waiting {stats['oldest_due_seconds']:.1f} s, "
+                          f"throughput {stats['throughput_per_second']:.2f} jobs/s over {options['window']} s")
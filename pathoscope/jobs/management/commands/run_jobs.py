@@ -0,0 +1,51 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.spawn import worker_process
+from jobs.worker import Worker, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes to start')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when idle')
+        parser.add_argument('--report-interval', type=float, default=30.0, help='Seconds between throughput reports')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        worker_options = {
+            'poll_interval': options['poll_interval'],
+            'report_interval': options['report_interval'],
+            'burst': options['burst'],
+        }
+        if options['workers'] <= 1:
+            worker = Worker(worker_name(0), output=self.stdout.write, **worker_options)
+            signal.signal(signal.SIGTERM, worker.stop)
+            try:
+                worker.run()
+            except KeyboardInterrupt:
+                pass
+            return
+
+        # Spawned processes open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        processes = [
+            context.Process(target=worker_process, args=(index, worker_options))
+            for index in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
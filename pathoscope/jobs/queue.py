@@ -0,0 +1,199 @@
+"""
+Database-backed job queue.
+
+    from jobs.queue import task, enqueue
+
+    @task(max_attempts=5)                 # in <app>/tasks.py
+    def create_invoice(appointment_id):
+        ...
+
+    enqueue(create_invoice, appointment_id=appointment.id)
+
+``enqueue`` inserts the Job row in the caller's transaction, so a job
+exists only if the change that caused it commits. Nothing runs in the
+request; ``manage.py run_jobs`` workers pick the job up after the commit.
+With ``JOBS_EAGER = True`` the job runs in-process from
+``transaction.on_commit`` instead, which is handy in development.
+
+Workers claim jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+database supports it, and with a conditional UPDATE per job elsewhere
+(SQLite). Each task runs in its own transaction, unless registered with
+``atomic=False`` (long tasks that report progress as they go). A failed task is retried
+with exponential backoff until ``max_attempts`` is reached. While a job
+runs, a heartbeat thread refreshes its ``locked_at``; running jobs whose
+heartbeat stopped for ``JOBS_LOCK_TIMEOUT`` seconds (the worker died) are
+requeued.
+"""
+import datetime
+import random
+import threading
+import traceback
+from functools import partial
+
+from django.conf import settings
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = 10  # seconds before the first retry; doubles on each attempt
+BACKOFF_MAX = 3600
+DEFAULT_LOCK_TIMEOUT = 600
+
+# Registered tasks: {name: (function, max_attempts, atomic)}
+TASKS = {}
+
+
+def task(max_attempts=DEFAULT_MAX_ATTEMPTS, atomic=True):
+    def register(func):
+        func.task_name = f'{func.__module__}.{func.__name__}'
+        TASKS[func.task_name] = (func, max_attempts, atomic)
+        return func
+    return register
+
+
+def enqueue(func, delay=0, **kwargs):
+    """
+    Queue ``func`` (an @task function or its dotted name) to run with
+    ``kwargs``, which must be JSON-serializable, at least ``delay`` seconds
+    from now.
+    """
+    name = func if isinstance(func, str) else func.task_name
+    _, max_attempts, _ = TASKS.get(name, (None, DEFAULT_MAX_ATTEMPTS, True))
+    job = Job.objects.create(
+        name=name,
+        kwargs=kwargs,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + datetime.timedelta(seconds=delay),
+    )
+    if getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(partial(run_now, job.id))
+    return job
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return datetime.timedelta(seconds=delay * random.uniform(0.75, 1.0))
+
+
+def claim_jobs(worker_id, limit=1):
+    """Mark up to ``limit`` due jobs as running for ``worker_id`` and return them."""
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_after__lte=now).order_by('run_after', 'id')
+    claim = {'status': Job.RUNNING, 'locked_by': worker_id, 'locked_at': now, 'attempts': F('attempts') + 1}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(**claim)
+    else:
+        # No row locks: whichever worker's UPDATE still sees the job queued gets it
+        ids = []
+        for job_id in due.values_list('id', flat=True)[:limit * 4]:
+            if Job.objects.filter(id=job_id, status=Job.QUEUED).update(**claim):
+                ids.append(job_id)
+                if len(ids) == limit:
+                    break
+    return list(Job.objects.filter(id__in=ids).order_by('id'))
+
+
+def lock_timeout():
+    return getattr(settings, 'JOBS_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT)
+
+
+class Heartbeat(threading.Thread):
+    """Refreshes ``locked_at`` of a running job every ``interval`` seconds until stopped."""
+
+    def __init__(self, job, interval):
+        super().__init__(name=f'job-{job.id}-heartbeat', daemon=True)
+        self.job = job
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    Job.objects.filter(id=self.job.id, status=Job.RUNNING, locked_by=self.job.locked_by).update(
+                        locked_at=timezone.now())
+                except DatabaseError:
+                    pass  # e.g. SQLite busy while the task writes; the next beat retries
+        finally:
+            connections.close_all()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    func, _, atomic = TASKS.get(job.name, (None, None, True))
+    heartbeat = Heartbeat(job, max(1, lock_timeout() / 4))
+    heartbeat.start()
+    try:
+        if func is None:
+            raise LookupError(f'No task registered as {job.name}')
+        if atomic:
+            with transaction.atomic():
+                func(**job.kwargs)
+        else:
+            func(**job.kwargs)
+    except Exception:
+        heartbeat.stop()
+        now = timezone.now()
+        outcome = {'last_error': traceback.format_exc(), 'locked_by': '', 'locked_at': None}
+        if job.attempts >= job.max_attempts:
+            outcome.update(status=Job.FAILED, finished_date=now)
+        else:
+            outcome.update(status=Job.QUEUED, run_after=now + backoff(job.attempts))
+        Job.objects.filter(id=job.id, locked_by=job.locked_by).update(**outcome)
+        return False
+    heartbeat.stop()
+    Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+        status=Job.DONE, finished_date=timezone.now(), locked_by='', locked_at=None,
+    )
+    return True
+
+
+def run_now(job_id):
+    jobs = Job.objects.filter(id=job_id, status=Job.QUEUED)
+    if jobs.update(status=Job.RUNNING, locked_by='eager', locked_at=timezone.now(), attempts=F('attempts') + 1):
+        run_job(Job.objects.get(id=job_id))
+
+
+def requeue_stale(timeout=None):
+    """Requeue running jobs whose heartbeat is older than ``timeout`` seconds."""
+    if timeout is None:
+        timeout = lock_timeout()
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - datetime.timedelta(seconds=timeout))
+    error = 'Worker stopped responding'
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_date=now, locked_by='', locked_at=None, last_error=error)
+    requeued = stale.update(status=Job.QUEUED, run_after=now, locked_by='', locked_at=None, last_error=error)
+    return requeued + failed
+
+
+def queue_stats(window=60):
+    """Counts per status, the age of the oldest due job and jobs finished per second over ``window`` seconds."""
+    now = timezone.now()
+    counts = dict.fromkeys((Job.QUEUED, Job.RUNNING, Job.DONE, Job.FAILED), 0)
+    counts.update(Job.objects.order_by().values_list('status').annotate(count=Count('id')))
+    oldest = Job.objects.filter(status=Job.QUEUED, run_after__lte=now).aggregate(oldest=Min('run_after'))['oldest']
+    finished = Job.objects.filter(status=Job.DONE, finished_date__gte=now - datetime.timedelta(seconds=window)).count()
+    return {
+        'counts': counts,
+        'oldest_due_seconds': (now - oldest).total_seconds() if oldest else 0,
+        'throughput_per_second': finished / window,
+    }
+
+
+def purge_finished(days):
+    """Delete done jobs finished more than ``days`` days ago."""
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    deleted, _ = Job.objects.filter(status=Job.DONE, finished_date__lt=cutoff).delete()
+    return deleted
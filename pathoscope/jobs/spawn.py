@@ -0,0 +1,19 @@
+"""
+Entry point for worker processes started by ``run_jobs --workers N``.
+
+Spawned processes unpickle their target before Django is set up, so this
+module must not import models at import time.
+"""
+import signal
+
+import django
+
+
+def worker_process(index, options):
+    django.setup()
+    from .worker import Worker, worker_name
+
+    worker = Worker(worker_name(index), **options)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
@@ -0,0 +1,101 @@
+import datetime
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from .models import Job
+from .queue import claim_jobs, enqueue, purge_finished, requeue_stale, run_job, task
+
+
+calls = []
+
+
+@task(max_attempts=2)
+def record_call(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def create_user_then_fail(username):
+    User.objects.create_user(username=username, password='x')
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_uses_the_task_settings(self):
+        job = enqueue(record_call, value=1)
+        self.assertEqual((job.name, job.kwargs, job.max_attempts, job.status),
+                         ('jobs.tests.record_call', {'value': 1}, 2, Job.QUEUED))
+
+    def test_claim_takes_due_jobs_once(self):
+        first = enqueue(record_call, value=1)
+        enqueue(record_call, delay=3600, value=2)
+        claimed = claim_jobs('worker-1', limit=5)
+        self.assertEqual([job.id for job in claimed], [first.id])
+        self.assertEqual((claimed[0].status, claimed[0].locked_by, claimed[0].attempts), (Job.RUNNING, 'worker-1', 1))
+        self.assertEqual(claim_jobs('worker-2', limit=5), [])
+
+    def test_successful_run(self):
+        enqueue(record_call, value=7)
+        job, = claim_jobs('worker-1')
+        self.assertTrue(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.locked_at), (Job.DONE, '', None))
+        self.assertIsNotNone(job.finished_date)
+        self.assertEqual(calls, [7])
+
+    def test_failure_is_rolled_back_and_retried_with_backoff_then_fails(self):
+        enqueue(create_user_then_fail, username='ghost')
+        job, = claim_jobs('worker-1')
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertFalse(User.objects.filter(username='ghost').exists())
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        job, = claim_jobs('worker-1')
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_unknown_task_fails(self):
+        enqueue('jobs.tests.missing')
+        job, = claim_jobs('worker-1')
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertIn('No task registered', job.last_error)
+
+    def test_stale_jobs_are_requeued_or_failed(self):
+        stale = timezone.now() - datetime.timedelta(hours=1)
+        retry = Job.objects.create(name='jobs.tests.record_call', status=Job.RUNNING, attempts=1, max_attempts=2,
+                                   run_after=stale, locked_by='dead', locked_at=stale)
+        spent = Job.objects.create(name='jobs.tests.record_call', status=Job.RUNNING, attempts=2, max_attempts=2,
+                                   run_after=stale, locked_by='dead', locked_at=stale)
+        fresh = Job.objects.create(name='jobs.tests.record_call', status=Job.RUNNING, attempts=1, max_attempts=2,
+                                   run_after=stale, locked_by='alive', locked_at=timezone.now())
+        self.assertEqual(requeue_stale(timeout=60), 2)
+        statuses = dict(Job.objects.values_list('id', 'status'))
+        self.assertEqual([statuses[retry.id], statuses[spent.id], statuses[fresh.id]],
+                         [Job.QUEUED, Job.FAILED, Job.RUNNING])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_jobs_run_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue(record_call, value=3)
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [3])
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.DONE)
+
+    def test_purge_keeps_recent_and_unfinished_jobs(self):
+        old = timezone.now() - datetime.timedelta(days=10)
+        Job.objects.create(name='a', status=Job.DONE, run_after=old, finished_date=old)
+        Job.objects.create(name='b', status=Job.DONE, run_after=old, finished_date=timezone.now())
+        Job.objects.create(name='c', status=Job.FAILED, run_after=old, finished_date=old)
+        self.assertEqual(purge_finished(days=7), 1)
+        self.assertEqual(sorted(Job.objects.values_list('name', flat=True)), ['b', 'c'])
@@ -0,0 +1,68 @@
+"""
+Job worker loop, run by ``manage.py run_jobs``.
+
+Each worker process claims one due job at a time, so jobs it has not started
+stay available to other workers, runs it and polls again, sleeping
+``poll_interval`` seconds when the queue is empty. It reports its throughput
+(jobs/s) every ``report_interval`` seconds.
+"""
+import os
+import socket
+import time
+
+from django.db import close_old_connections
+
+from .queue import claim_jobs, run_job, requeue_stale
+
+STALE_CHECK_INTERVAL = 60
+
+
+class Worker:
+    def __init__(self, name, poll_interval=1.0, report_interval=30.0, burst=False, output=print):
+        self.name = name
+        self.poll_interval = poll_interval
+        self.report_interval = report_interval
+        self.burst = burst
+        self.output = output
+        self.stopping = False
+        self.processed = 0
+        self.failed = 0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def report(self, count, seconds):
+        rate = count / seconds if seconds else 0.0
+        self.output(f'{self.name}: {count} jobs in {seconds:.1f} s ({rate:.1f} jobs/s), '
+                    f'{self.processed} done and {self.failed} failed in total')
+
+    def run(self):
+        last_report = last_stale_check = time.monotonic()
+        since_report = 0
+        while not self.stopping:
+            now = time.monotonic()
+            if now - last_stale_check >= STALE_CHECK_INTERVAL:
+                requeue_stale()
+                last_stale_check = now
+            if now - last_report >= self.report_interval and since_report:
+                self.report(since_report, now - last_report)
+                last_report, since_report = now, 0
+
+            close_old_connections()
+            jobs = claim_jobs(self.name)
+            if not jobs:
+                if self.burst:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            if run_job(jobs[0]):
+                self.processed += 1
+            else:
+                self.failed += 1
+            since_report += 1
+        if since_report:
+            self.report(since_report, time.monotonic() - last_report)
+
+
+def worker_name(index):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
@@ -0,0 +1,6 @@
+from django.contrib import admin
+from .models import Slide, CellCountAnalysis, ZStack
+
+admin.site.register(Slide)
+admin.site.register(CellCountAnalysis)
+admin.site.register(ZStack)
@@ -0,0 +1,97 @@
+"""
+Cell-count analyses of slides.
+
+``create_analysis`` records a queued CellCountAnalysis; the ``count_cells``
+job (pathology.tasks) or ``manage.py count_cells`` then calls
+``run_analysis``. It counts nuclei with ``pathology.cellcount`` on one
+pyramid level (by default one below full resolution, i.e. 20x for a 40x
+scan), saving ``tiles_done`` as batches finish so clients can follow along
+through ``analysis_events``, and stores per-region counts for the heatmap.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cellcount import count_slide, region_counts
+from .models import CellCountAnalysis
+from .slidepack import pack_path, level_layout
+from .tiles import slides_root
+
+
+LEVEL_OFFSET = 1
+REGION_TILES = 4  # regions are 4x4 tiles of the analysed level
+PROGRESS_INTERVAL = 1.0  # seconds between progress saves
+STREAM_POLL_INTERVAL = 0.5
+STREAM_TIMEOUT = 3600
+
+
+def create_analysis(slide, level_offset=LEVEL_OFFSET):
+    layout = level_layout(slide.width, slide.height, slide.tile_size)
+    level = max(0, len(layout) - 1 - level_offset)
+    return CellCountAnalysis.objects.create(
+        slide=slide,
+        test_order_id=slide.test_order_id,
+        level=level,
+        region_size=REGION_TILES * slide.tile_size * 2 ** (len(layout) - 1 - level),
+        tiles_total=layout[level]['cols'] * layout[level]['rows'],
+    )
+
+
+def run_analysis(analysis_id, workers=None, progress=None):
+    """Count nuclei for a queued analysis and save the results. ``progress`` is passed to ``count_slide``."""
+    analysis = CellCountAnalysis.objects.select_related('slide').get(id=analysis_id)
+    analyses = CellCountAnalysis.objects.filter(id=analysis_id)
+    analyses.update(status=CellCountAnalysis.RUNNING, tiles_done=0, error='')
+
+    start = time.perf_counter()
+    saved = start
+    pixels = 0
+
+    def report(done, total, batch_pixels):
+        nonlocal saved, pixels
+        pixels += batch_pixels
+        now = time.perf_counter()
+        if now - saved >= PROGRESS_INTERVAL or done == total:
+            analyses.update(tiles_done=done, tiles_total=total)
+            saved = now
+        if progress:
+            progress(done, total, batch_pixels)
+
+    try:
+        counts = count_slide(
+            pack_path(slides_root(), analysis.slide.digest), analysis.level, progress=report,
+            workers=workers or getattr(settings, 'PATHOLOGY_ANALYSIS_WORKERS', None),
+        )
+    except Exception as e:
+        analyses.update(status=CellCountAnalysis.FAILED, error=str(e), finished_date=timezone.now())
+        raise
+    elapsed = time.perf_counter() - start
+    analyses.update(
+        status=CellCountAnalysis.DONE,
+        total_cells=int(counts.sum()),
+        regions=region_counts(counts, REGION_TILES).tolist(),
+        megapixels_per_second=pixels / elapsed / 1e6 if elapsed else None,
+        finished_date=timezone.now(),
+    )
+    return CellCountAnalysis.objects.get(id=analysis_id)
+
+
+def analysis_progress(analysis_id):
+    return CellCountAnalysis.objects.filter(id=analysis_id).values(
+        'id', 'status', 'tiles_done', 'tiles_total', 'total_cells', 'error').first()
+
+
+def analysis_events(analysis_id, poll_interval=STREAM_POLL_INTERVAL, timeout=STREAM_TIMEOUT):
+    """Server-sent events with the analysis progress, until it finishes or ``timeout`` seconds pass."""
+    last = None
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        current = analysis_progress(analysis_id)
+        if current != last:
+            yield f'data: {json.dumps(current)}\n\n'
+            last = current
+        if current is None or current['status'] in (CellCountAnalysis.DONE, CellCountAnalysis.FAILED):
+            return
+        time.sleep(poll_interval)
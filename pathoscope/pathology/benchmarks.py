@@ -0,0 +1,112 @@
+"""
+Helpers for the pathology ``bench_*`` management commands.
+
+``synthetic_slide`` builds a container of small PNG tiles in a temporary
+directory and a Slide row inside a transaction that is rolled back
+afterwards. ``pan_zoom_trace`` replays what a viewer requests while a
+pathologist zooms into a region, pans across it and zooms back out.
+``synthetic_stained_tiles`` draws H&E-like tiles with a known number of
+nuclei for the cell-counting benchmark.
+"""
+import random
+import tempfile
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.test import override_settings
+
+from hematology.benchmarks import Rollback
+from .heatmap import png_bytes
+from .models import Slide
+from .slidepack import SlidePackWriter, level_layout
+
+
+def sample_tiles(tile_size, variants=16, seed=0):
+    # Textured tiles that compress about as well as stained tissue; the pyramid reuses them
+    rng = random.Random(seed)
+    tiles = []
+    for _ in range(variants):
+        rows = [bytes(rng.randrange(150, 256) for _ in range(tile_size * 3)) for _ in range(8)]
+        tiles.append(png_bytes(tile_size, tile_size, b''.join(rows[y % 8] for y in range(tile_size))))
+    return tiles
+
+
+@contextmanager
+def synthetic_slide(width=20000, height=15000, tile_size=256):
+    """Yield a Slide for a ``width`` x ``height`` synthetic image; nothing is kept on exit."""
+    tiles = sample_tiles(tile_size)
+    with tempfile.TemporaryDirectory() as root, override_settings(SLIDES_ROOT=root):
+        with SlidePackWriter(root, width, height, tile_size, Slide.PNG) as writer:
+            for level, layout in enumerate(level_layout(width, height, tile_size)):
+                for row in range(layout['rows']):
+                    for col in range(layout['cols']):
+                        writer.add_tile(level, col, row, tiles[(level + row * 7 + col) % len(tiles)])
+        try:
+            with transaction.atomic():
+                yield Slide.objects.create(digest=writer.digest, width=width, height=height,
+                                           tile_size=tile_size, tile_format=Slide.PNG)
+                raise Rollback
+        except Rollback:
+            pass
+
+
+def pan_zoom_trace(slide, viewport=(1600, 900), pans=40, seed=0):
+    """
+    ``(level, col, row)`` requests a viewer makes: zoom from the whole-slide
+    overview to full resolution around a random point, pan across the deepest
+    levels, then zoom back out.
+    """
+    rng = random.Random(seed)
+    layouts = level_layout(slide.width, slide.height, slide.tile_size)
+    fx, fy = rng.random(), rng.random()
+
+    def frame(level, x, y):
+        layout = layouts[level]
+        left = max(0, min(int(x * layout['width'] - viewport[0] / 2), max(0, layout['width'] - viewport[0])))
+        top = max(0, min(int(y * layout['height'] - viewport[1] / 2), max(0, layout['height'] - viewport[1])))
+        size = slide.tile_size
+        cols = range(left // size, min(layout['cols'], (left + viewport[0] - 1) // size + 1))
+        rows = range(top // size, min(layout['rows'], (top + viewport[1] - 1) // size + 1))
+        return [(level, col, row) for row in rows for col in cols]
+
+    # Viewers start at the first level that fills the viewport
+    start = next((level for level, layout in enumerate(layouts)
+                  if layout['width'] >= viewport[0] or layout['height'] >= viewport[1]), len(layouts) - 1)
+    deepest = len(layouts) - 1
+    trace = []
+    for level in range(start, deepest + 1):
+        trace += frame(level, fx, fy)
+    for step in range(pans):
+        level = deepest - (step // 10) % 2
+        fx = min(1.0, max(0.0, fx + rng.uniform(-0.01, 0.01)))
+        fy = min(1.0, max(0.0, fy + rng.uniform(-0.01, 0.01)))
+        trace += frame(level, fx, fy)
+    for level in range(deepest, start - 1, -1):
+        trace += frame(level, fx, fy)
+    return trace
+
+
+def synthetic_stained_tiles(count, tile_size=256, seed=0):
+    """
+    ``(tiles, nuclei)``: a ``(count, T, T, 3)`` uint8 array of eosin-pink
+    tiles with dark haematoxylin nuclei, and the number of nuclei in each.
+    Nuclei sit on a jittered grid, so none touch each other or the tile edge.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    tiles = np.empty((count, tile_size, tile_size, 3), dtype=np.uint8)
+    tiles[:] = (236, 172, 204)
+    tiles += rng.integers(0, 12, size=tiles.shape, dtype=np.uint8)
+    cell = 24
+    slots = [(y, x) for y in range(cell, tile_size - cell + 1, cell) for x in range(cell, tile_size - cell + 1, cell)]
+    yy, xx = np.mgrid[-cell // 2:cell // 2, -cell // 2:cell // 2]
+    nuclei = rng.integers(0, len(slots) // 2, size=count)
+    for index, number in enumerate(nuclei):
+        for slot in rng.choice(len(slots), size=number, replace=False):
+            y, x = slots[slot] + rng.integers(-3, 4, size=2)
+            radius = rng.uniform(3.5, 6.5)
+            disk = yy ** 2 + xx ** 2 <= radius ** 2
+            patch = tiles[index, y - cell // 2:y + cell // 2, x - cell // 2:x + cell // 2]
+            patch[disk] = (88, 56, 148)
+    return tiles, nuclei
@@ -0,0 +1,42 @@
+"""
+PNG encoding without third-party libraries, and heatmaps of per-region counts.
+"""
+import struct
+import zlib
+
+
+# Colour stops from low to high counts (white -> yellow -> red -> dark red)
+STOPS = [(255, 255, 255), (255, 237, 160), (254, 178, 76), (240, 59, 32), (128, 0, 38)]
+
+
+def png_bytes(width, height, pixels, channels=3, level=6):
+    """Encode ``pixels`` (8-bit grey or RGB bytes, row by row) as a PNG."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    stride = width * channels
+    colour_type = 2 if channels == 3 else 0
+    raw = b''.join(b'\x00' + pixels[y * stride:(y + 1) * stride] for y in range(height))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, colour_type, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, level))
+            + chunk(b'IEND', b''))
+
+
+def colour(fraction):
+    position = min(max(fraction, 0.0), 1.0) * (len(STOPS) - 1)
+    index = min(int(position), len(STOPS) - 2)
+    low, high = STOPS[index], STOPS[index + 1]
+    weight = position - index
+    return bytes(round(a + (b - a) * weight) for a, b in zip(low, high))
+
+
+def heatmap_png(grid, scale=8):
+    """PNG of a 2D list of counts, each cell drawn as a ``scale`` px square."""
+    peak = max((value for row in grid for value in row), default=0) or 1
+    lines = []
+    for row in grid:
+        line = b''.join(colour(value / peak) * scale for value in row)
+        lines.extend([line] * scale)
+    width = len(grid[0]) * scale if grid else 0
+    return png_bytes(width, len(lines), b''.join(lines))
@@ -0,0 +1,71 @@
+"""
+Slide ingestion: uploaded image -> tile pyramid -> Slide on a TestOrder.
+
+Uploads are streamed to ``SLIDES_ROOT/uploads`` and converted by the
+``ingest_slide`` job (pathology.tasks), or directly by ``manage.py
+ingest_slide``. The pyramid is built by ``pathology.pyramid`` in a process
+pool of ``PATHOLOGY_INGEST_WORKERS`` processes (default: one per CPU).
+"""
+import os
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+
+from patient_portal.models import TestOrder
+from patient_portal.results import invalidate_orders
+from .models import Slide
+from .pyramid import build_pyramid, SOURCE_SUFFIXES, PyramidError
+from .tiles import slides_root
+
+
+def uploads_root():
+    return Path(slides_root()) / 'uploads'
+
+
+def save_upload(uploaded_file):
+    """Stream an uploaded image to disk and return its path."""
+    suffix = os.path.splitext(uploaded_file.name)[1].lower()
+    if suffix not in SOURCE_SUFFIXES:
+        raise PyramidError(f"Unsupported slide format {suffix or uploaded_file.name}; use {', '.join(SOURCE_SUFFIXES)}")
+    uploads_root().mkdir(parents=True, exist_ok=True)
+    path = uploads_root() / f'{uuid.uuid4().hex}{suffix}'
+    with open(path, 'wb') as handle:
+        for chunk in uploaded_file.chunks():
+            handle.write(chunk)
+    return path
+
+
+def ingest(source_path, test_order_id=None, tile_format=Slide.JPEG, workers=None, progress=None):
+    """
+    Build the pyramid for ``source_path`` and create its Slide, attached to
+    the test order (whose ``slide_url`` then points at the slide) if given.
+    Ingesting the same image for the same order again returns the existing
+    Slide.
+    """
+    writer = build_pyramid(
+        source_path, slides_root(), tile_format=tile_format, progress=progress,
+        workers=workers or getattr(settings, 'PATHOLOGY_INGEST_WORKERS', None),
+    )
+    metadata = writer.metadata
+    with transaction.atomic():
+        if test_order_id is not None:
+            # Serializes concurrent runs for one order, so only one of them creates the Slide
+            TestOrder.objects.select_for_update().filter(id=test_order_id).first()
+            existing = Slide.objects.filter(test_order_id=test_order_id, digest=writer.digest).first()
+            if existing is not None:
+                return existing
+        slide = Slide.objects.create(
+            test_order_id=test_order_id,
+            digest=writer.digest,
+            width=metadata['width'],
+            height=metadata['height'],
+            tile_size=metadata['tile_size'],
+            tile_format=tile_format,
+        )
+        if test_order_id is not None:
+            TestOrder.objects.filter(id=test_order_id).update(slide_url=reverse('slide-info', args=[slide.id]))
+            invalidate_orders([test_order_id])
+    return slide
@@ -0,0 +1,57 @@
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pathology.benchmarks import synthetic_stained_tiles
+from pathology.cellcount import count_nuclei, count_slide, require_dependencies, CellCountError
+from pathology.heatmap import png_bytes
+from pathology.slidepack import SlidePackWriter
+
+
+class Command(BaseCommand):
+    help = 'Measure cell-counting throughput (megapixels/second) and accuracy on synthetic H&E tiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tiles', type=int, default=1024)
+        parser.add_argument('--workers', type=int)
+        parser.add_argument('--batch-size', type=int, default=64)
+
+    def handle(self, *args, **options):
+        try:
+            require_dependencies()
+        except CellCountError as e:
+            raise CommandError(e)
+
+        tiles, truth = synthetic_stained_tiles(options['tiles'])
+        megapixels = tiles.shape[0] * tiles.shape[1] * tiles.shape[2] / 1e6
+        batch_size = options['batch_size']
+
+        start = time.perf_counter()
+        counted = []
+        for offset in range(0, len(tiles), batch_size):
+            counted.extend(count_nuclei(tiles[offset:offset + batch_size]).tolist())
+        elapsed = time.perf_counter() - start
+        self.report('in-process, decoded tiles', megapixels, elapsed, truth, counted)
+
+        # End to end: PNG decode from a container plus the process pool
+        cols = 32
+        rows = -(-len(tiles) // cols)
+        size = tiles.shape[1]
+        with tempfile.TemporaryDirectory() as root:
+            with SlidePackWriter(root, cols * size, rows * size, size, 'png') as writer:
+                level = len(writer.metadata['levels']) - 1
+                for index, tile in enumerate(tiles):
+                    writer.add_tile(level, index % cols, index // cols, png_bytes(size, size, tile.tobytes()))
+            start = time.perf_counter()
+            counts = count_slide(writer.path, level, options['workers'], batch_size)
+            elapsed = time.perf_counter() - start
+        self.report(f"pool ({options['workers'] or 'all'} workers)", megapixels, elapsed, truth,
+                    counts.ravel()[:len(tiles)].tolist())
+
+    def report(self, label, megapixels, elapsed, truth, counted):
+        expected = int(sum(truth))
+        found = int(sum(counted))
+        error = sum(abs(int(a) - int(b)) for a, b in zip(truth, counted)) / len(truth)
+        self.stdout.write(f'{label:<28} {megapixels / elapsed:>7.1f} MP/s  '
+                          f'nuclei {found}/{expected}  mean per-tile error {error:.2f}')
@@ -0,0 +1,68 @@
+import statistics
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from hematology.benchmarks import Rollback
+from pathology.volumes import import_volume, slice_cache, np
+
+
+class Command(BaseCommand):
+    help = 'Scrub through the planes of a synthetic Z-stack and report milliseconds per frame'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depth', type=int, default=32)
+        parser.add_argument('--size', type=int, default=1024)
+        parser.add_argument('--max-size', type=int, default=512, help='Preview size requested by the viewer')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('Z-stacks require the numpy package')
+        depth, size = options['depth'], options['size']
+        rng = np.random.default_rng(0)
+
+        with tempfile.TemporaryDirectory() as root, override_settings(SLIDES_ROOT=root, ALLOWED_HOSTS=['*']):
+            source = f'{root}/source.npy'
+            volume = np.lib.format.open_memmap(source, mode='w+', dtype=np.uint8, shape=(depth, size, size, 3))
+            for z in range(depth):
+                volume[z] = rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8) // 4 + z * 4
+            volume.flush()
+            del volume
+
+            try:
+                with transaction.atomic():
+                    stack = import_volume(source)
+                    user = User.objects.create(username=f'bench-{uuid.uuid4().hex[:8]}', role=User.PATHOLOGIST)
+                    client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+                    base = f'/api/pathology/zstacks/{stack.id}'
+                    frames = (
+                        [f'{base}/axial/{z}.png' for z in range(depth)]
+                        + [f'{base}/coronal/{y}.png' for y in range(0, size, max(1, size // depth))]
+                        + [f'{base}/sagittal/{x}.png' for x in range(0, size, max(1, size // depth))]
+                    )
+                    slice_cache.clear()
+                    for label, query in [('full resolution', ''), (f"preview {options['max_size']}px",
+                                                                   f"?max_size={options['max_size']}")]:
+                        for run in ('cold', 'warm'):
+                            self.replay(f'{label}, {run}', client, [frame + query for frame in frames])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def replay(self, label, client, urls):
+        timings = []
+        for url in urls:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: HTTP {response.status_code}')
+        timings.sort()
+        self.stdout.write(f'{label:<28} frames={len(urls):<5} median {statistics.median(timings):6.1f} ms  '
+                          f'p95 {timings[int(len(timings) * 0.95) - 1]:6.1f} ms')
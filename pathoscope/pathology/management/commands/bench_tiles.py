@@ -0,0 +1,69 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from hematology.benchmarks import Rollback
+from pathology.benchmarks import synthetic_slide, pan_zoom_trace
+from pathology.models import Slide
+from pathology.tiles import tile_cache, read_tile
+
+
+class Command(BaseCommand):
+    help = 'Replay a pan-and-zoom trace against the tile endpoint and report tiles/second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slide', type=int, help='Existing slide id (default: a synthetic slide)')
+        parser.add_argument('--width', type=int, default=20000)
+        parser.add_argument('--height', type=int, default=15000)
+        parser.add_argument('--pans', type=int, default=40)
+
+    def handle(self, *args, **options):
+        if options['slide']:
+            slide = Slide.objects.filter(id=options['slide']).first()
+            if slide is None:
+                raise CommandError(f"No slide {options['slide']}")
+            self.run(slide, options['pans'])
+        else:
+            with synthetic_slide(options['width'], options['height']) as slide:
+                self.run(slide, options['pans'])
+
+    def run(self, slide, pans):
+        trace = pan_zoom_trace(slide, pans=pans)
+        self.stdout.write(f'slide={slide.id} {slide.width}x{slide.height} requests={len(trace)} '
+                          f'distinct tiles={len(set(trace))}')
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['*']):
+                user = User.objects.create(username=f'bench-{uuid.uuid4().hex[:8]}', role=User.PATHOLOGIST)
+                client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+                urls = [f'/api/pathology/slides/{slide.id}/tiles/{level}/{col}_{row}.{slide.tile_format}'
+                        for level, col, row in trace]
+
+                tile_cache.clear()
+                self.replay('http, cold cache', lambda: [client.get(url) for url in urls])
+                self.replay('http, warm cache', lambda: [client.get(url) for url in urls])
+                self.stdout.write(f'tile cache: {tile_cache.hits} hits, {tile_cache.misses} misses, '
+                                  f'{tile_cache.size / 2 ** 20:.1f} MB')
+
+                tile_cache.clear()
+                reads = [(slide.digest, level, col, row) for level, col, row in trace]
+                self.replay('reader, cold cache', lambda: [read_tile(*key) for key in reads])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def replay(self, label, func):
+        start = time.perf_counter()
+        results = func()
+        elapsed = time.perf_counter() - start
+        sizes = [len(result.content) if hasattr(result, 'content') else len(result or b'') for result in results]
+        failed = sum(1 for result in results if getattr(result, 'status_code', 200) != 200)
+        if failed:
+            raise CommandError(f'{label}: {failed} request(s) failed')
+        self.stdout.write(f'{label:<20} {len(results) / elapsed:>9.0f} tiles/s  '
+                          f'{sum(sizes) / elapsed / 2 ** 20:>7.1f} MB/s  '
+                          f'{elapsed / len(results) * 1000:.2f} ms/tile')
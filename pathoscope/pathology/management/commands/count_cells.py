@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pathology.analyses import create_analysis, run_analysis, LEVEL_OFFSET
+from pathology.cellcount import CellCountError
+from pathology.models import Slide
+
+
+class Command(BaseCommand):
+    help = 'Count nuclei on a slide and save per-region counts against its test order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slide_id', type=int)
+        parser.add_argument('--level-offset', type=int, default=LEVEL_OFFSET,
+                            help='Pyramid levels below full resolution to analyse')
+        parser.add_argument('--workers', type=int, help='Worker processes (default: PATHOLOGY_ANALYSIS_WORKERS)')
+
+    def handle(self, *args, **options):
+        slide = Slide.objects.filter(id=options['slide_id']).first()
+        if slide is None:
+            raise CommandError(f"No slide {options['slide_id']}")
+
+        def progress(done, total, pixels):
+            self.stdout.write(f'\rtiles {done}/{total}', ending='')
+            self.stdout.flush()
+
+        analysis = create_analysis(slide, options['level_offset'])
+        try:
+            analysis = run_analysis(analysis.id, options['workers'], progress)
+        except CellCountError as e:
+            raise CommandError(e)
+        self.stdout.write('')
+        self.stdout.write(f'analysis {analysis.id}: {analysis.total_cells} nuclei at level {analysis.level}, '
+                          f'{len(analysis.regions)}x{len(analysis.regions[0]) if analysis.regions else 0} regions, '
+                          f'{analysis.megapixels_per_second:.1f} MP/s')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from patient_portal.models import TestOrder
+from pathology.volumes import import_volume, VolumeError
+
+
+class Command(BaseCommand):
+    help = 'Store a Z-stack volume (.npy or multi-page TIFF) for multiplanar viewing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--test-order', type=int)
+        parser.add_argument('--spacing', type=float, nargs=3, default=[1.0, 1.0, 1.0], metavar=('Z', 'Y', 'X'),
+                            help='Voxel size in micrometres')
+
+    def handle(self, *args, **options):
+        order_id = options['test_order']
+        if order_id is not None and not TestOrder.objects.filter(id=order_id).exists():
+            raise CommandError(f'No test order {order_id}')
+        try:
+            volume = import_volume(options['path'], order_id, options['spacing'])
+        except (VolumeError, OSError, ValueError) as e:
+            raise CommandError(e)
+        self.stdout.write(f'Z-stack {volume.id}: {volume.depth}x{volume.height}x{volume.width} '
+                          f'x{volume.channels} {volume.dtype}')
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from patient_portal.models import TestOrder
+from pathology.ingest import ingest
+from pathology.models import Slide
+from pathology.pyramid import PyramidError
+
+
+class Command(BaseCommand):
+    help = 'Build the deep-zoom tile pyramid of a slide image (.npy or TIFF) and attach it to a test order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--test-order', type=int)
+        parser.add_argument('--format', choices=[Slide.JPEG, Slide.PNG], default=Slide.JPEG)
+        parser.add_argument('--workers', type=int, help='Pyramid worker processes (default: PATHOLOGY_INGEST_WORKERS)')
+
+    def handle(self, *args, **options):
+        order_id = options['test_order']
+        if order_id is not None and not TestOrder.objects.filter(id=order_id).exists():
+            raise CommandError(f'No test order {order_id}')
+
+        start = time.perf_counter()
+        pixels = 0
+
+        def progress(done, total, block_pixels):
+            nonlocal pixels
+            pixels += block_pixels
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'\rblocks {done}/{total}  {pixels / elapsed / 1e6:.1f} MP/s', ending='')
+            self.stdout.flush()
+
+        try:
+            slide = ingest(options['path'], order_id, options['format'], options['workers'], progress)
+        except (PyramidError, OSError) as e:
+            raise CommandError(e)
+        elapsed = time.perf_counter() - start
+        self.stdout.write('')
+        self.stdout.write(f'slide {slide.id}: {slide.width}x{slide.height} in {elapsed:.1f} s '
+                          f'({slide.width * slide.height / elapsed / 1e6:.1f} MP/s), container {slide.digest[:12]}')
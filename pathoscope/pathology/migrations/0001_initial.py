@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('patient_portal', '0003_alter_appointment_test_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Slide',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(db_index=True, max_length=64)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('tile_size', models.PositiveIntegerField()),
+                ('tile_format', models.CharField(choices=[('jpeg', 'JPEG'), ('png', 'PNG')], default='jpeg', max_length=10)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('test_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='slides', to='patient_portal.testorder')),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pathology', '0001_initial'),
+        ('patient_portal', '0003_alter_appointment_test_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CellCountAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('level', models.PositiveIntegerField()),
+                ('region_size', models.PositiveIntegerField()),
+                ('tiles_done', models.PositiveIntegerField(default=0)),
+                ('tiles_total', models.PositiveIntegerField(default=0)),
+                ('total_cells', models.PositiveIntegerField(blank=True, null=True)),
+                ('regions', models.JSONField(default=list)),
+                ('megapixels_per_second', models.FloatField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('finished_date', models.DateTimeField(blank=True, null=True)),
+                ('slide', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cell_counts', to='pathology.slide')),
+                ('test_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cell_counts', to='patient_portal.testorder')),
+            ],
+        ),
+    ]
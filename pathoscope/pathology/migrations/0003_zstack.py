@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pathology', '0002_cellcountanalysis'),
+        ('patient_portal', '0003_alter_appointment_test_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZStack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(db_index=True, max_length=64)),
+                ('depth', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('width', models.PositiveIntegerField()),
+                ('channels', models.PositiveSmallIntegerField(default=1)),
+                ('dtype', models.CharField(max_length=20)),
+                ('value_min', models.FloatField(default=0)),
+                ('value_max', models.FloatField(default=255)),
+                ('spacing_z', models.FloatField(default=1.0)),
+                ('spacing_y', models.FloatField(default=1.0)),
+                ('spacing_x', models.FloatField(default=1.0)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('test_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='zstacks', to='patient_portal.testorder')),
+            ],
+        ),
+    ]
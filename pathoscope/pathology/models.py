@@ -0,0 +1,76 @@
+from django.db import models
+from patient_portal.models import TestOrder
+
+
+# A whole-slide image stored as a deep-zoom tile pyramid (see pathology.slidepack)
+class Slide(models.Model):
+    JPEG = 'jpeg'
+    PNG = 'png'
+    
+    FORMAT_CHOICES = [
+        (JPEG, 'JPEG'),
+        (PNG, 'PNG'),
+    ]
+    
+    test_order = models.ForeignKey(TestOrder, on_delete=models.CASCADE, related_name='slides', null=True, blank=True)
+    digest = models.CharField(max_length=64, db_index=True)  # sha256 of the container; names the file
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    tile_size = models.PositiveIntegerField()
+    tile_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default=JPEG)
+    created_date = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Slide {self.id} ({self.width}x{self.height})"
+
+
+# Nuclei counted per region of a slide (see pathology.cellcount)
+class CellCountAnalysis(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    
+    slide = models.ForeignKey(Slide, on_delete=models.CASCADE, related_name='cell_counts')
+    test_order = models.ForeignKey(TestOrder, on_delete=models.CASCADE, related_name='cell_counts', null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    level = models.PositiveIntegerField()  # pyramid level analysed
+    region_size = models.PositiveIntegerField()  # region edge, in full-resolution pixels
+    tiles_done = models.PositiveIntegerField(default=0)
+    tiles_total = models.PositiveIntegerField(default=0)
+    total_cells = models.PositiveIntegerField(null=True, blank=True)
+    regions = models.JSONField(default=list)  # rows of per-region counts, top to bottom
+    megapixels_per_second = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_date = models.DateTimeField(auto_now_add=True)
+    finished_date = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Cell count {self.id} for slide {self.slide_id} ({self.status})"
+
+
+# A Z-stack (focal planes of one field) stored as a .npy volume (see pathology.volumes)
+class ZStack(models.Model):
+    test_order = models.ForeignKey(TestOrder, on_delete=models.CASCADE, related_name='zstacks', null=True, blank=True)
+    digest = models.CharField(max_length=64, db_index=True)  # sha256 of the .npy file; names the file
+    depth = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    width = models.PositiveIntegerField()
+    channels = models.PositiveSmallIntegerField(default=1)  # 1 (grey) or 3 (RGB)
+    dtype = models.CharField(max_length=20)
+    value_min = models.FloatField(default=0)  # range mapped onto 0-255 for display
+    value_max = models.FloatField(default=255)
+    spacing_z = models.FloatField(default=1.0)  # micrometres per voxel
+    spacing_y = models.FloatField(default=1.0)
+    spacing_x = models.FloatField(default=1.0)
+    created_date = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Z-stack {self.id} ({self.depth}x{self.height}x{self.width})"
@@ -0,0 +1,206 @@
+"""
+Deep-zoom pyramid building for whole-slide images.
+
+The image is cut into square blocks of ``tile_size * 2 ** BLOCK_LEVELS``
+pixels (4096 for 256 px tiles), and each block is handled by a worker
+process. A worker reads only its block from the memory-mapped source, cuts
+it into tiles, halves it with a 2x2 mean, cuts again, and so on for
+``BLOCK_LEVELS`` levels. What is left of the block after the last halving is
+written into a memory-mapped ``.npy`` file that holds the next level down,
+and the next pass reads its blocks from that file. Passes repeat until the
+whole remaining image fits in one block, which builds the smallest levels.
+
+No process ever holds more than one block of pixels, so memory use does
+not depend on the slide size. The parent only receives encoded tiles and
+appends them to the container.
+
+Sources are ``.npy`` arrays and TIFF files (read with ``tifffile``, through
+``zarr`` when the TIFF is tiled or compressed). This module imports nothing
+from Django, so spawned workers start quickly.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .slidepack import SlidePackWriter, level_dimensions
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import tifffile
+except ImportError:
+    tifffile = None
+
+try:
+    import zarr
+except ImportError:
+    zarr = None
+
+
+BLOCK_LEVELS = 4
+TILE_SIZE = 256
+JPEG_QUALITY = 85
+SOURCE_SUFFIXES = ('.npy', '.tif', '.tiff', '.svs')
+
+
+class PyramidError(Exception):
+    pass
+
+
+def open_source(path):
+    """The image at ``path`` as a lazily read ``(height, width[, channels])`` array."""
+    suffix = os.path.splitext(str(path))[1].lower()
+    if suffix == '.npy':
+        return np.load(path, mmap_mode='r')
+    if suffix in ('.tif', '.tiff', '.svs'):
+        if tifffile is None:
+            raise PyramidError('Reading TIFF slides requires the tifffile package')
+        try:
+            return tifffile.memmap(path, mode='r')
+        except ValueError:
+            # Tiled or compressed: decode on demand, one block at a time
+            if zarr is None:
+                raise PyramidError('Reading tiled or compressed TIFF slides requires the zarr package')
+            return zarr.open(tifffile.imread(path, aszarr=True, level=0), mode='r')
+    raise PyramidError(f'Unsupported slide format {suffix or path}')
+
+
+def to_rgb(block):
+    block = np.asarray(block)
+    if block.ndim == 2:
+        block = np.repeat(block[:, :, None], 3, axis=2)
+    elif block.shape[2] == 4:
+        block = block[:, :, :3]
+    if block.dtype.kind != 'u':
+        raise PyramidError(f'Unsupported pixel type {block.dtype}')
+    if block.dtype != np.uint8:
+        # 16-bit scanners: keep the top 8 bits
+        block = (block >> (8 * (block.dtype.itemsize - 1))).astype(np.uint8)
+    return block
+
+
+def halve(block):
+    """2x2 mean, rounding odd edges up by repeating the last row/column."""
+    height, width = block.shape[:2]
+    if height % 2 or width % 2:
+        block = np.pad(block, ((0, height % 2), (0, width % 2), (0, 0)), mode='edge')
+    sums = block[0::2, 0::2].astype(np.uint16)
+    sums += block[1::2, 0::2]
+    sums += block[0::2, 1::2]
+    sums += block[1::2, 1::2]
+    sums += 2
+    sums >>= 2
+    return sums.astype(np.uint8)
+
+
+def encode_tile(pixels, tile_format, quality=JPEG_QUALITY):
+    buffer = io.BytesIO()
+    image = Image.fromarray(np.ascontiguousarray(pixels), 'RGB')
+    if tile_format == 'jpeg':
+        image.save(buffer, 'JPEG', quality=quality)
+    else:
+        image.save(buffer, 'PNG', compress_level=6)
+    return buffer.getvalue()
+
+
+def build_block(source_path, reduced_path, level, levels, block_x, block_y, tile_size, tile_format):
+    """
+    Tile one block of ``level`` and ``levels - 1`` levels below it; write the
+    block halved ``levels`` times into ``reduced_path`` (if given). Returns
+    ``(tiles, pixels)`` with tiles as ``(level, col, row, data)``.
+    """
+    source = open_source(source_path)
+    size = tile_size * 2 ** levels
+    y0, x0 = block_y * size, block_x * size
+    block = to_rgb(source[y0:y0 + size, x0:x0 + size])
+    pixels = block.shape[0] * block.shape[1]
+
+    tiles = []
+    scale = 1
+    for current in range(level, level - levels, -1):
+        col0, row0 = x0 // scale // tile_size, y0 // scale // tile_size
+        for top in range(0, block.shape[0], tile_size):
+            for left in range(0, block.shape[1], tile_size):
+                tile = block[top:top + tile_size, left:left + tile_size]
+                tiles.append((current, col0 + left // tile_size, row0 + top // tile_size,
+                              encode_tile(tile, tile_format)))
+        block = halve(block)
+        scale *= 2
+
+    if reduced_path is not None:
+        reduced = np.load(reduced_path, mmap_mode='r+')
+        ry, rx = y0 // scale, x0 // scale
+        reduced[ry:ry + block.shape[0], rx:rx + block.shape[1]] = block
+        reduced.flush()
+        del reduced
+    return tiles, pixels
+
+
+def build_pyramid(source_path, root, tile_size=TILE_SIZE, tile_format='jpeg', workers=None, progress=None):
+    """
+    Build the pyramid of the image at ``source_path`` into a container under
+    ``root`` and return the finished ``SlidePackWriter`` (``digest``,
+    ``path``, ``metadata``). ``progress(done, total, pixels)`` is called as
+    blocks finish.
+    """
+    if np is None or Image is None:
+        raise PyramidError('Building slide pyramids requires the numpy and Pillow packages')
+    source = open_source(source_path)
+    if source.ndim not in (2, 3):
+        raise PyramidError(f'Expected a 2D or RGB image, got shape {source.shape}')
+    height, width = source.shape[:2]
+    del source
+
+    dimensions = level_dimensions(width, height)
+    passes = []
+    level = len(dimensions) - 1
+    while level >= 0:
+        levels = min(BLOCK_LEVELS, level + 1)
+        passes.append((level, levels))
+        level -= levels
+
+    def blocks(level, levels):
+        size = tile_size * 2 ** levels
+        level_width, level_height = dimensions[level]
+        return [(x, y) for y in range(-(-level_height // size)) for x in range(-(-level_width // size))]
+
+    total = sum(len(blocks(level, levels)) for level, levels in passes)
+
+    os.makedirs(root, exist_ok=True)
+    done = 0
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(dir=root) as scratch, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool, \
+            SlidePackWriter(root, width, height, tile_size, tile_format) as writer:
+        current = str(source_path)
+        for level, levels in passes:
+            reduced_path = None
+            if level - levels >= 0:
+                reduced_width, reduced_height = dimensions[level - levels]
+                reduced_path = os.path.join(scratch, f'level-{level - levels}.npy')
+                np.lib.format.open_memmap(reduced_path, mode='w+', dtype=np.uint8,
+                                          shape=(reduced_height, reduced_width, 3)).flush()
+            futures = [
+                pool.submit(build_block, current, reduced_path, level, levels, block_x, block_y,
+                            tile_size, tile_format)
+                for block_x, block_y in blocks(level, levels)
+            ]
+            for future in as_completed(futures):
+                tiles, pixels = future.result()
+                for tile in tiles:
+                    writer.add_tile(*tile)
+                done += 1
+                if progress:
+                    progress(done, total, pixels)
+            current = reduced_path
+    return writer
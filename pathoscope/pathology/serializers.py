@@ -0,0 +1,10 @@
+from rest_framework import serializers
+from .models import CellCountAnalysis
+from pathoscope.fieldsets import SparseFieldsetMixin
+
+
+class CellCountAnalysisSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    class Meta:
+        model = CellCountAnalysis
+        fields = ['id', 'slide', 'test_order', 'status', 'level', 'region_size', 'tiles_done', 'tiles_total',
+                  'total_cells', 'regions', 'megapixels_per_second', 'error', 'created_date', 'finished_date']
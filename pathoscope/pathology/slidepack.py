@@ -0,0 +1,188 @@
+"""
+Packed deep-zoom tile container.
+
+A slide's whole pyramid lives in one file instead of one file per tile:
+
+    b'PSLIDE01'                       magic
+    tile data                         encoded JPEG/PNG tiles, in any order
+    metadata                          JSON: size, tile size, format, levels
+    index                             one '<QI' entry (offset, length) per tile
+    trailer                           '<QQQ8s': metadata offset, metadata
+                                      length, index offset, magic
+
+Levels follow the Deep Zoom convention: level 0 is 1x1 pixel, each level
+doubles the previous one, and the last level is the full image. Tiles are
+numbered level by level, row-major within a level, so a tile's index entry
+is found with one multiplication. A missing tile has length 0.
+
+``SlidePack`` memory-maps the file, so reading a tile is a slice of the
+mapping and the OS page cache does the rest.
+"""
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from pathlib import Path
+
+
+MAGIC = b'PSLIDE01'
+ENTRY = struct.Struct('<QI')
+TRAILER = struct.Struct('<QQQ8s')
+
+
+class SlidePackError(Exception):
+    pass
+
+
+def pack_path(root, digest):
+    return Path(root) / digest[:2] / f'{digest}.pack'
+
+
+def level_dimensions(width, height):
+    """``(width, height)`` of every Deep Zoom level, from 1x1 up to the full image."""
+    max_level = math.ceil(math.log2(max(width, height, 1)))
+    return [
+        (math.ceil(width / 2 ** (max_level - level)), math.ceil(height / 2 ** (max_level - level)))
+        for level in range(max_level + 1)
+    ]
+
+
+def level_layout(width, height, tile_size):
+    """Per level: its size, tile grid and the index of its first tile."""
+    levels = []
+    first = 0
+    for level_width, level_height in level_dimensions(width, height):
+        cols = math.ceil(level_width / tile_size)
+        rows = math.ceil(level_height / tile_size)
+        levels.append({'width': level_width, 'height': level_height, 'cols': cols, 'rows': rows, 'first': first})
+        first += cols * rows
+    return levels
+
+
+class SlidePackWriter:
+    """
+    Write a container tile by tile, in any order:
+
+        with SlidePackWriter(root, width, height, 256, 'jpeg') as writer:
+            writer.add_tile(level, col, row, data)
+        writer.digest, writer.path
+
+    The file is written under a temporary name and renamed on close to
+    ``pack_path(root, digest)``, where ``digest`` is the SHA-256 of the
+    finished file, so readers never see a partial container.
+    """
+
+    def __init__(self, root, width, height, tile_size, tile_format):
+        self.root = Path(root)
+        self.path = None
+        self.metadata = {
+            'width': width,
+            'height': height,
+            'tile_size': tile_size,
+            'format': tile_format,
+            'levels': level_layout(width, height, tile_size),
+        }
+        last = self.metadata['levels'][-1]
+        count = last['first'] + last['cols'] * last['rows']
+        self.offsets = array('Q', bytes(8 * count))
+        self.lengths = array('I', bytes(4 * count))
+        self.hash = hashlib.sha256()
+        self.digest = None
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, self.tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        self.file = os.fdopen(fd, 'wb')
+        self.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, data):
+        self.file.write(data)
+        self.hash.update(data)
+
+    def tile_index(self, level, col, row):
+        try:
+            layout = self.metadata['levels'][level]
+        except IndexError:
+            raise SlidePackError(f'No level {level}')
+        if not (0 <= col < layout['cols'] and 0 <= row < layout['rows']):
+            raise SlidePackError(f'No tile {col}_{row} at level {level}')
+        return layout['first'] + row * layout['cols'] + col
+
+    def add_tile(self, level, col, row, data):
+        index = self.tile_index(level, col, row)
+        self.offsets[index] = self.file.tell()
+        self.lengths[index] = len(data)
+        self.write(data)
+
+    def close(self):
+        metadata = json.dumps(self.metadata, separators=(',', ':')).encode()
+        metadata_offset = self.file.tell()
+        self.write(metadata)
+        index_offset = self.file.tell()
+        entries = bytearray()
+        for offset, length in zip(self.offsets, self.lengths):
+            entries += ENTRY.pack(offset, length)
+        self.write(entries)
+        self.write(TRAILER.pack(metadata_offset, len(metadata), index_offset, MAGIC))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.digest = self.hash.hexdigest()
+        self.path = pack_path(self.root, self.digest)
+        self.path.parent.mkdir(exist_ok=True)
+        os.replace(self.tmp, self.path)
+        return self.digest
+
+    def abort(self):
+        self.file.close()
+        os.unlink(self.tmp)
+
+
+class SlidePack:
+    """Read-only, memory-mapped view of a container."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as handle:
+            try:
+                self.map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SlidePackError(f'{self.path} is empty')
+        if len(self.map) < len(MAGIC) + TRAILER.size or self.map[:len(MAGIC)] != MAGIC:
+            self.map.close()
+            raise SlidePackError(f'{self.path} is not a slide container')
+        metadata_offset, metadata_length, self.index_offset, magic = TRAILER.unpack_from(
+            self.map, len(self.map) - TRAILER.size)
+        if magic != MAGIC:
+            self.map.close()
+            raise SlidePackError(f'{self.path} is truncated')
+        self.metadata = json.loads(self.map[metadata_offset:metadata_offset + metadata_length])
+        self.levels = self.metadata['levels']
+
+    def tile(self, level, col, row):
+        """The encoded tile bytes, or ``None`` if there is no such tile."""
+        if not 0 <= level < len(self.levels):
+            return None
+        layout = self.levels[level]
+        if not (0 <= col < layout['cols'] and 0 <= row < layout['rows']):
+            return None
+        index = layout['first'] + row * layout['cols'] + col
+        offset, length = ENTRY.unpack_from(self.map, self.index_offset + index * ENTRY.size)
+        if not length:
+            return None
+        return self.map[offset:offset + length]
+
+    def close(self):
+        self.map.close()
@@ -0,0 +1,22 @@
+import os
+
+from jobs.queue import task
+from .analyses import run_analysis
+from .ingest import ingest
+
+
+@task(max_attempts=3, atomic=False)
+def ingest_slide(upload_path, test_order_id, tile_format):
+    # Not atomic: the pyramid build takes minutes; ingest() writes the Slide in its own transaction
+    if not os.path.exists(upload_path):
+        return  # an earlier run of this job finished and removed the upload
+    ingest(upload_path, test_order_id, tile_format)
+    try:
+        os.unlink(upload_path)
+    except FileNotFoundError:
+        pass
+
+
+@task(max_attempts=2, atomic=False)
+def count_cells(analysis_id):
+    run_analysis(analysis_id)
@@ -0,0 +1,108 @@
+"""
+Deep-zoom tile serving.
+
+Containers are opened once per process and kept memory-mapped; up to
+``PATHOLOGY_OPEN_SLIDES`` stay open, least recently used first out. Tile
+bytes read from them go through ``tile_cache``, an LRU bounded by
+``PATHOLOGY_TILE_CACHE_BYTES``, so the tiles around the viewer's current
+position are served without touching the mapping again. Containers are
+content-addressed and never modified, so neither cache needs invalidating.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .slidepack import SlidePack, pack_path
+
+
+DEFAULT_TILE_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_OPEN_SLIDES = 16
+
+
+def slides_root():
+    return getattr(settings, 'SLIDES_ROOT', settings.BASE_DIR / 'slides')
+
+
+class TileCache:
+    """Thread-safe LRU of tile bytes, bounded by total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = self.hits = self.misses = 0
+
+
+tile_cache = TileCache(getattr(settings, 'PATHOLOGY_TILE_CACHE_BYTES', DEFAULT_TILE_CACHE_BYTES))
+
+_open_packs = OrderedDict()
+_open_lock = threading.Lock()
+
+
+def open_pack(digest):
+    """The memory-mapped container for ``digest``, opening it if needed."""
+    with _open_lock:
+        pack = _open_packs.get(digest)
+        if pack is not None:
+            _open_packs.move_to_end(digest)
+            return pack
+        pack = _open_packs[digest] = SlidePack(pack_path(slides_root(), digest))
+        # Evicted maps are left to the garbage collector; a request may still be reading one
+        while len(_open_packs) > getattr(settings, 'PATHOLOGY_OPEN_SLIDES', DEFAULT_OPEN_SLIDES):
+            _open_packs.popitem(last=False)
+        return pack
+
+
+def read_tile(digest, level, col, row):
+    """Encoded bytes of one tile, or ``None`` if the slide has no such tile."""
+    key = (digest, level, col, row)
+    data = tile_cache.get(key)
+    if data is None:
+        data = open_pack(digest).tile(level, col, row)
+        if data is not None:
+            tile_cache.put(key, data)
+    return data
+
+
+def deep_zoom_source(slide, tile_url):
+    """OpenSeadragon tile source for ``slide`` (the JSON form of a .dzi descriptor)."""
+    return {
+        'Image': {
+            'xmlns': 'http://schemas.microsoft.com/deepzoom/2008',
+            'Url': tile_url,
+            'Format': slide.tile_format,
+            'Overlap': 0,
+            'TileSize': slide.tile_size,
+            'Size': {'Width': slide.width, 'Height': slide.height},
+        }
+    }
@@ -0,0 +1,24 @@
+from django.urls import path
+from .views import (
+    SlideInfoView,
+    SlideTileView,
+    SlideUploadView,
+    SlideCellCountView,
+    CellCountDetailView,
+    CellCountEventsView,
+    CellCountHeatmapView,
+    ZStackView,
+    ZStackSliceView
+)
+
+urlpatterns = [
+    path('test-orders/<int:test_order_id>/slides/', SlideUploadView.as_view(), name='slide-upload'),
+    path('slides/<int:slide_id>/', SlideInfoView.as_view(), name='slide-info'),
+    path('slides/<int:slide_id>/tiles/<int:level>/<int:col>_<int:row>.<str:tile_format>', SlideTileView.as_view(), name='slide-tile'),
+    path('slides/<int:slide_id>/cell-counts/', SlideCellCountView.as_view(), name='slide-cell-counts'),
+    path('cell-counts/<int:analysis_id>/', CellCountDetailView.as_view(), name='cell-count-detail'),
+    path('cell-counts/<int:analysis_id>/events/', CellCountEventsView.as_view(), name='cell-count-events'),
+    path('cell-counts/<int:analysis_id>/heatmap.png', CellCountHeatmapView.as_view(), name='cell-count-heatmap'),
+    path('zstacks/<int:volume_id>/', ZStackView.as_view(), name='zstack'),
+    path('zstacks/<int:volume_id>/<str:axis>/<int:index>.png', ZStackSliceView.as_view(), name='zstack-slice'),
+]
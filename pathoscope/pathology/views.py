@@ -0,0 +1,207 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from .models import Slide, CellCountAnalysis
+from .serializers import CellCountAnalysisSerializer
+from .tiles import read_tile, deep_zoom_source
+from .ingest import save_upload
+from .pyramid import PyramidError
+from .analyses import create_analysis, analysis_events
+from .heatmap import heatmap_png
+from .volumes import AXES, VolumeError, volume_metadata, axis_length, slice_png
+from .tasks import ingest_slide, count_cells
+from jobs.queue import enqueue
+from patient_portal.models import TestOrder
+from accounts.models import User
+
+CONTENT_TYPES = {Slide.JPEG: 'image/jpeg', Slide.PNG: 'image/png'}
+
+
+def visible_slides(user):
+    # Patients only see slides attached to their own test orders
+    slides = Slide.objects.all()
+    if user.role == User.PATIENT:
+        slides = slides.filter(test_order__patient=user)
+    return slides
+
+
+def visible_analyses(user):
+    return CellCountAnalysis.objects.filter(slide__in=visible_slides(user))
+
+
+class SlideInfoView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, slide_id):
+        slide = visible_slides(request.user).filter(id=slide_id).first()
+        if slide is None:
+            return Response({'error': 'Slide not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        tile_url = reverse('slide-info', args=[slide.id]) + 'tiles/'
+        return Response({
+            'id': slide.id,
+            'test_order': slide.test_order_id,
+            'width': slide.width,
+            'height': slide.height,
+            'tile_size': slide.tile_size,
+            'tile_format': slide.tile_format,
+            'tile_url': tile_url + '{level}/{col}_{row}.' + slide.tile_format,
+            'tile_source': deep_zoom_source(slide, tile_url),
+        })
+
+
+class SlideTileView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, slide_id, level, col, row, tile_format):
+        found = visible_slides(request.user).filter(id=slide_id, tile_format=tile_format).values_list('digest', flat=True)
+        digest = next(iter(found), None)
+        if digest is None:
+            return Response({'error': 'Slide not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Containers are content-addressed, so a tile never changes
+        etag = f'"{digest[:16]}-{level}-{col}-{row}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, max-age=31536000, immutable'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return HttpResponseNotModified(headers=headers)
+        
+        data = read_tile(digest, level, col, row)
+        if data is None:
+            return Response({'error': 'Tile not found'}, status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(data, content_type=CONTENT_TYPES[tile_format], headers=headers)
+
+
+class SlideUploadView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, test_order_id):
+        if request.user.role == User.PATIENT:
+            return Response({'error': 'Only lab staff can upload slides'}, status=status.HTTP_403_FORBIDDEN)
+        if not TestOrder.objects.filter(id=test_order_id).exists():
+            return Response({'error': 'Test order not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        uploaded = request.FILES.get('image')
+        tile_format = request.data.get('tile_format', Slide.JPEG)
+        if uploaded is None:
+            return Response({'error': 'image file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if tile_format not in CONTENT_TYPES:
+            return Response({'error': f'tile_format must be one of {", ".join(CONTENT_TYPES)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            path = save_upload(uploaded)
+        except PyramidError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # The pyramid is built by a job worker; the order's slide_url is set when it is done
+        job = enqueue(ingest_slide, upload_path=str(path), test_order_id=test_order_id, tile_format=tile_format)
+        return Response({'job': job.id, 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+
+
+class SlideCellCountView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, slide_id):
+        # Summaries only; the region grid comes with each analysis
+        analyses = visible_analyses(request.user).filter(slide_id=slide_id).order_by('-created_date')
+        return Response(list(analyses.values('id', 'status', 'level', 'tiles_done', 'tiles_total',
+                                             'total_cells', 'created_date', 'finished_date')))
+    
+    def post(self, request, slide_id):
+        if request.user.role == User.PATIENT:
+            return Response({'error': 'Only lab staff can run analyses'}, status=status.HTTP_403_FORBIDDEN)
+        slide = Slide.objects.filter(id=slide_id).first()
+        if slide is None:
+            return Response({'error': 'Slide not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        analysis = create_analysis(slide)
+        enqueue(count_cells, analysis_id=analysis.id)
+        return Response(CellCountAnalysisSerializer(analysis).data, status=status.HTTP_202_ACCEPTED)
+
+
+class CellCountDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, analysis_id):
+        analysis = visible_analyses(request.user).filter(id=analysis_id).first()
+        if analysis is None:
+            return Response({'error': 'Analysis not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(CellCountAnalysisSerializer(analysis, context={'request': request}).data)
+
+
+class CellCountEventsView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, analysis_id):
+        if not visible_analyses(request.user).filter(id=analysis_id).exists():
+            return Response({'error': 'Analysis not found'}, status=status.HTTP_404_NOT_FOUND)
+        response = StreamingHttpResponse(analysis_events(analysis_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class CellCountHeatmapView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, analysis_id):
+        analysis = visible_analyses(request.user).filter(id=analysis_id, status=CellCountAnalysis.DONE).first()
+        if analysis is None:
+            return Response({'error': 'Analysis not found'}, status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(heatmap_png(analysis.regions), content_type='image/png')
+
+
+def visible_volume(user, volume_id):
+    metadata = volume_metadata(volume_id)
+    if metadata is None or (user.role == User.PATIENT and metadata['test_order__patient_id'] != user.id):
+        return None
+    return metadata
+
+
+class ZStackView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, volume_id):
+        metadata = visible_volume(request.user, volume_id)
+        if metadata is None:
+            return Response({'error': 'Z-stack not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        slice_url = reverse('zstack', args=[volume_id]) + '{axis}/{index}.png'
+        return Response({
+            'id': metadata['id'],
+            'test_order': metadata['test_order_id'],
+            'shape': {'depth': metadata['depth'], 'height': metadata['height'], 'width': metadata['width']},
+            'channels': metadata['channels'],
+            'dtype': metadata['dtype'],
+            'spacing_um': {'z': metadata['spacing_z'], 'y': metadata['spacing_y'], 'x': metadata['spacing_x']},
+            'planes': {axis: axis_length(metadata, axis) for axis in AXES},
+            'slice_url': slice_url,
+        })
+
+
+class ZStackSliceView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, volume_id, axis, index):
+        metadata = visible_volume(request.user, volume_id)
+        if metadata is None:
+            return Response({'error': 'Z-stack not found'}, status=status.HTTP_404_NOT_FOUND)
+        if axis not in AXES or not 0 <= index < axis_length(metadata, axis):
+            return Response({'error': 'Slice not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            max_size = int(request.query_params.get('max_size', 0))
+        except ValueError:
+            return Response({'error': 'max_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Volumes are content-addressed, so a slice never changes
+        etag = f'"{metadata["digest"][:16]}-{axis}-{index}-{max_size}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, max-age=31536000, immutable'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return HttpResponseNotModified(headers=headers)
+        try:
+            data = slice_png(metadata, axis, index, max(0, max_size))
+        except VolumeError as e:
+            # numpy missing or the volume file gone: nothing the client can fix
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return HttpResponse(data, content_type='image/png', headers=headers)
@@ -0,0 +1,202 @@
+"""
+Z-stack volumes and multiplanar reslicing.
+
+A Z-stack is stored as one ``.npy`` array of shape ``(depth, height,
+width)`` or ``(depth, height, width, 3)`` under ``SLIDES_ROOT/volumes``,
+named by content hash. It is opened with ``np.load(mmap_mode='r')``, so a
+reslice is a NumPy view of the mapping:
+
+    axial      volume[z]          one focal plane
+    coronal    volume[:, y]       depth x width
+    sagittal   volume[:, :, x]    depth x height
+
+Previews take every ``step``-th pixel of the view (``view[::step, ::step]``),
+still without copying; the only copy is packing the final pixels for PNG
+encoding. Open volumes and encoded slices are cached per process and never
+go stale, since a stored volume never changes. Volume metadata (including
+who may see it) is cached for ``METADATA_TTL`` seconds, so scrubbing
+through planes costs no database queries beyond authentication.
+"""
+import hashlib
+import math
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+
+from .heatmap import png_bytes
+from .models import ZStack
+from .tiles import TileCache, slides_root
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+AXES = ('axial', 'coronal', 'sagittal')
+DEFAULT_SLICE_CACHE_BYTES = 128 * 1024 * 1024
+DEFAULT_OPEN_VOLUMES = 8
+PNG_LEVEL = 1  # fast compression; slices are re-encoded far more often than stored
+METADATA_TTL = 60
+
+
+class VolumeError(Exception):
+    pass
+
+
+def volume_path(digest):
+    return Path(slides_root()) / 'volumes' / digest[:2] / f'{digest}.npy'
+
+
+slice_cache = TileCache(getattr(settings, 'PATHOLOGY_SLICE_CACHE_BYTES', DEFAULT_SLICE_CACHE_BYTES))
+
+_open_volumes = OrderedDict()
+_metadata = {}
+_lock = threading.Lock()
+
+
+def open_volume(digest):
+    with _lock:
+        volume = _open_volumes.get(digest)
+        if volume is not None:
+            _open_volumes.move_to_end(digest)
+            return volume
+        if np is None:
+            raise VolumeError('Z-stacks require the numpy package')
+        try:
+            volume = np.load(volume_path(digest), mmap_mode='r')
+        except (OSError, ValueError) as e:
+            raise VolumeError(f'Z-stack data is missing or unreadable: {e}') from e
+        _open_volumes[digest] = volume
+        while len(_open_volumes) > getattr(settings, 'PATHOLOGY_OPEN_VOLUMES', DEFAULT_OPEN_VOLUMES):
+            _open_volumes.popitem(last=False)
+        return volume
+
+
+def volume_metadata(volume_id):
+    """Cached ``ZStack`` fields for ``volume_id``, or ``None`` if there is no such volume."""
+    expires, metadata = _metadata.get(volume_id, (0, None))
+    if expires < time.monotonic():
+        metadata = ZStack.objects.filter(id=volume_id).values(
+            'id', 'digest', 'depth', 'height', 'width', 'channels', 'dtype', 'value_min', 'value_max',
+            'spacing_z', 'spacing_y', 'spacing_x', 'test_order_id', 'test_order__patient_id',
+        ).first()
+        if metadata is None:
+            _metadata.pop(volume_id, None)
+        else:
+            _metadata[volume_id] = (time.monotonic() + METADATA_TTL, metadata)
+    return metadata
+
+
+def axis_length(metadata, axis):
+    return {'axial': metadata['depth'], 'coronal': metadata['height'], 'sagittal': metadata['width']}[axis]
+
+
+def reslice(volume, axis, index, step=1):
+    """A zero-copy 2D view of ``volume`` through ``index`` along ``axis``, keeping every ``step``-th pixel."""
+    if axis == 'axial':
+        plane = volume[index]
+    elif axis == 'coronal':
+        plane = volume[:, index]
+    else:
+        plane = volume[:, :, index]
+    return plane[::step, ::step]
+
+
+def preview_step(metadata, axis, max_size):
+    """Smallest stride that fits the reslice within ``max_size`` pixels on its longer side."""
+    if not max_size:
+        return 1
+    rows, cols = {
+        'axial': (metadata['height'], metadata['width']),
+        'coronal': (metadata['depth'], metadata['width']),
+        'sagittal': (metadata['depth'], metadata['height']),
+    }[axis]
+    return max(1, math.ceil(max(rows, cols) / max_size))
+
+
+def to_display(plane, value_min, value_max):
+    # Stretch anything wider than 8 bits to the volume's value range
+    if plane.dtype == np.uint8:
+        return np.ascontiguousarray(plane)
+    span = (value_max - value_min) or 1
+    return ((plane.astype(np.float32) - value_min) * (255 / span)).clip(0, 255).astype(np.uint8)
+
+
+def slice_png(metadata, axis, index, max_size=None):
+    """Encoded PNG of one reslice, from the slice cache when possible."""
+    step = preview_step(metadata, axis, max_size)
+    key = (metadata['digest'], axis, index, step)
+    data = slice_cache.get(key)
+    if data is None:
+        plane = to_display(reslice(open_volume(metadata['digest']), axis, index, step),
+                           metadata['value_min'], metadata['value_max'])
+        height, width = plane.shape[:2]
+        data = png_bytes(width, height, memoryview(plane).cast('B'), metadata['channels'], PNG_LEVEL)
+        slice_cache.put(key, data)
+    return data
+
+
+def import_volume(source, test_order_id=None, spacing=(1.0, 1.0, 1.0)):
+    """
+    Copy a Z-stack (``.npy``, or a multi-page TIFF with tifffile installed)
+    into the volume store and create its ``ZStack``.
+    """
+    if np is None:
+        raise VolumeError('Z-stacks require the numpy package')
+    source = Path(source)
+    if source.suffix.lower() == '.npy':
+        volume = np.load(source, mmap_mode='r')
+    elif source.suffix.lower() in ('.tif', '.tiff'):
+        try:
+            import tifffile
+        except ImportError:
+            raise VolumeError('Reading TIFF Z-stacks requires the tifffile package')
+        volume = tifffile.imread(source)
+    else:
+        raise VolumeError(f'Unsupported Z-stack format {source.suffix or source}')
+    if volume.ndim not in (3, 4) or (volume.ndim == 4 and volume.shape[3] != 3):
+        raise VolumeError(f'Expected (depth, height, width[, 3]), got shape {volume.shape}')
+    if volume.dtype.kind not in 'ui':
+        raise VolumeError(f'Unsupported voxel type {volume.dtype}')
+
+    root = Path(slides_root()) / 'volumes'
+    root.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=root, suffix='.npy', delete=False) as handle:
+        if source.suffix.lower() == '.npy':
+            with open(source, 'rb') as original:
+                shutil.copyfileobj(original, handle, 1 << 20)
+        else:
+            np.save(handle, volume)
+    # Hash in chunks; volumes can be larger than memory
+    digest = hashlib.sha256()
+    with open(handle.name, 'rb') as saved:
+        for chunk in iter(lambda: saved.read(1 << 20), b''):
+            digest.update(chunk)
+    digest = digest.hexdigest()
+    path = volume_path(digest)
+    path.parent.mkdir(exist_ok=True)
+    shutil.move(handle.name, path)
+
+    stored = np.load(path, mmap_mode='r')
+    value_min, value_max = (0, 255) if stored.dtype == np.uint8 else (
+        min(float(plane.min()) for plane in stored), max(float(plane.max()) for plane in stored))
+    return ZStack.objects.create(
+        test_order_id=test_order_id,
+        digest=digest,
+        depth=stored.shape[0],
+        height=stored.shape[1],
+        width=stored.shape[2],
+        channels=stored.shape[3] if stored.ndim == 4 else 1,
+        dtype=str(stored.dtype),
+        value_min=value_min,
+        value_max=value_max,
+        spacing_z=spacing[0],
+        spacing_y=spacing[1],
+        spacing_x=spacing[2],
+    )
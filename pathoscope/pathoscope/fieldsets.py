@@ -0,0 +1,133 @@
+"""
+Sparse fieldsets for read endpoints.
+
+    ?fields=id,status,sample_info.accession_number
+    ?fields=id,status&expand=sample_info
+
+``fields`` lists the keys to render; dotted names narrow embedded objects.
+Embedded relations (``sample_info``) are rendered as before when ``fields``
+is absent, and only when named in ``fields`` or ``expand`` when it is
+present. Unknown names are ignored.
+
+Narrowing applies to the SQL as well: the values()-based serializers only
+select the requested columns, and ``narrow_queryset`` adds ``only()`` /
+``select_related()`` for ModelSerializers.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_fieldsets(request):
+    """
+    Return the requested field tree, or ``None`` to render every field.
+
+    The tree maps field names to ``None`` (render in full) or to a nested
+    tree for embedded objects.
+    """
+    params = getattr(request, 'query_params', request.GET)
+    raw_fields = params.get('fields')
+    if not raw_fields:
+        return None
+
+    tree = {}
+    for path in raw_fields.split(','):
+        parts = [part for part in path.strip().split('.') if part]
+        if not parts:
+            continue
+        node = tree
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                node = None
+                break
+            node = node.setdefault(part, {})
+        if node is not None:
+            node[parts[-1]] = None
+
+    for name in params.get('expand', '').split(','):
+        name = name.strip()
+        if name:
+            tree.setdefault(name, None)
+    return tree
+
+
+class SparseFieldsetMixin:
+    """ModelSerializer mixin that honours ?fields= / ?expand= on read requests."""
+
+    def get_fieldset(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is None:
+            request = self.context.get('request')
+            if request is None or request.method not in SAFE_METHODS:
+                return None
+            return parse_fieldsets(request)
+        if not isinstance(parent, SparseFieldsetMixin):
+            return None
+        tree = parent.get_fieldset()
+        return None if tree is None else tree.get(self.field_name)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        tree = self.get_fieldset()
+        if tree is not None:
+            for name in list(fields):
+                if name not in tree:
+                    fields.pop(name)
+        return fields
+
+
+def _collect_paths(serializer, model, prefix, only, related):
+    for field in serializer.fields.values():
+        if field.source == '*':
+            return False
+        parts = field.source.split('.')
+        current = model
+        for index, part in enumerate(parts):
+            try:
+                model_field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                return False
+            if not model_field.concrete:
+                return False
+            path = prefix + '__'.join(parts[:index + 1])
+            only.add(path)
+            if index < len(parts) - 1 or isinstance(field, serializers.BaseSerializer):
+                if not (model_field.many_to_one or model_field.one_to_one):
+                    return False
+                related.add(path)
+                current = model_field.related_model
+        if isinstance(field, serializers.BaseSerializer):
+            child = getattr(field, 'child', field)
+            if not _collect_paths(child, current, f'{path}__', only, related):
+                return False
+    return True
+
+
+def narrow_queryset(queryset, serializer):
+    """
+    Restrict ``queryset`` to the columns ``serializer`` renders.
+
+    Returns the queryset unchanged if any field cannot be mapped to a
+    concrete model column (method fields, reverse relations, ``source='*'``).
+    """
+    only = set()
+    related = set()
+    if not _collect_paths(serializer, queryset.model, '', only, related):
+        return queryset
+    # Joins the view added for fields that are no longer rendered would clash with only()
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*sorted(related))
+    return queryset.only(*sorted(only))
+
+
+class SparseFieldsetViewMixin:
+    """Generic view mixin that narrows the queryset to the requested fields."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in SAFE_METHODS and parse_fieldsets(self.request) is not None:
+            queryset = narrow_queryset(queryset, self.get_serializer())
+        return queryset
@@ -0,0 +1,102 @@
+"""
+SQLite FTS5 indexes kept in sync with their table by triggers.
+
+Each indexed table ``<table>`` gets an external-content FTS5 table
+``<table>_fts`` and three triggers (``_insert``, ``_delete``, ``_update``)
+that copy every write into it. Migrations create them with
+``create_statements`` in the app that owns the table, so the index lives
+and dies with that app's schema.
+
+SQLite applies many schema changes (``AlterField`` and friends) by copying
+the table into a new one and dropping the old, which drops its triggers
+too. The FTS table survives but silently stops following writes.
+``repair`` recreates missing triggers and rebuilds the affected index; it
+runs after every ``migrate`` (see ``hematology.apps``) and from ``manage.py
+rebuild_search_index``. Keep this in mind when a migration alters an indexed
+table.
+
+This module must not import models: migrations import it.
+"""
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def trigger_names(table):
+    fts = fts_table(table)
+    return [f'{fts}_insert', f'{fts}_delete', f'{fts}_update']
+
+
+def trigger_statements(table, columns):
+    fts = fts_table(table)
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    insert, delete, update = trigger_names(table)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {insert} AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {delete} AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {update} AFTER UPDATE OF {names} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+    ]
+
+
+def rebuild_statement(table):
+    fts = fts_table(table)
+    return f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"
+
+
+def create_statements(table, columns, tokenize=None):
+    """Index table, triggers and initial fill; safe to run again."""
+    options = f", tokenize='{tokenize}'" if tokenize else ''
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table(table)} USING fts5("
+        f"{', '.join(columns)}, content='{table}', content_rowid='id'{options})",
+        *trigger_statements(table, columns),
+        rebuild_statement(table),
+    ]
+
+
+def drop_statements(table):
+    return [f'DROP TRIGGER IF EXISTS {name}' for name in reversed(trigger_names(table))] + [
+        f'DROP TABLE IF EXISTS {fts_table(table)}',
+    ]
+
+
+def sqlite_supports(connection, tokenize=None):
+    """Whether this SQLite has FTS5 (and the ``tokenize`` tokenizer; trigram needs 3.34)."""
+    options = f", tokenize='{tokenize}'" if tokenize else ''
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(f"CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x{options})")
+        except Exception:
+            return False
+        cursor.execute("DROP TABLE temp.fts5_probe")
+    return True
+
+
+def repair(connection, indexes, rebuild=False):
+    """
+    Recreate the missing triggers of ``indexes`` (``(table, columns)`` pairs)
+    whose FTS table exists, and rebuild those indexes (all of them with
+    ``rebuild``). Returns the tables that were rebuilt.
+    """
+    if connection.vendor != 'sqlite':
+        return []
+    repaired = []
+    with connection.cursor() as cursor:
+        tables = set(connection.introspection.table_names(cursor))
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        triggers = {row[0] for row in cursor.fetchall()}
+        for table, columns in indexes:
+            if fts_table(table) not in tables:
+                continue  # not migrated yet, or this SQLite lacks FTS5
+            if rebuild or not set(trigger_names(table)) <= triggers:
+                for statement in trigger_statements(table, columns) + [rebuild_statement(table)]:
+                    cursor.execute(statement)
+                repaired.append(table)
+    return repaired
@@ -0,0 +1,226 @@
+"""
+Per-view request metrics in the Prometheus text format.
+
+``TimingMiddleware`` calls ``record`` once per request with the total time,
+the time and number of database queries, and the time spent rendering the
+response. They are kept per ``(view, method, status class)``: a latency
+histogram plus running sums. Methods outside the standard HTTP ones are
+counted as ``OTHER``.
+
+Recording takes no lock. Every thread writes to its own shard, and only the
+reader (``/metrics``) walks the shards and adds them up; shards of finished
+threads are folded into one retired shard so thread-per-request servers do
+not grow the list.
+
+With ``METRICS_DIR`` set, each process (e.g. every gunicorn worker) also
+writes its totals to ``METRICS_DIR/<pid>-<nonce>.json`` at most every
+``METRICS_FLUSH_INTERVAL`` seconds, and ``/metrics`` sums all the files, so
+any worker serves the numbers of all of them. Files are cumulative and are
+never removed here; clear the directory when the server (re)starts.
+
+Settings:
+    METRICS_DIR              shared snapshot directory; None keeps the metrics per process
+    METRICS_FLUSH_INTERVAL   seconds between snapshots of one process (default 5)
+    METRICS_ALLOWED_IPS      REMOTE_ADDRs that may read /metrics; None allows anyone
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+
+
+# Upper bounds of the latency buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Layout of one series: a count per bucket (the last one is +Inf), then the sums
+DURATION, DB, QUERIES, SERIALIZE = range(len(BUCKETS) + 1, len(BUCKETS) + 5)
+SERIES_LENGTH = len(BUCKETS) + 5
+
+# Anything else is recorded as OTHER, so clients cannot create series at will
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'))
+
+PREFIX = 'pathoscope_http_request'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_local = threading.local()
+_shards = []  # (thread, {key: series}) for every thread that recorded a request
+_retired = {}
+_shards_lock = threading.Lock()  # taken when a thread first records and by readers, never per request
+_flush_lock = threading.Lock()
+_next_flush = 0.0
+_snapshot_file = None  # (pid, path)
+
+
+def local_shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards.append((threading.current_thread(), shard))
+        return shard
+
+
+def record(view, method, status, duration, db=0.0, queries=0, serialize=0.0):
+    """Add one request to this thread's shard, then snapshot the process if one is due."""
+    shard = local_shard()
+    key = (view, method if method in METHODS else 'OTHER', f'{status // 100}xx')
+    series = shard.get(key)
+    if series is None:
+        series = shard[key] = [0] * SERIES_LENGTH
+    series[bisect_left(BUCKETS, duration)] += 1
+    series[DURATION] += duration
+    series[DB] += db
+    series[QUERIES] += queries
+    series[SERIALIZE] += serialize
+
+    if metrics_dir() is not None and time.monotonic() >= _next_flush:
+        flush()
+
+
+def merge(into, series_by_key):
+    for key, series in series_by_key:
+        total = into.get(key)
+        if total is None:
+            total = into[key] = [0] * SERIES_LENGTH
+        for i, value in enumerate(series):
+            total[i] += value
+    return into
+
+
+def process_snapshot():
+    """``{key: series}`` summed over the threads of this process."""
+    with _shards_lock:
+        live = []
+        for thread, shard in _shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                # Nothing writes to a finished thread's shard any more
+                merge(_retired, shard.items())
+        _shards[:] = live
+        totals = merge({}, _retired.items())
+        for _, shard in live:
+            # list() copies the dict in one step, so concurrent inserts cannot break the iteration
+            merge(totals, [(key, list(series)) for key, series in list(shard.items())])
+    return totals
+
+
+def metrics_dir():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    return Path(directory) if directory else None
+
+
+def snapshot_path(directory):
+    global _snapshot_file
+    pid = os.getpid()
+    if _snapshot_file is None or _snapshot_file[0] != pid:
+        # The nonce keeps a reused pid from overwriting the totals of an earlier process
+        _snapshot_file = (pid, directory / f'{pid}-{uuid.uuid4().hex[:8]}.json')
+    return _snapshot_file[1]
+
+
+def flush():
+    """Write this process's totals to ``METRICS_DIR``; skipped while another thread is writing them."""
+    global _next_flush
+    directory = metrics_dir()
+    if directory is None or not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _next_flush = time.monotonic() + getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        data = [[*key, *series] for key, series in process_snapshot().items()]
+        if not data:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        path = snapshot_path(directory)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        # Readers see either the previous file or the complete new one
+        os.replace(tmp, path)
+    except OSError:
+        pass  # metrics must never fail a request
+    finally:
+        _flush_lock.release()
+
+
+def collect():
+    """``{key: series}`` over all processes writing to ``METRICS_DIR``, or this process alone."""
+    directory = metrics_dir()
+    if directory is None:
+        return process_snapshot()
+    flush()
+    totals = {}
+    own = snapshot_path(directory)
+    if not own.exists():
+        merge(totals, process_snapshot().items())
+    for path in directory.glob('*.json'):
+        try:
+            rows = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        merge(totals, [(tuple(row[:3]), row[3:]) for row in rows if len(row) == SERIES_LENGTH + 3])
+    return totals
+
+
+def reset_after_fork():
+    # A forked worker starts with its own empty totals and snapshot file
+    global _local, _shards, _retired, _shards_lock, _flush_lock, _next_flush, _snapshot_file
+    _local = threading.local()
+    _shards, _retired = [], {}
+    _shards_lock, _flush_lock = threading.Lock(), threading.Lock()
+    _next_flush, _snapshot_file = 0.0, None
+
+
+os.register_at_fork(after_in_child=reset_after_fork)
+atexit.register(flush)
+
+
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition(totals):
+    """Render ``{key: series}`` in the Prometheus text format."""
+    lines = [
+        f'# HELP {PREFIX}_duration_seconds Time from the request reaching the middleware to the response leaving it.',
+        f'# TYPE {PREFIX}_duration_seconds histogram',
+    ]
+    rows = sorted(totals.items())
+    labels = {key: 'view="{}",method="{}",status="{}"'.format(*map(label_value, key)) for key, _ in rows}
+    for key, series in rows:
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, '+Inf'), series):
+            cumulative += count
+            le = bound if bound == '+Inf' else number(bound)
+            lines.append(f'{PREFIX}_duration_seconds_bucket{{{labels[key]},le="{le}"}} {cumulative}')
+        lines.append(f'{PREFIX}_duration_seconds_sum{{{labels[key]}}} {number(series[DURATION])}')
+        lines.append(f'{PREFIX}_duration_seconds_count{{{labels[key]}}} {cumulative}')
+
+    for name, index, help_text in (
+        ('db_seconds_total', DB, 'Time spent in database queries.'),
+        ('db_queries_total', QUERIES, 'Number of database queries.'),
+        ('serialize_seconds_total', SERIALIZE, 'Time spent rendering response bodies.'),
+    ):
+        lines += [f'# HELP {PREFIX}_{name} {help_text}', f'# TYPE {PREFIX}_{name} counter']
+        lines += [f'{PREFIX}_{name}{{{labels[key]}}} {number(series[index])}' for key, series in rows]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', None)
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(exposition(collect()), content_type=CONTENT_TYPE)
@@ -0,0 +1,169 @@
+"""
+Response compression with gzip/brotli negotiation, and request timing.
+
+Extends Django's ``GZipMiddleware`` with a configurable size threshold and
+brotli support. Brotli is used when the ``brotli`` package is installed and
+the client prefers it (or ranks it equal to gzip).
+
+Settings:
+    RESPONSE_COMPRESSION_MIN_SIZE   bodies smaller than this are sent as-is (default 1024)
+    RESPONSE_COMPRESSION_BROTLI_QUALITY   brotli quality, 0-11 (default 5)
+    SERVER_TIMING   add a Server-Timing header to every response (default False)
+"""
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from . import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+def parse_accept_encoding(header):
+    """Return a ``{coding: q}`` dict from an Accept-Encoding header."""
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def negotiate_encoding(header):
+    """Pick ``'br'``, ``'gzip'`` or ``None`` for the given Accept-Encoding header."""
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get('*', 0.0)
+    gzip_q = codings.get('gzip', wildcard)
+    br_q = codings.get('br', wildcard) if brotli is not None else 0.0
+    if br_q > 0 and br_q >= gzip_q:
+        return 'br'
+    if gzip_q > 0:
+        return 'gzip'
+    return None
+
+
+def compress_sequence_br(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 1024)
+        self.brotli_quality = getattr(settings, 'RESPONSE_COMPRESSION_BROTLI_QUALITY', 5)
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        if response.has_header('Content-Encoding'):
+            return response
+
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding != 'br' or (response.streaming and response.is_async):
+            # GZipMiddleware sets Vary and only compresses when gzip is accepted
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if response.streaming:
+            response.streaming_content = compress_sequence_br(response.streaming_content, self.brotli_quality)
+            del response.headers['Content-Length']
+        else:
+            compressed_content = brotli.compress(response.content, quality=self.brotli_quality)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+
+        return response
+
+
+class QueryTimer:
+    """``execute_wrapper`` that adds up the time and number of queries."""
+
+    def __init__(self):
+        self.duration = 0.0
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class TimingMiddleware:
+    """
+    Times each request: total, database queries and response rendering. The
+    numbers go to ``pathoscope.metrics`` under the URL name of the view and,
+    with ``SERVER_TIMING``, to a ``Server-Timing`` header. Keep it first in
+    ``MIDDLEWARE`` so the total covers the other middleware too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'SERVER_TIMING', False)
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        request._render_time = 0.0
+        timer = QueryTimer()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unmatched'
+        metrics.record(view, request.method, response.status_code, duration,
+                       timer.duration, timer.count, request._render_time)
+
+        if self.server_timing:
+            response.headers['Server-Timing'] = (
+                f'db;dur={timer.duration * 1000:.1f};desc="{timer.count} queries", '
+                f'serialize;dur={request._render_time * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # Django renders DRF and template responses right after this hook
+        start = time.perf_counter()
+
+        def rendered(response):
+            request._render_time += time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,49 @@
+"""
+Fast JSON rendering for API responses.
+
+``FastJSONRenderer`` uses orjson when it is installed and falls back to DRF's
+stdlib ``JSONRenderer`` otherwise. Anything orjson does not handle natively
+(``Decimal``, dates and times, lazy strings, ...) goes through DRF's own
+``JSONEncoder.default``, so both renderers encode those values the same way.
+
+The output is equivalent JSON but not always byte-identical to DRF's:
+
+- Floats written in exponent form drop the ``+`` and leading zeros of the
+  exponent (``1e16`` and ``1e-7`` rather than ``1e+16`` and ``1e-07``).
+- NaN and infinities become ``null``. DRF raises ``ValueError`` for them
+  under the default ``STRICT_JSON``; with ``STRICT_JSON = False`` this
+  renderer hands the response to DRF, which writes ``NaN``/``Infinity``.
+- Integers wider than 64 bits and non-compact or ASCII-only output are also
+  left to DRF.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=JSONEncoder().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except TypeError:
+            # e.g. integers wider than 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer so the output stays a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -43,6 +43,8 @@ INSTALLED_APPS = [
     'accounts',                 # Your new app
     'patient_portal',
     'hematology',
+    'pathology',
+    'jobs',
     'corsheaders'
 ]
 
@@ -50,10 +52,17 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    # Uses orjson when installed, otherwise behaves like DRF's JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'pathoscope.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 MIDDLEWARE = [
+    'pathoscope.middleware.TimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'pathoscope.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -142,4 +151,43 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 # Allow credentials (tokens/cookies) to be sent in cross-origin requests during development
-CORS_ALLOW_CREDENTIALS = True
\ No newline at end of file
+CORS_ALLOW_CREDENTIALS = True
+
+# gzip/brotli response compression (brotli needs the `brotli` package)
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+RESPONSE_COMPRESSION_BROTLI_QUALITY = 5
+
+# Run the autoverification rules when a sample reaches awaiting validation
+HEMATOLOGY_AUTOVERIFY = True
+
+# Closed samples and completed queue entries older than this move to the archive tables
+HEMATOLOGY_ARCHIVE_RETENTION_DAYS = 365
+
+# Rendered PDF reports, stored by content hash
+REPORTS_ROOT = BASE_DIR / 'reports'
+
+# Background jobs run by `manage.py run_jobs`; JOBS_EAGER runs them in-process after commit instead
+JOBS_EAGER = False
+JOBS_LOCK_TIMEOUT = 600
+
+# Whole-slide image tile containers, stored by content hash
+SLIDES_ROOT = BASE_DIR / 'slides'
+PATHOLOGY_TILE_CACHE_BYTES = 64 * 1024 * 1024  # per process
+PATHOLOGY_OPEN_SLIDES = 16
+PATHOLOGY_INGEST_WORKERS = None  # pyramid build processes; None means one per CPU
+PATHOLOGY_ANALYSIS_WORKERS = None  # cell-counting processes
+PATHOLOGY_SLICE_CACHE_BYTES = 128 * 1024 * 1024  # encoded Z-stack reslices, per process
+
+# Rendered patient results, per process; set PATIENT_RESULTS_CACHE to a CACHES alias to share them between processes
+PATIENT_RESULTS_CACHE = None
+PATIENT_RESULTS_CACHE_BYTES = 32 * 1024 * 1024
+PATIENT_RESULTS_CACHE_TTL = 60  # seconds a process may serve its own copy without a shared cache
+
+# Front-desk patient/sample search: total time allowed for the index queries of one search
+FRONT_DESK_SEARCH_BUDGET_MS = 250
+
+# Request timing: Server-Timing headers and per-view latency histograms on /metrics
+SERVER_TIMING = DEBUG  # the header shows query counts and timings to every client
+METRICS_DIR = None  # directory shared by the gunicorn workers; clear it on start. None keeps metrics per process
+METRICS_FLUSH_INTERVAL = 5  # seconds between snapshots of one worker
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # None allows anyone to read /metrics
\ No newline at end of file
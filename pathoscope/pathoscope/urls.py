@@ -17,10 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include  # Import 'include'
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')), # This adds your routes
     path('api/accounts/', include('accounts.urls')),
     path('api/patient-portal/', include('patient_portal.urls')),
     path('api/hematology/', include('hematology.urls')),
+    path('api/pathology/', include('pathology.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
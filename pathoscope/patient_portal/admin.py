@@ -1,7 +1,23 @@
 from django.contrib import admin
-from .models import PatientProfile, Appointment, TestOrder, Invoice
+from .models import PatientProfile, Appointment, TestOrder, Invoice, InvoiceLine, Payment, PatientBalance, DailyRevenue
 
 admin.site.register(PatientProfile)
 admin.site.register(Appointment)
 admin.site.register(TestOrder)
-admin.site.register(Invoice)
\ No newline at end of file
+admin.site.register(Invoice)
+admin.site.register(InvoiceLine)
+admin.site.register(Payment)
+
+
+@admin.register(PatientBalance)
+class PatientBalanceAdmin(admin.ModelAdmin):
+    list_display = ['patient', 'invoiced', 'paid', 'balance']
+    ordering = ['-balance']
+
+
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(admin.ModelAdmin):
+    list_display = ['day', 'test_type', 'invoiced', 'collected', 'lines']
+    list_filter = ['test_type']
+    date_hierarchy = 'day'
+    ordering = ['-day', 'test_type']
\ No newline at end of file
@@ -0,0 +1,247 @@
+"""
+Billing ledger.
+
+Every invoice is stored as ``InvoiceLine`` rows (one per billed test, with
+its test type) next to the ``Invoice.items`` JSON the patient portal shows,
+and every payment as a ``Payment`` row. In the same transaction as each
+write, two rollups are updated under row locks:
+
+    PatientBalance    invoiced, paid and outstanding per patient
+    DailyRevenue      invoiced, collected and line count per day and test type
+
+so balances and finance reports read one row per patient or per day instead
+of scanning invoices and parsing their JSON. A payment is split across the
+invoice's test types in proportion to the line prices. ``rebuild_ledger``
+recreates lines, missing payments and rollups from the invoices (backfill).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import DailyRevenue, Invoice, InvoiceLine, PatientBalance, Payment, TEST_PRICES, TestOrder
+
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+TOP_BALANCES = 20
+
+
+class BillingError(Exception):
+    pass
+
+
+def money(value):
+    # Same output as the serializers' DecimalField(decimal_places=2)
+    return f'{(value or ZERO).quantize(CENT):f}'
+
+
+def apply_rollups(balances, revenue):
+    """
+    Add ``{patient_id: (invoiced, paid)}`` to the patient balances and
+    ``{(day, test_type): (invoiced, collected, lines)}`` to the daily revenue.
+    Rows are locked in key order so concurrent writers cannot deadlock.
+    """
+    with transaction.atomic():
+        for patient_id, (invoiced, paid) in sorted(balances.items()):
+            row, _ = PatientBalance.objects.select_for_update().get_or_create(patient_id=patient_id)
+            row.invoiced += invoiced
+            row.paid += paid
+            row.balance = row.invoiced - row.paid
+            row.save()
+        for (day, test_type), (invoiced, collected, lines) in sorted(revenue.items()):
+            row, _ = DailyRevenue.objects.select_for_update().get_or_create(day=day, test_type=test_type)
+            row.invoiced += invoiced
+            row.collected += collected
+            row.lines += lines
+            row.save()
+
+
+def split_by_type(amount, type_totals):
+    """Split ``amount`` over ``{test_type: total}`` in proportion, to the cent; the largest share takes the rounding."""
+    grand_total = sum(type_totals.values(), ZERO)
+    if not grand_total:
+        return {}
+    shares = {test_type: (amount * total / grand_total).quantize(CENT) for test_type, total in type_totals.items()}
+    largest = max(type_totals, key=lambda test_type: (type_totals[test_type], test_type))
+    shares[largest] += amount - sum(shares.values(), ZERO)
+    return shares
+
+
+def create_invoice(appointment):
+    """Invoice the test orders of ``appointment``, with its ledger lines and rollups."""
+    orders = list(appointment.test_orders.order_by('id').values_list('id', 'test_type', 'test_name', 'price'))
+    with transaction.atomic():
+        invoice = Invoice.objects.create(
+            patient_id=appointment.patient_id,
+            appointment=appointment,
+            amount=sum((price for *_, price in orders), ZERO),
+            items=[{'test_name': test_name, 'price': float(price)} for _, _, test_name, price in orders],
+        )
+        InvoiceLine.objects.bulk_create([
+            InvoiceLine(invoice=invoice, test_order_id=order_id, test_type=test_type, test_name=test_name, price=price)
+            for order_id, test_type, test_name, price in orders
+        ])
+        day = timezone.localdate(invoice.created_date)
+        revenue = defaultdict(lambda: [ZERO, ZERO, 0])
+        for _, test_type, _, price in orders:
+            revenue[(day, test_type)][0] += price
+            revenue[(day, test_type)][2] += 1
+        apply_rollups({invoice.patient_id: (invoice.amount, ZERO)}, revenue)
+    return invoice
+
+
+def invoice_paid(invoice):
+    return invoice.payments.aggregate(total=Sum('amount'))['total'] or ZERO
+
+
+def record_payment(invoice_id, patient_id, amount=None, now=None):
+    """
+    Record a payment of ``amount`` (default: everything outstanding) on one of
+    ``patient_id``'s invoices and update its status. Raises
+    ``Invoice.DoesNotExist`` or ``BillingError``.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        invoice = Invoice.objects.select_for_update().get(id=invoice_id, patient_id=patient_id)
+        outstanding = invoice.amount - invoice_paid(invoice)
+        if invoice.payment_status == Invoice.PAID or outstanding <= 0:
+            raise BillingError('Invoice is already paid')
+        amount = outstanding if amount is None else Decimal(str(amount))
+        # Range checks come before rounding: quantize() fails on amounts with more digits than the context allows
+        if amount > outstanding:
+            raise BillingError(f'Payment exceeds the outstanding amount of {outstanding}')
+        if amount <= 0 or amount.quantize(CENT) <= 0:
+            raise BillingError('Payment amount must be positive')
+        amount = amount.quantize(CENT)
+
+        payment = Payment.objects.create(invoice=invoice, patient_id=patient_id, amount=amount, paid_date=now)
+        invoice.payment_status = Invoice.PAID if amount == outstanding else Invoice.PARTIAL
+        invoice.paid_date = now
+        invoice.save(update_fields=['payment_status', 'paid_date'])
+
+        type_totals = dict(invoice.lines.values('test_type').annotate(total=Sum('price')).values_list('test_type', 'total'))
+        day = timezone.localdate(now)
+        apply_rollups(
+            {patient_id: (ZERO, amount)},
+            {(day, test_type): (ZERO, share, 0) for test_type, share in split_by_type(amount, type_totals).items()},
+        )
+    return payment
+
+
+def line_test_type(test_name, order_test_type, appointment_test_type):
+    # Invoices bill their orders, so an order's own type wins, as in create_invoice
+    if order_test_type:
+        return order_test_type
+    if appointment_test_type:
+        return appointment_test_type
+    for test_type, prices in TEST_PRICES.items():
+        if test_name in prices:
+            return test_type
+    return TestOrder.HEMATOLOGY
+
+
+def rebuild_ledger():
+    """
+    Recreate invoice lines from ``Invoice.items``, a payment for every paid
+    invoice without one, and both rollups. Returns ``(lines, payments)``
+    created. Partial payments made before the ledger existed are unknown and
+    stay unrecorded.
+    """
+    with transaction.atomic():
+        InvoiceLine.objects.all().delete()
+        PatientBalance.objects.all().delete()
+        DailyRevenue.objects.all().delete()
+
+        order_rows = TestOrder.objects.exclude(appointment=None).values_list(
+            'appointment_id', 'test_name', 'id', 'test_type')
+        orders = {(appointment_id, test_name): (order_id, test_type)
+                  for appointment_id, test_name, order_id, test_type in order_rows}
+        lines = []
+        for invoice_id, items, appointment_id, test_type in Invoice.objects.values_list(
+                'id', 'items', 'appointment_id', 'appointment__test_type').iterator():
+            for item in items or []:
+                order_id, order_test_type = orders.get((appointment_id, item.get('test_name')), (None, None))
+                lines.append(InvoiceLine(
+                    invoice_id=invoice_id,
+                    test_order_id=order_id,
+                    test_type=line_test_type(item.get('test_name'), order_test_type, test_type),
+                    test_name=item.get('test_name') or '',
+                    price=Decimal(str(item.get('price') or 0)).quantize(CENT),
+                ))
+        InvoiceLine.objects.bulk_create(lines, batch_size=1000)
+
+        unrecorded = Invoice.objects.filter(payment_status=Invoice.PAID, payments__isnull=True)
+        payments = Payment.objects.bulk_create([
+            Payment(invoice_id=invoice_id, patient_id=patient_id, amount=amount, paid_date=paid_date or created_date)
+            for invoice_id, patient_id, amount, paid_date, created_date in unrecorded.values_list(
+                'id', 'patient_id', 'amount', 'paid_date', 'created_date')
+        ], batch_size=1000)
+
+        balances = defaultdict(lambda: [ZERO, ZERO])
+        for patient_id, total in Invoice.objects.values('patient_id').annotate(total=Sum('amount')).values_list(
+                'patient_id', 'total'):
+            balances[patient_id][0] = total
+        for patient_id, total in Payment.objects.values('patient_id').annotate(total=Sum('amount')).values_list(
+                'patient_id', 'total'):
+            balances[patient_id][1] = total
+        PatientBalance.objects.bulk_create([
+            PatientBalance(patient_id=patient_id, invoiced=invoiced, paid=paid, balance=invoiced - paid)
+            for patient_id, (invoiced, paid) in balances.items()
+        ], batch_size=1000)
+
+        revenue = defaultdict(lambda: [ZERO, ZERO, 0])
+        for created_date, test_type, price in InvoiceLine.objects.values_list(
+                'invoice__created_date', 'test_type', 'price').iterator():
+            entry = revenue[(timezone.localdate(created_date), test_type)]
+            entry[0] += price
+            entry[2] += 1
+        invoice_types = defaultdict(dict)
+        for invoice_id, test_type, total in InvoiceLine.objects.values('invoice_id', 'test_type').annotate(
+                total=Sum('price')).values_list('invoice_id', 'test_type', 'total'):
+            invoice_types[invoice_id][test_type] = total
+        for invoice_id, amount, paid_date in Payment.objects.values_list('invoice_id', 'amount', 'paid_date').iterator():
+            for test_type, share in split_by_type(amount, invoice_types[invoice_id]).items():
+                revenue[(timezone.localdate(paid_date), test_type)][1] += share
+        DailyRevenue.objects.bulk_create([
+            DailyRevenue(day=day, test_type=test_type, invoiced=invoiced, collected=collected, lines=count)
+            for (day, test_type), (invoiced, collected, count) in revenue.items()
+        ], batch_size=1000)
+    return len(lines), len(payments)
+
+
+def finance_report(start, end, top=TOP_BALANCES):
+    """
+    Revenue per day and test type for the inclusive date range, with totals,
+    and the outstanding balance over all patients, largest first.
+    """
+    days = list(DailyRevenue.objects.filter(day__gte=start, day__lte=end).order_by('day', 'test_type').values(
+        'day', 'test_type', 'invoiced', 'collected', 'lines'))
+    totals = {
+        'invoiced': money(sum((row['invoiced'] for row in days), ZERO)),
+        'collected': money(sum((row['collected'] for row in days), ZERO)),
+        'lines': sum(row['lines'] for row in days),
+    }
+    for row in days:
+        row['invoiced'], row['collected'] = money(row['invoiced']), money(row['collected'])
+    owing = PatientBalance.objects.filter(balance__gt=0)
+    outstanding = owing.aggregate(total=Sum('balance'), patients=Count('patient_id'))
+    largest = owing.order_by('-balance', 'patient_id').values(
+        'patient_id', 'patient__username', 'invoiced', 'paid', 'balance')[:top]
+    return {
+        'start': start,
+        'end': end,
+        'days': days,
+        'totals': totals,
+        'outstanding': {
+            'total': money(outstanding['total']),
+            'patients': outstanding['patients'],
+            'largest': [
+                {'patient_id': row['patient_id'], 'patient_name': row['patient__username'],
+                 'invoiced': money(row['invoiced']), 'paid': money(row['paid']), 'balance': money(row['balance'])}
+                for row in largest
+            ],
+        },
+    }
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from patient_portal.billing import rebuild_ledger
+from patient_portal.models import DailyRevenue, PatientBalance
+
+
+class Command(BaseCommand):
+    help = 'Recreate invoice lines, payments for paid invoices and the billing rollups from invoices (backfill)'
+
+    def handle(self, *args, **options):
+        lines, payments = rebuild_ledger()
+        self.stdout.write(f'{lines} invoice lines, {payments} payments recorded; '
+                          f'{PatientBalance.objects.count()} balances, {DailyRevenue.objects.count()} revenue rows')
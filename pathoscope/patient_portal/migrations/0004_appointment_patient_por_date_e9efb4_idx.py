@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_portal', '0003_alter_appointment_test_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['date', 'time'], name='patient_por_date_e9efb4_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:30
+
+from django.db import migrations
+
+from pathoscope import fts
+
+
+# Front-desk search index over patient phone numbers (see hematology.search). On SQLite the
+# FTS5 triggers are dropped whenever a migration rebuilds patient_portal_patientprofile;
+# pathoscope.fts.repair recreates them after migrate.
+TABLE = 'patient_portal_patientprofile'
+COLUMNS = ['phone']
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        if not fts.sqlite_supports(connection, 'trigram'):
+            return  # search falls back to icontains
+        statements = fts.create_statements(TABLE, COLUMNS, 'trigram')
+    elif connection.vendor == 'postgresql':
+        expression = " || ' ' || ".join(COLUMNS)
+        statements = [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            f"CREATE INDEX IF NOT EXISTS {TABLE}_search_idx ON {TABLE} USING GIN (({expression}) gin_trgm_ops)",
+        ]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        statements = fts.drop_statements(TABLE)
+    elif connection.vendor == 'postgresql':
+        statements = [f"DROP INDEX IF EXISTS {TABLE}_search_idx"]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_portal', '0005_dailyrevenue_invoiceline_patientbalance_payment'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
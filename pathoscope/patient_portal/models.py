@@ -61,6 +61,11 @@ class Appointment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=CONFIRMED)
     notes = models.TextField(blank=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'time']),  # accessioning worklist windows
+        ]
+    
     def __str__(self):
         return f"{self.patient.username} - {self.date} {self.time}"
 
@@ -120,4 +125,61 @@ class Invoice(models.Model):
     items = models.JSONField(default=list)  # Store list of {test_name, price}
     
     def __str__(self):
-        return f"Invoice {self.id} - {self.patient.username}"
\ No newline at end of file
+        return f"Invoice {self.id} - {self.patient.username}"
+
+
+# Invoice ledger (see patient_portal.billing): one line per billed test and one row per payment
+class InvoiceLine(models.Model):
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='lines')
+    test_order = models.ForeignKey(TestOrder, on_delete=models.SET_NULL, null=True, blank=True, related_name='invoice_lines')
+    test_type = models.CharField(max_length=20, choices=TestOrder.TEST_TYPE_CHOICES)
+    test_name = models.CharField(max_length=100)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    def __str__(self):
+        return f"Invoice {self.invoice_id} - {self.test_name}: {self.price}"
+
+
+class Payment(models.Model):
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='payments')
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    paid_date = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['paid_date']),
+        ]
+    
+    def __str__(self):
+        return f"Payment {self.id} - Invoice {self.invoice_id}: {self.amount}"
+
+
+# Maintained with every invoice and payment, so balances are never summed from the ledger
+class PatientBalance(models.Model):
+    patient = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='balance')
+    invoiced = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # invoiced - paid
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['balance']),
+        ]
+    
+    def __str__(self):
+        return f"Balance of {self.patient_id}: {self.balance}"
+
+
+class DailyRevenue(models.Model):
+    day = models.DateField()
+    test_type = models.CharField(max_length=20, choices=TestOrder.TEST_TYPE_CHOICES)
+    invoiced = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    collected = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # payments, split by line price
+    lines = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = [('day', 'test_type')]
+    
+    def __str__(self):
+        return f"{self.day} {self.test_type}: {self.invoiced} invoiced, {self.collected} collected"
\ No newline at end of file
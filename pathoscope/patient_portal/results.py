@@ -0,0 +1,184 @@
+"""
+Cached patient-facing results.
+
+A patient's orders and released results are rendered to JSON once and
+served from cache until something the patient can see changes. Two levels:
+
+    per process    LRU of rendered bytes, bounded by PATIENT_RESULTS_CACHE_BYTES
+    shared         optional Django cache (the PATIENT_RESULTS_CACHE alias)
+
+Every patient has a version number, kept in the shared cache (as a key that
+never expires) when there is one. Payloads are stored under their version,
+and invalidating a patient just bumps it, so a read never returns a payload
+rendered before the last invalidation, even in another process. Without a
+shared cache the version lives in the process; other processes then see
+changes only once their copy is ``PATIENT_RESULTS_CACHE_TTL`` seconds old.
+
+Writers call ``invalidate_patients`` (or ``invalidate_orders``) after their
+change, inside its transaction; the version is bumped when it commits. Nothing is invalidated
+for archiving, which moves results without changing what patients see.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from hematology.fast_serializers import decimal_to_representation
+from hematology.models import ArchivedTestResult, TestResult
+from pathoscope.renderers import FastJSONRenderer
+from .models import TestOrder
+
+
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+DEFAULT_TTL = 60
+SHARED_TIMEOUT = 24 * 60 * 60
+
+
+class ResultsCache:
+    """Thread-safe LRU of ``patient_id -> (version, expires, data)``, bounded by total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.versions = {}  # used when there is no shared cache
+        self.lock = threading.Lock()
+
+    def get(self, patient_id, version):
+        with self.lock:
+            entry = self.entries.get(patient_id)
+            if entry is None or entry[0] != version or entry[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self.entries.move_to_end(patient_id)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, patient_id, version, data, ttl):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            if self.versions.get(patient_id, 0) > version:
+                return  # invalidated while rendering
+            self.discard(patient_id)
+            self.entries[patient_id] = (version, time.monotonic() + ttl, data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted[2])
+
+    def discard(self, patient_id):
+        entry = self.entries.pop(patient_id, None)
+        if entry is not None:
+            self.size -= len(entry[2])
+
+    def invalidate(self, patient_id):
+        with self.lock:
+            self.versions[patient_id] = self.versions.get(patient_id, 0) + 1
+            self.discard(patient_id)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+            self.size = self.hits = self.misses = 0
+
+
+results_cache = ResultsCache(getattr(settings, 'PATIENT_RESULTS_CACHE_BYTES', DEFAULT_CACHE_BYTES))
+
+
+def shared_cache():
+    alias = getattr(settings, 'PATIENT_RESULTS_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def version_key(patient_id):
+    return f'patient-results:{patient_id}:version'
+
+
+def payload_key(patient_id, version):
+    return f'patient-results:{patient_id}:{version}'
+
+
+def current_version(patient_id, shared):
+    if shared is None:
+        return results_cache.versions.get(patient_id, 0)
+    version = shared.get(version_key(patient_id))
+    if version is None:
+        # Start from the clock, not 0, so an evicted version never matches an old payload
+        shared.add(version_key(patient_id), time.time_ns(), None)
+        version = shared.get(version_key(patient_id))
+    return version
+
+
+def render_results(patient_id):
+    """JSON bytes of the patient's orders, newest first, each with its validated results."""
+    orders = list(TestOrder.objects.filter(patient_id=patient_id).order_by('-order_date', '-id').values(
+        'id', 'test_type', 'test_name', 'order_date', 'status', 'report_url', 'slide_url', 'price'))
+    results = {}
+    for model in (ArchivedTestResult, TestResult):
+        rows = model.objects.filter(sample__test_order__patient_id=patient_id, validated=True).order_by(
+            'analyte__analyte_name', 'id').values_list(
+            'sample__test_order_id', 'analyte__analyte_name', 'analyte__unit', 'value', 'flag_type',
+            'analyte__normal_range_low', 'analyte__normal_range_high', 'validated_date')
+        for order_id, name, unit, value, flag_type, low, high, validated_date in rows:
+            results.setdefault(order_id, []).append({
+                'analyte_name': name,
+                'unit': unit,
+                'value': decimal_to_representation(value),
+                'flag_type': flag_type,
+                'normal_range_low': decimal_to_representation(low),
+                'normal_range_high': decimal_to_representation(high),
+                'validated_date': validated_date,
+            })
+    for order in orders:
+        order['price'] = decimal_to_representation(order['price'])
+        order['results'] = results.get(order['id'], [])
+    return FastJSONRenderer().render({'patient_id': patient_id, 'orders': orders})
+
+
+def patient_results(patient_id):
+    """Rendered results of ``patient_id``, from cache when they are current."""
+    shared = shared_cache()
+    version = current_version(patient_id, shared)
+    data = results_cache.get(patient_id, version)
+    if data is not None:
+        return data
+    if shared is not None:
+        data = shared.get(payload_key(patient_id, version))
+    if data is None:
+        data = render_results(patient_id)
+        if shared is not None:
+            shared.set(payload_key(patient_id, version), data, SHARED_TIMEOUT)
+    results_cache.put(patient_id, version, data, getattr(settings, 'PATIENT_RESULTS_CACHE_TTL', DEFAULT_TTL))
+    return data
+
+
+def bump_versions(patient_ids):
+    shared = shared_cache()
+    for patient_id in patient_ids:
+        results_cache.invalidate(patient_id)
+        if shared is not None:
+            try:
+                shared.incr(version_key(patient_id))
+            except ValueError:
+                shared.add(version_key(patient_id), time.time_ns(), None)
+
+
+def invalidate_patients(patient_ids):
+    """
+    Drop the cached results of ``patient_ids`` when the current transaction
+    commits. They are rendered again on the patient's next read.
+    """
+    patient_ids = set(patient_ids)
+    if patient_ids:
+        transaction.on_commit(lambda: bump_versions(patient_ids))
+
+
+def invalidate_orders(order_ids):
+    invalidate_patients(TestOrder.objects.filter(id__in=order_ids).values_list('patient_id', flat=True))
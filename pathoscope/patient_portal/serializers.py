@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import PatientProfile, Appointment, TestOrder, Invoice, TEST_PRICES
+from pathoscope.fieldsets import SparseFieldsetMixin
 
 
-class PatientProfileSerializer(serializers.ModelSerializer):
+class PatientProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     email = serializers.CharField(source='user.email', read_only=True)
     
@@ -11,7 +12,7 @@ class PatientProfileSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'phone', 'address', 'chronic_diseases', 'date_of_birth']
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Appointment
         fields = ['id', 'patient', 'date', 'time', 'test_type', 'selected_tests', 'status', 'notes']
@@ -46,13 +47,13 @@ class AppointmentSerializer(serializers.ModelSerializer):
         return data
 
 
-class TestOrderSerializer(serializers.ModelSerializer):
+class TestOrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = TestOrder
         fields = ['id', 'test_type', 'test_name', 'order_date', 'status', 'report_url', 'slide_url', 'price']
 
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Invoice
         fields = ['id', 'amount', 'payment_status', 'created_date', 'paid_date', 'items']
\ No newline at end of file
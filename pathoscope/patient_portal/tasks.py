@@ -0,0 +1,12 @@
+from jobs.queue import task
+from .billing import create_invoice
+from .models import Appointment
+
+
+@task()
+def create_appointment_invoice(appointment_id):
+    # The row lock makes a second run of the job wait for the first and then see its invoice
+    appointment = Appointment.objects.select_for_update().get(id=appointment_id)
+    if appointment.invoices.exists():
+        return
+    create_invoice(appointment)
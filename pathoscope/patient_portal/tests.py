@@ -1,3 +1,179 @@
-from django.test import TestCase
+import datetime
+import json
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from .billing import BillingError, create_invoice, finance_report, rebuild_ledger, record_payment, split_by_type
+from hematology.models import Sample, TestAnalyte, TestResult
+from hematology.validation import validate_batch
+from .models import Appointment, DailyRevenue, Invoice, InvoiceLine, PatientBalance, TestOrder
+from .results import ResultsCache, invalidate_patients, patient_results, results_cache
+
+
+class BillingLedgerTests(TestCase):
+    def setUp(self):
+        self.patient = User.objects.create_user(username='patient', password='x', role=User.PATIENT)
+        appointment = Appointment.objects.create(patient=self.patient, date=datetime.date(2026, 10, 20),
+                                                 time=datetime.time(9), test_type='hematology')
+        for test_type, test_name, price in (('hematology', 'CBC', '50.00'), ('pathology', 'Tissue Biopsy', '150.00')):
+            TestOrder.objects.create(patient=self.patient, appointment=appointment, test_type=test_type,
+                                     test_name=test_name, price=Decimal(price))
+        self.invoice = create_invoice(appointment)
+        self.today = timezone.localdate()
+
+    def rollups(self):
+        balance = PatientBalance.objects.values_list('invoiced', 'paid', 'balance').get(patient=self.patient)
+        revenue = dict((test_type, (invoiced, collected, lines)) for test_type, invoiced, collected, lines in
+                       DailyRevenue.objects.values_list('test_type', 'invoiced', 'collected', 'lines'))
+        return balance, revenue
+
+    def test_invoice_lines_and_rollups(self):
+        self.assertEqual(self.invoice.amount, Decimal('200.00'))
+        self.assertEqual(InvoiceLine.objects.filter(invoice=self.invoice).count(), 2)
+        balance, revenue = self.rollups()
+        self.assertEqual(balance, (Decimal('200.00'), Decimal('0.00'), Decimal('200.00')))
+        self.assertEqual(revenue, {
+            'hematology': (Decimal('50.00'), Decimal('0.00'), 1),
+            'pathology': (Decimal('150.00'), Decimal('0.00'), 1),
+        })
+
+    def test_partial_then_full_payment(self):
+        record_payment(self.invoice.id, self.patient.id, Decimal('100'))
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.payment_status, Invoice.PARTIAL)
+        balance, revenue = self.rollups()
+        self.assertEqual(balance[2], Decimal('100.00'))
+        # Collected revenue follows the line prices, 1:3
+        self.assertEqual((revenue['hematology'][1], revenue['pathology'][1]), (Decimal('25.00'), Decimal('75.00')))
+
+        payment = record_payment(self.invoice.id, self.patient.id)
+        self.assertEqual(payment.amount, Decimal('100.00'))
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.payment_status, Invoice.PAID)
+        self.assertEqual(self.rollups()[0], (Decimal('200.00'), Decimal('200.00'), Decimal('0.00')))
+
+    def test_invalid_payments_are_rejected(self):
+        for amount in (Decimal('200.01'), Decimal('0'), Decimal('-5'), Decimal('0.001'), Decimal('-1e30')):
+            with self.assertRaises(BillingError, msg=amount):
+                record_payment(self.invoice.id, self.patient.id, amount)
+        record_payment(self.invoice.id, self.patient.id)
+        with self.assertRaisesMessage(BillingError, 'already paid'):
+            record_payment(self.invoice.id, self.patient.id)
+        other = User.objects.create_user(username='other', password='x', role=User.PATIENT)
+        with self.assertRaises(Invoice.DoesNotExist):
+            record_payment(self.invoice.id, other.id)
+
+    def test_split_puts_rounding_on_the_largest_share(self):
+        shares = split_by_type(Decimal('10.00'), {'hematology': Decimal('1'), 'pathology': Decimal('2')})
+        self.assertEqual(shares, {'hematology': Decimal('3.33'), 'pathology': Decimal('6.67')})
+        self.assertEqual(split_by_type(Decimal('10.00'), {}), {})
+
+    def test_rebuild_matches_incremental_rollups(self):
+        record_payment(self.invoice.id, self.patient.id, Decimal('60'))
+        expected = self.rollups()
+        self.assertEqual(rebuild_ledger(), (2, 0))
+        self.assertEqual(self.rollups(), expected)
+
+    def test_finance_report(self):
+        record_payment(self.invoice.id, self.patient.id, Decimal('40'))
+        report = finance_report(self.today, self.today)
+        self.assertEqual(report['totals'], {'invoiced': '200.00', 'collected': '40.00', 'lines': 2})
+        self.assertEqual(report['outstanding']['total'], '160.00')
+        self.assertEqual(report['outstanding']['largest'][0]['patient_name'], 'patient')
+        tomorrow = self.today + datetime.timedelta(days=1)
+        self.assertEqual(finance_report(tomorrow, tomorrow)['totals']['lines'], 0)
+
+
+class BillingViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', password='x', role=User.ADMIN)
+        self.patient = User.objects.create_user(username='patient', password='x', role=User.PATIENT)
+
+    def test_finance_report_rejects_bad_dates(self):
+        self.client.force_authenticate(self.admin)
+        for query in ('', 'start=2026-10-01', 'start=2026-02-30&end=2026-03-01', 'start=x&end=y',
+                      'start=2026-10-02&end=2026-10-01'):
+            self.assertEqual(self.client.get(f'/api/patient-portal/finance/?{query}').status_code, 400, query)
+        response = self.client.get('/api/patient-portal/finance/?start=2026-10-01&end=2026-10-31')
+        self.assertEqual(response.status_code, 200)
+
+    def test_finance_report_is_for_administrators(self):
+        self.client.force_authenticate(self.patient)
+        response = self.client.get('/api/patient-portal/finance/?start=2026-10-01&end=2026-10-31')
+        self.assertEqual(response.status_code, 403)
+
+    def test_payment_amount_must_be_a_number(self):
+        invoice = Invoice.objects.create(patient=self.patient, amount=Decimal('50.00'))
+        self.client.force_authenticate(self.patient)
+        for amount in ('abc', 'NaN', 'Infinity'):
+            response = self.client.post(f'/api/patient-portal/invoices/{invoice.id}/pay/', {'amount': amount},
+                                        format='json')
+            self.assertEqual(response.status_code, 400, amount)
+
+
+class PatientResultsCacheTests(TestCase):
+    def setUp(self):
+        results_cache.clear()
+        self.addCleanup(results_cache.clear)
+        self.patient = User.objects.create_user(username='patient', password='x', role=User.PATIENT)
+        self.pathologist = User.objects.create_user(username='doctor', password='x', role=User.PATHOLOGIST)
+        self.order = TestOrder.objects.create(patient=self.patient, test_type='hematology', test_name='CBC',
+                                              price=Decimal('50'))
+        self.sample = Sample.objects.create(accession_number='ACC-1', barcode='BC-1', test_order=self.order,
+                                            status=Sample.AWAITING_VALIDATION)
+        analyte = TestAnalyte.objects.create(test_name='CBC', analyte_name='Hemoglobin', unit='g/dL',
+                                             normal_range_low=Decimal('12'), normal_range_high=Decimal('17.5'))
+        TestResult.objects.create(sample=self.sample, analyte=analyte, value=Decimal('13.5'))
+
+    def results(self):
+        orders = json.loads(patient_results(self.patient.id))['orders']
+        return [(order['test_name'], order['status'], [result['value'] for result in order['results']])
+                for order in orders]
+
+    def test_only_released_results_are_shown(self):
+        self.assertEqual(self.results(), [('CBC', TestOrder.PENDING, [])])
+
+    def test_cached_until_invalidated(self):
+        self.results()
+        with self.assertNumQueries(0):
+            self.results()
+        TestOrder.objects.filter(id=self.order.id).update(test_name='Full blood count')
+        self.assertEqual(self.results()[0][0], 'CBC')
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_patients([self.patient.id])
+            self.assertEqual(self.results()[0][0], 'CBC')  # not before the change commits
+        self.assertEqual(self.results()[0][0], 'Full blood count')
+
+    def test_release_invalidates_the_patient(self):
+        self.results()
+        with self.captureOnCommitCallbacks(execute=True):
+            validate_batch(self.pathologist, sample_ids=[self.sample.id])
+        self.assertEqual(self.results(), [('CBC', TestOrder.REPORT_READY, ['13.50'])])
+
+    @override_settings(PATIENT_RESULTS_CACHE='default')
+    def test_shared_version_invalidates_other_processes(self):
+        caches['default'].clear()
+        self.results()
+        TestOrder.objects.filter(id=self.order.id).update(test_name='Full blood count')
+        # Another process bumps the shared version; this one still holds the old payload
+        caches['default'].incr(f'patient-results:{self.patient.id}:version')
+        self.assertEqual(self.results()[0][0], 'Full blood count')
+
+    def test_lru_is_bounded_by_size(self):
+        cache = ResultsCache(max_bytes=10)
+        cache.put(1, 0, b'aaaa', ttl=60)
+        cache.put(2, 0, b'bbbb', ttl=60)
+        cache.get(1, 0)
+        cache.put(3, 0, b'cccc', ttl=60)
+        self.assertEqual((cache.get(1, 0), cache.get(2, 0), cache.get(3, 0)), (b'aaaa', None, b'cccc'))
+        cache.put(4, 0, b'x' * 11, ttl=60)
+        self.assertIsNone(cache.get(4, 0))
+        cache.invalidate(3)
+        cache.put(3, 0, b'stale', ttl=60)  # rendered before the invalidation
+        self.assertIsNone(cache.get(3, 1))
@@ -6,8 +6,10 @@ from .views import (
     AvailableSlotsView,
     AvailableTestsView,
     TestOrderListView,
+    PatientResultsView,
     InvoiceListView,
-    PayInvoiceView
+    PayInvoiceView,
+    FinanceReportView
 )
 
 urlpatterns = [
@@ -17,6 +19,8 @@ urlpatterns = [
     path('appointments/available-slots/', AvailableSlotsView.as_view(), name='available-slots'),
     path('available-tests/', AvailableTestsView.as_view(), name='available-tests'),
     path('test-orders/', TestOrderListView.as_view(), name='test-orders'),
+    path('results/', PatientResultsView.as_view(), name='patient-results'),
     path('invoices/', InvoiceListView.as_view(), name='invoices'),
     path('invoices/<int:invoice_id>/pay/', PayInvoiceView.as_view(), name='pay-invoice'),
+    path('finance/', FinanceReportView.as_view(), name='finance-report'),
 ]
\ No newline at end of file
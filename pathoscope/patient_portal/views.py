@@ -1,10 +1,20 @@
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
-from django.utils import timezone
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.dateparse import parse_date
 from .models import PatientProfile, Appointment, TestOrder, Invoice, TEST_PRICES
+from .billing import BillingError, finance_report, record_payment
 from .serializers import PatientProfileSerializer, AppointmentSerializer, TestOrderSerializer, InvoiceSerializer
+from pathoscope.fieldsets import SparseFieldsetViewMixin
+from accounts.models import User
+from jobs.queue import enqueue
+from .tasks import create_appointment_invoice
+from .results import patient_results, invalidate_patients
 
 
 class PatientProfileView(generics.RetrieveUpdateAPIView):
@@ -23,23 +33,21 @@ class AvailableTestsView(APIView):
         return Response(TEST_PRICES)
 
 
-class AppointmentListCreateView(generics.ListCreateAPIView):
+class AppointmentListCreateView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         return Appointment.objects.filter(patient=self.request.user)
     
+    @transaction.atomic
     def perform_create(self, serializer):
         appointment = serializer.save(patient=self.request.user, status=Appointment.CONFIRMED)
         
-        # Create test orders and invoice when appointment is confirmed
+        # Create test orders now; the invoice is created by a background job
         test_type = appointment.test_type
         selected_tests = appointment.selected_tests
         
-        total_amount = 0
-        invoice_items = []
-        
         for test_name in selected_tests:
             price = TEST_PRICES[test_type][test_name]
             
@@ -51,17 +59,9 @@ class AppointmentListCreateView(generics.ListCreateAPIView):
                 test_name=test_name,
                 price=price
             )
-            
-            total_amount += price
-            invoice_items.append({'test_name': test_name, 'price': float(price)})
         
-        # Create Invoice
-        Invoice.objects.create(
-            patient=self.request.user,
-            appointment=appointment,
-            amount=total_amount,
-            items=invoice_items
-        )
+        invalidate_patients([self.request.user.id])
+        enqueue(create_appointment_invoice, appointment_id=appointment.id)
 
 
 class CancelAppointmentView(APIView):
@@ -95,7 +95,7 @@ class AvailableSlotsView(APIView):
         return Response({'available_dates': available_dates})
 
 
-class TestOrderListView(generics.ListAPIView):
+class TestOrderListView(SparseFieldsetViewMixin, generics.ListAPIView):
     serializer_class = TestOrderSerializer
     permission_classes = [IsAuthenticated]
     
@@ -103,7 +103,14 @@ class TestOrderListView(generics.ListAPIView):
         return TestOrder.objects.filter(patient=self.request.user).order_by('-order_date')
 
 
-class InvoiceListView(generics.ListAPIView):
+class PatientResultsView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        return HttpResponse(patient_results(request.user.id), content_type='application/json')
+
+
+class InvoiceListView(SparseFieldsetViewMixin, generics.ListAPIView):
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
     
@@ -115,11 +122,41 @@ class PayInvoiceView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, invoice_id):
+        # Pays everything outstanding unless an amount is given
+        amount = request.data.get('amount')
+        if amount is not None:
+            try:
+                amount = Decimal(str(amount))
+            except InvalidOperation:
+                amount = None
+            if amount is None or not amount.is_finite():
+                return Response({'error': 'amount must be a number'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            invoice = Invoice.objects.get(id=invoice_id, patient=request.user)
-            invoice.payment_status = Invoice.PAID
-            invoice.paid_date = timezone.now()
-            invoice.save()
-            return Response({'message': 'Payment successful'}, status=status.HTTP_200_OK)
+            payment = record_payment(invoice_id, request.user.id, amount)
+            return Response({'message': 'Payment successful', 'payment_id': payment.id, 'amount': str(payment.amount)},
+                            status=status.HTTP_200_OK)
         except Invoice.DoesNotExist:
-            return Response({'error': 'Invoice not found'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response({'error': 'Invoice not found'}, status=status.HTTP_404_NOT_FOUND)
+        except BillingError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class FinanceReportView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role != User.ADMIN and not request.user.is_superuser:
+            return Response({'error': 'Finance reports are only available to administrators'},
+                            status=status.HTTP_403_FORBIDDEN)
+        try:
+            start = parse_date(request.query_params.get('start') or '')
+            end = parse_date(request.query_params.get('end') or '')
+        except ValueError:
+            # Well-formed but impossible, e.g. 2026-02-30
+            start = end = None
+        if start is None or end is None:
+            return Response({'error': 'start and end dates are required (YYYY-MM-DD)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if end < start:
+            return Response({'error': 'end must not be before start'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(finance_report(start, end))
\ No newline at end of file